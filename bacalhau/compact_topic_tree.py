@@ -0,0 +1,558 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+
+from bacalhau.topic_tree import TopicTree, _VisitedNodes, insert_sorted, \
+    write_json_graph
+from bacalhau.topic_tree_snapshot import TopicTreeSnapshot
+
+
+class CompactTopicTree(object):
+    """Array backed alternative to `bacalhau.topic_tree.TopicTree`, for
+    large trees.
+
+    Node names are interned to integer ids, and the tree is kept as
+    integer arrays of the parent, first child, next and previous
+    sibling of each node, with the node attributes (`is_leaf`,
+    `is_root`, `count` and `texts`) stored in columns, instead of
+    several dictionaries per node and per edge. Every node has at most
+    one parent, so the tree is a forest, as the trees generated by
+    `bacalhau.corpus.Corpus` are. As in a
+    `bacalhau.topic_tree.TopicTree`, the texts of each node are kept
+    as the sorted indices of their ids in a table of the tree, and the
+    count of a node is the number of its texts.
+
+    `.compress` gives the same result as
+    `bacalhau.topic_tree.TopicTree.compress` on the tree returned by
+    `.to_networkx`, when the nodes are added in the same order (as
+    `.from_networkx` does): leaves are processed in the order their
+    nodes were added."""
+
+    # Parent of the removed nodes, and missing parent, child or
+    # sibling.
+    REMOVED = -2
+    NONE = -1
+
+    def __init__(self, text_ids=None):
+        """Creates a new, empty, `.CompactTopicTree`.
+
+        :param text_ids: ids of the texts the nodes can be annotated
+            with, defaults to none.
+        :type text_ids: list of str.
+        """
+        # Node id -> name, and name -> node id.
+        self._names = []
+        self._ids = {}
+        self._parents = array('i')
+        self._first_children = array('i')
+        self._next_siblings = array('i')
+        self._previous_siblings = array('i')
+        self._child_counts = array('i')
+        self._is_leaf = bytearray()
+        self._is_root = bytearray()
+        self._counts = array('i')
+        # Node id -> sorted array of text indices, or None if the node
+        # has not been annotated.
+        self._texts = []
+        self._size = 0
+        # Text index -> text id, and text id -> text index.
+        self._text_ids = list(text_ids or [])
+        self._text_indices = dict(
+            (text_id, index) for index, text_id in enumerate(self._text_ids))
+
+    @classmethod
+    def from_networkx(cls, tree):
+        """Returns a new `.CompactTopicTree` with the nodes, edges and
+        node attributes of `tree`. Attributes other than `is_leaf`,
+        `is_root`, `count` and `texts` are not kept.
+
+        :param tree: tree to convert, where every node has at most
+            one parent.
+        :type tree: `bacalhau.topic_tree.TopicTree`
+        :rtype: `.CompactTopicTree`
+        """
+        compact_tree = cls(tree.graph.get('texts'))
+
+        for node, data in tree.nodes_iter(data=True):
+            node_id = compact_tree.add_node(node)
+
+            if 'is_leaf' in data:
+                compact_tree._is_leaf[node_id] = 1
+            if 'is_root' in data:
+                compact_tree._is_root[node_id] = 1
+            if 'texts' in data:
+                compact_tree.set_texts(node, data['texts'])
+
+        for parent, child in tree.edges_iter():
+            compact_tree.add_edge(parent, child)
+
+        return compact_tree
+
+    def to_networkx(self):
+        """Returns a `bacalhau.topic_tree.TopicTree` with the nodes,
+        edges and node attributes of this tree.
+
+        :rtype: `bacalhau.topic_tree.TopicTree`
+        """
+        tree = TopicTree()
+
+        if self._text_ids:
+            tree.graph['texts'] = list(self._text_ids)
+
+        for node_id in self._iter_ids():
+            tree.add_node(self._names[node_id],
+                          **self._get_node_data(node_id))
+
+        tree.add_edges_from(self.edges())
+
+        return tree
+
+    def add_node(self, node):
+        """Adds `node` to the tree, if it is not in it yet, and returns
+        its id.
+
+        :param node: name of the node.
+        :type node: str.
+        :rtype: int.
+        """
+        node_id = self._ids.get(node)
+
+        if node_id is None:
+            node_id = len(self._names)
+            self._ids[node] = node_id
+            self._names.append(node)
+            self._parents.append(self.NONE)
+            self._first_children.append(self.NONE)
+            self._next_siblings.append(self.NONE)
+            self._previous_siblings.append(self.NONE)
+            self._child_counts.append(0)
+            self._is_leaf.append(0)
+            self._is_root.append(0)
+            self._counts.append(0)
+            self._texts.append(None)
+            self._size += 1
+        elif self._parents[node_id] == self.REMOVED:
+            raise ValueError('Node %s has been removed' % node)
+
+        return node_id
+
+    def add_edge(self, parent, child):
+        """Adds an edge from `parent` to `child`, adding the nodes if
+        they are not in the tree yet.
+
+        :param parent: name of the parent node.
+        :type parent: str.
+        :param child: name of the child node.
+        :type child: str.
+        """
+        parent_id = self.add_node(parent)
+        child_id = self.add_node(child)
+        current_parent_id = self._parents[child_id]
+
+        if current_parent_id == parent_id:
+            return
+        if current_parent_id != self.NONE:
+            raise ValueError('Node %s already has a parent' % child)
+
+        self._link(parent_id, child_id)
+
+    def add_path(self, nodes):
+        """Adds a path of edges through `nodes`.
+
+        :param nodes: names of the nodes in the path.
+        :type nodes: list of str.
+        """
+        for parent, child in zip(nodes, nodes[1:]):
+            self.add_edge(parent, child)
+        if nodes:
+            self.add_node(nodes[0])
+
+    def set_leaf(self, node):
+        """Marks `node` as a leaf.
+
+        :param node: name of the node.
+        :type node: str.
+        """
+        self._is_leaf[self._ids[node]] = 1
+
+    def set_root(self, node):
+        """Marks `node` as a root.
+
+        :param node: name of the node.
+        :type node: str.
+        """
+        self._is_root[self._ids[node]] = 1
+
+    def add_text(self, node, text):
+        """Adds `text` to the texts `node` relates to.
+
+        :param node: name of the node.
+        :type node: str.
+        :param text: id of the text.
+        :type text: str.
+        """
+        node_id = self._ids[node]
+        index = self._text_indices.get(text)
+
+        if index is None:
+            index = self._text_indices[text] = len(self._text_ids)
+            self._text_ids.append(text)
+
+        if self._texts[node_id] is None:
+            self._texts[node_id] = array('i')
+        insert_sorted(self._texts[node_id], index)
+        self._counts[node_id] = len(self._texts[node_id])
+
+    def set_texts(self, node, texts):
+        """Sets the texts `node` relates to.
+
+        :param node: name of the node.
+        :type node: str.
+        :param texts: sorted indices of the texts in the text ids of
+            this tree.
+        :type texts: `array.array`
+        """
+        node_id = self._ids[node]
+        self._texts[node_id] = array('i', texts)
+        self._counts[node_id] = len(texts)
+
+    def get_text_ids(self):
+        """Returns the ids of the texts the nodes are annotated with,
+        by index.
+
+        :rtype: list of str.
+        """
+        return self._text_ids
+
+    def has_node(self, node):
+        """Returns True if `node` is in the tree.
+
+        :param node: name of the node.
+        :type node: str.
+        :rtype: bool.
+        """
+        node_id = self._ids.get(node)
+        return node_id is not None and \
+            self._parents[node_id] != self.REMOVED
+
+    def number_of_nodes(self):
+        """Returns the number of nodes in the tree.
+
+        :rtype: int.
+        """
+        return self._size
+
+    def nodes(self):
+        """Returns the names of the nodes in the tree, in the order
+        they were added.
+
+        :rtype: list of str.
+        """
+        return [self._names[node_id] for node_id in self._iter_ids()]
+
+    def edges(self):
+        """Returns the (parent, child) edges of the tree.
+
+        :rtype: list of tuple.
+        """
+        names = self._names
+        parents = self._parents
+
+        return [(names[parents[node_id]], names[node_id])
+                for node_id in self._iter_ids()
+                if parents[node_id] != self.NONE]
+
+    def get_parent(self, node):
+        """Returns the name of the parent of `node`, or None if it is
+        a root.
+
+        :param node: name of the node.
+        :type node: str.
+        :rtype: str.
+        """
+        parent_id = self._parents[self._get_id(node)]
+
+        if parent_id == self.NONE:
+            return None
+        return self._names[parent_id]
+
+    def get_children(self, node):
+        """Returns the names of the children of `node`.
+
+        :param node: name of the node.
+        :type node: str.
+        :rtype: list of str.
+        """
+        return [self._names[child_id]
+                for child_id in self._iter_children(self._get_id(node))]
+
+    def get_node_data(self, node):
+        """Returns the attributes of `node`, as in the `node`
+        dictionary of a `bacalhau.topic_tree.TopicTree`.
+
+        :param node: name of the node.
+        :type node: str.
+        :rtype: dict.
+        """
+        return self._get_node_data(self._get_id(node))
+
+    def _get_id(self, node):
+        """Returns the id of `node`, raising a KeyError if it is not
+        in the tree.
+
+        :param node: name of the node.
+        :type node: str.
+        :rtype: int.
+        """
+        node_id = self._ids[node]
+
+        if self._parents[node_id] == self.REMOVED:
+            raise KeyError(node)
+        return node_id
+
+    def _get_node_data(self, node_id):
+        """Returns the attributes of the node with `node_id`.
+
+        :param node_id: id of the node.
+        :type node_id: int.
+        :rtype: dict.
+        """
+        data = {}
+
+        if self._is_leaf[node_id]:
+            data['is_leaf'] = True
+        if self._is_root[node_id]:
+            data['is_root'] = True
+        if self._texts[node_id] is not None:
+            data['texts'] = array('i', self._texts[node_id])
+            data['count'] = self._counts[node_id]
+
+        return data
+
+    def _iter_ids(self):
+        """Yields the ids of the nodes in the tree, in the order they
+        were added."""
+        parents = self._parents
+        removed = self.REMOVED
+
+        for node_id in xrange(len(parents)):
+            if parents[node_id] != removed:
+                yield node_id
+
+    def _iter_children(self, node_id):
+        """Yields the ids of the children of the node with `node_id`.
+
+        :param node_id: id of the node.
+        :type node_id: int.
+        """
+        child_id = self._first_children[node_id]
+        next_siblings = self._next_siblings
+
+        while child_id != self.NONE:
+            yield child_id
+            child_id = next_siblings[child_id]
+
+    def _link(self, parent_id, child_id):
+        """Makes the node with `child_id` the first child of the node
+        with `parent_id`.
+
+        :param parent_id: id of the parent node.
+        :type parent_id: int.
+        :param child_id: id of the child node, which has no parent.
+        :type child_id: int.
+        """
+        first_child_id = self._first_children[parent_id]
+
+        self._parents[child_id] = parent_id
+        self._previous_siblings[child_id] = self.NONE
+        self._next_siblings[child_id] = first_child_id
+        if first_child_id != self.NONE:
+            self._previous_siblings[first_child_id] = child_id
+        self._first_children[parent_id] = child_id
+        self._child_counts[parent_id] += 1
+
+    def _unlink(self, node_id):
+        """Removes the node with `node_id` from the children of its
+        parent, leaving it without a parent.
+
+        :param node_id: id of the node.
+        :type node_id: int.
+        """
+        parent_id = self._parents[node_id]
+        if parent_id == self.NONE:
+            return
+
+        previous_id = self._previous_siblings[node_id]
+        next_id = self._next_siblings[node_id]
+
+        if previous_id == self.NONE:
+            self._first_children[parent_id] = next_id
+        else:
+            self._next_siblings[previous_id] = next_id
+        if next_id != self.NONE:
+            self._previous_siblings[next_id] = previous_id
+
+        self._parents[node_id] = self.NONE
+        self._previous_siblings[node_id] = self.NONE
+        self._next_siblings[node_id] = self.NONE
+        self._child_counts[parent_id] -= 1
+
+    def _remove(self, node_id, new_parent_id=NONE):
+        """Removes the node with `node_id` from the tree, moving its
+        children to the node with `new_parent_id`, or making them
+        roots. Returns the ids of the children.
+
+        :param node_id: id of the node.
+        :type node_id: int.
+        :param new_parent_id: id of the new parent of the children.
+        :type new_parent_id: int.
+        :rtype: list of int.
+        """
+        children = list(self._iter_children(node_id))
+
+        self._unlink(node_id)
+        for child_id in children:
+            self._parents[child_id] = self.NONE
+            if new_parent_id != self.NONE:
+                self._link(new_parent_id, child_id)
+            else:
+                self._previous_siblings[child_id] = self.NONE
+                self._next_siblings[child_id] = self.NONE
+
+        self._parents[node_id] = self.REMOVED
+        self._first_children[node_id] = self.NONE
+        self._child_counts[node_id] = 0
+        self._size -= 1
+
+        return children
+
+    def compress(self, min_children=2):
+        """Compresses the tree based on the castanet algorithm, as
+        `bacalhau.topic_tree.TopicTree.compress`: 1. starting from the
+        leaves, eliminate a parent that has fewer than `min_children`,
+        unless the parent is the root; 2. eliminate a child whose name
+        appears within the parent's name.
+
+        :param min_children: minimum number of children that a parent
+            should have, defaults to 2.
+        :type min_children: int.
+        """
+        parents = self._parents
+        child_counts = self._child_counts
+        names = self._names
+        none = self.NONE
+        leaves = [node_id for node_id in self._iter_ids()
+                  if self._is_leaf[node_id]]
+
+        # Eliminates the ancestors of each leaf that have too few
+        # children, stopping at those already kept.
+        kept = bytearray(len(parents))
+        for leaf_id in leaves:
+            node_id = leaf_id
+
+            while parents[node_id] >= 0:
+                parent_id = parents[node_id]
+                if kept[parent_id]:
+                    break
+
+                ancestor_id = parents[parent_id]
+                if child_counts[parent_id] < min_children and \
+                        ancestor_id != none:
+                    self._remove(parent_id, ancestor_id)
+                else:
+                    kept[parent_id] = 1
+                    node_id = parent_id
+
+        # Eliminates each leaf, and each of its ancestors, whose name
+        # appears within their parent's name, stopping at the first
+        # node that would not change.
+        visited = _VisitedNodes(
+            [node_id for node_id in self._iter_ids()
+             if parents[node_id] == none],
+            self._iter_children)
+        for leaf_id in leaves:
+            node_id = leaf_id
+
+            while node_id != none and parents[node_id] != self.REMOVED:
+                if visited.is_settled(node_id):
+                    break
+                visited.add(node_id)
+
+                parent_id = parents[node_id]
+                if parent_id == none:
+                    break
+
+                node = names[node_id]
+                parent = names[parent_id]
+                node_name = node[:node.find('.')]
+                parent_name = parent[:parent.find('.')]
+
+                if node_name in parent_name or parent_name in node_name:
+                    for child_id in self._remove(node_id, parent_id):
+                        visited.move(child_id)
+
+                node_id = parent_id
+
+    def prune(self, nodes):
+        """Removes the given nodes from the tree. Their children
+        become roots.
+
+        :param nodes: names of the nodes to be removed from the tree.
+        :type nodes: list of str.
+        """
+        for node in nodes:
+            if self.has_node(node):
+                self._remove(self._ids[node])
+
+    def render(self, filepath, format='svg', prog='dot', attributes={}):
+        """Renders the tree into the file at `filepath`, through
+        `bacalhau.topic_tree.TopicTree.render`.
+
+        `filepath` may also be a File-like object."""
+        self.to_networkx().render(filepath, format=format, prog=prog,
+                                  attributes=attributes)
+
+    def to_json(self, filepath, gzipped=False):
+        """Serializes the tree to JSON Graph format, as
+        `bacalhau.topic_tree.TopicTree.to_json`, and writes it to a
+        file.
+
+        `filepath` is a file path or File-like object; if `gzipped` is
+        True, the JSON is compressed with gzip."""
+        positions = array('i', [self.NONE]) * len(self._names)
+        for position, node_id in enumerate(self._iter_ids()):
+            positions[node_id] = position
+
+        graph = []
+        if self._text_ids:
+            graph.append(('texts', self._text_ids))
+
+        nodes = (dict(self._get_node_data(node_id), id=self._names[node_id])
+                 for node_id in self._iter_ids())
+        parents = self._parents
+        links = ((positions[parents[node_id]], positions[node_id])
+                 for node_id in self._iter_ids()
+                 if parents[node_id] != self.NONE)
+
+        write_json_graph(filepath, graph, nodes, links, gzipped)
+
+    def save(self, filepath):
+        """Saves the tree to the file at `filepath`, in the binary
+        format of `bacalhau.topic_tree_snapshot.TopicTreeSnapshot`, as
+        `bacalhau.topic_tree.TopicTree.save`.
+
+        :param filepath: path to the file.
+        :type filepath: str.
+        """
+        positions = array('i', [self.NONE]) * len(self._names)
+        for position, node_id in enumerate(self._iter_ids()):
+            positions[node_id] = position
+
+        nodes = ((self._names[node_id], self._get_node_data(node_id))
+                 for node_id in self._iter_ids())
+        parents = self._parents
+        edges = ((positions[parents[node_id]], positions[node_id])
+                 for node_id in self._iter_ids()
+                 if parents[node_id] != self.NONE)
+
+        TopicTreeSnapshot.write(filepath, nodes, edges, self._text_ids)
@@ -1,18 +1,331 @@
-from collections import defaultdict
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import contextmanager
+from itertools import islice
+import inspect
 from math import log
+import multiprocessing
 import os
 
 import nltk
 
-from bacalhau.topic_tree import TopicTree
+import bacalhau
+from bacalhau.file_prefetcher import FilePrefetcher
+from bacalhau.hypernym_cache import get_wordnet_version
+from bacalhau.pipeline import Pipeline
+from bacalhau.term_matrix import TermMatrix
+from bacalhau.token_cache import TokenCache
+from bacalhau.topic_tree_builder import TopicTreeBuilder
+
+
+# Arguments used by a worker process to create documents; set by
+# `_init_worker` when the worker starts, so that they (and any cache
+# in them) are sent to each worker once rather than with every file.
+_worker_args = None
+
+# Settings of the topic trees generated by
+# `.Corpus.generate_topic_trees`, and their defaults.
+TREE_SETTINGS = {'n_terms': 10, 'compress': True, 'min_children': 2,
+                 'prune': (), 'compact': False, 'annotate': False}
+
+
+def _init_worker(args):
+    """Sets the arguments used by this worker process to create
+    documents.
+
+    :param args: document arguments, as returned by
+        `.Corpus._get_document_args`.
+    :type args: `tuple`
+    """
+    global _worker_args
+    _worker_args = args
+
+
+def _accepts_argument(function, name):
+    """Returns True if `function` accepts a keyword argument `name`,
+    either by name or through its `**kwargs`.
+
+    :param function: the function to check.
+    :type function: `function`
+    :param name: name of the argument.
+    :type name: `str`
+    :rtype: `bool`
+    """
+    try:
+        argspec = inspect.getargspec(function)
+    except TypeError:
+        # Not a Python function, such as `object.__init__`.
+        return False
+
+    return name in argspec.args or argspec.keywords is not None
+
+
+def _create_document(filepath, args, content=None):
+    """Creates a `bacalhau.document.Document` for `filepath`.
+
+    :param filepath: path to the file.
+    :type filepath: `str`
+    :param args: document arguments, as returned by
+        `.Corpus._get_document_args`.
+    :type args: `tuple`
+    :param content: content of the file, if it has already been read,
+        defaults to None.
+    :type content: `str`
+    :rtype: `bacalhau.document.Document`
+    """
+    document_class, tokenizer, stopwords, kwargs = args[:4]
+
+    if content is not None:
+        kwargs = dict(kwargs, content=content)
+
+    return document_class(filepath, tokenizer, stopwords, **kwargs)
+
+
+def _read_term_counts(filepath, args, content=None):
+    """Returns the term counts of the texts in the file at `filepath`.
+    If the arguments include a `bacalhau.document_cache.DocumentCache`
+    the counts are read from it, and the file is only parsed if it is
+    not in the cache.
+
+    :param filepath: path to the file.
+    :type filepath: `str`
+    :param args: document arguments, as returned by
+        `.Corpus._get_document_args`.
+    :type args: `tuple`
+    :param content: content of the file, if it has already been read,
+        defaults to None.
+    :type content: `str`
+    :returns: (text id, term counts) tuples.
+    :rtype: `list`
+    """
+    document_cache, settings = args[4:]
+
+    if document_cache is None:
+        return _create_document(filepath, args, content).get_term_counts()
+
+    key = document_cache.get_key(filepath, settings, content)
+    term_counts = document_cache.get(key)
+
+    if term_counts is None:
+        term_counts = _create_document(filepath, args,
+                                       content).get_term_counts()
+        document_cache.set(key, term_counts)
+
+    return term_counts
+
+
+def _build_topic_tree(hypernyms, compact=False, annotate=False):
+    """Returns a topic tree for `hypernyms`; see
+    `.Corpus.get_topic_tree`.
+
+    :param hypernyms: dictionary of hypernyms.
+    :type hypernyms: `dict`
+    :param compact: whether to return a
+        `bacalhau.compact_topic_tree.CompactTopicTree`, defaults to
+        False.
+    :type compact: `bool`
+    :param annotate: whether to annotate the nodes with the texts
+        they relate to, defaults to False.
+    :type annotate: `bool`
+    :rtype: `bacalhau.topic_tree.TopicTree`
+    """
+    builder = TopicTreeBuilder()
+
+    for text, data in hypernyms.iteritems():
+        for term, hypernym in data.iteritems():
+            builder.add_path(hypernym, text if annotate else None)
+
+    if compact:
+        return builder.get_compact_topic_tree()
+    return builder.get_topic_tree()
+
+
+def _build_configured_tree(settings, top_terms, hypernyms):
+    """Returns the topic tree for `settings`, built from the hypernyms
+    of the first `settings['n_terms']` of the `top_terms` of each
+    text.
+
+    :param settings: tree settings, with all the keys of
+        `TREE_SETTINGS`.
+    :type settings: `dict`
+    :param top_terms: {text: [term]}, with the terms of each text in
+        decreasing order of TF.IDF.
+    :type top_terms: `dict`
+    :param hypernyms: {text: {term: hypernym}}, for all of the
+        `top_terms`.
+    :type hypernyms: `dict`
+    :rtype: `bacalhau.topic_tree.TopicTree`
+    """
+    n_terms = settings['n_terms']
+    selected = {}
+
+    for text, terms in top_terms.iteritems():
+        text_hypernyms = hypernyms[text]
+        selected[text] = dict((term, text_hypernyms[term])
+                              for term in terms[:n_terms])
+
+    tree = _build_topic_tree(selected, settings['compact'],
+                             settings['annotate'])
+
+    if settings['prune']:
+        tree.prune(settings['prune'])
+    if settings['compress']:
+        tree.compress(settings['min_children'])
+
+    return tree
+
+
+# Top terms and hypernyms used by a worker process to build topic
+# trees; set by `_init_tree_worker` when the worker starts.
+_tree_worker_args = None
+
+
+def _init_tree_worker(args):
+    """Sets the top terms and hypernyms used by this worker process to
+    build topic trees.
+
+    :param args: (top terms, hypernyms), as passed to
+        `_build_configured_tree`.
+    :type args: `tuple`
+    """
+    global _tree_worker_args
+    _tree_worker_args = args
+
+
+def _build_worker_tree(settings):
+    """Returns the topic tree for `settings`. Used by the worker
+    processes of `.Corpus.generate_topic_trees`.
+
+    :param settings: tree settings.
+    :type settings: `dict`
+    :rtype: `bacalhau.topic_tree.TopicTree`
+    """
+    return _build_configured_tree(settings, *_tree_worker_args)
+
+
+@contextmanager
+def _no_profile():
+    """Context manager used for the stages of a `.Corpus` without a
+    `bacalhau.profiler.Profiler`."""
+    yield
+
+
+def _load_document(filepath):
+    """Creates a `bacalhau.document.Document` and tokenizes its
+    texts. Used by the worker processes of a `.Corpus`, so it has to
+    be a module level function.
+
+    :param filepath: path to the file.
+    :type filepath: `str`
+    :rtype: `bacalhau.document.Document`
+    """
+    document = _create_document(filepath, _worker_args)
+    # Tokenizing is as expensive as parsing, so do it in the worker;
+    # the term counts are kept by each `bacalhau.text.Text`.
+    document.get_term_counts()
+    return document
+
+
+def _load_term_counts(filepath):
+    """Returns the term counts of the texts in a file, without keeping
+    the document. Used by the worker processes of a streaming
+    `.Corpus`.
+
+    :param filepath: path to the file.
+    :type filepath: `str`
+    :rtype: `list`
+    """
+    return _read_term_counts(filepath, _worker_args)
+
+
+def get_partial_filepath(directory, index, count):
+    """Returns the path of the partial result of shard `index` of
+    `count`, in `directory`.
+
+    :param directory: directory of the partial results.
+    :type directory: `str`
+    :param index: index of the shard.
+    :type index: `int`
+    :param count: number of shards.
+    :type count: `int`
+    :rtype: `str`
+    """
+    return os.path.join(directory, 'shard-%05d-of-%05d.partial' %
+                        (index, count))
+
+
+def _write_partial(args):
+    """Reads a shard of a corpus and writes its partial result; run
+    by the processes of `write_partials`.
+
+    :param args: (directory, corpus path, document class, shard,
+        corpus keyword arguments).
+    :type args: `tuple`
+    :rtype: `str`
+    """
+    directory, corpus_path, document_class, shard, kwargs = args
+    # Pool processes are daemonic, and cannot start processes of their
+    # own.
+    kwargs = dict(kwargs, workers=1)
+    corpus = Corpus(corpus_path, document_class, shard=shard, **kwargs)
+    filepath = get_partial_filepath(directory, *shard)
+    corpus.save_partial(filepath)
+    return filepath
+
+
+def write_partials(directory, corpus_path, document_class, count,
+                   processes=None, **kwargs):
+    """Splits the corpus at `corpus_path` into `count` shards, and
+    writes the partial result of each to `directory`, with a process
+    per shard. This is the map step of a distributed run, done on a
+    single machine; on several machines, each runs `.Corpus` with its
+    `shard` and `.Corpus.save_partial` instead, into a shared
+    directory. Returns the paths of the partial results, to be
+    merged by a `.Corpus` created with them as `partials`.
+
+    :param directory: directory to write the partial results to.
+    :type directory: `str`
+    :param corpus_path: path to the files.
+    :type corpus_path: `str`
+    :param document_class: document class used to process the
+        corpus files.
+    :type document_class: `bacalhau.document.Document`
+    :param count: number of shards.
+    :type count: `int`
+    :param processes: number of processes, defaults to `count`.
+    :type processes: `int`
+    :param kwargs: keyword arguments of the `.Corpus` of each shard;
+        its `workers` are ignored, since each shard is read in a
+        single process.
+    :rtype: `list`
+    """
+    tasks = [(directory, corpus_path, document_class, (index, count), kwargs)
+             for index in xrange(count)]
+    pool = multiprocessing.Pool(processes or count)
+
+    try:
+        return pool.map(_write_partial, tasks)
+    finally:
+        pool.close()
+        pool.join()
 
 
 class Corpus(object):
-    """A manager class to generate topic hierarchies from files."""
+    """A manager class to generate topic hierarchies from files.
+
+    A large corpus can be processed in a map/reduce fashion: each
+    shard of the corpus files is read by a separate `.Corpus`
+    (possibly on a separate machine), which saves its term counts as
+    a partial result with `.save_partial`; a `.Corpus` created with
+    the partial results as `partials` merges them, and generates the
+    topic trees as if it had read the whole corpus."""
 
     def __init__(self, corpus_path, document_class,
             tokenizer=nltk.tokenize.regexp.WordPunctTokenizer(),
             stopwords=nltk.corpus.stopwords.words('english'),
+            workers=1, streaming=False, hypernym_cache=None,
+            token_cache=None, document_cache=None, profiler=None,
+            prefetch=0, wordnet_index=None, sense_selector=None,
+            fast_tokenization=False, shard=None, partials=None,
             **document_kwargs):
         """Creates a new `.Corpus` for the given path, using the given
         `bacalhau.document.Document` class to process the files.
@@ -29,36 +342,464 @@ class Corpus(object):
         :param stopwords: words to be removed from the texts, defaults
             to `nltk.corpus.stopwords.words(\'english\')`.
         :type stopwords: `list`
+        :param workers: number of processes used to parse and
+            tokenize the corpus files, and of threads used to select
+            the top terms of the texts, defaults to 1.
+        :type workers: `int`
+        :param streaming: if True, the documents are not kept in
+            memory; each one is reduced to the term counts of its
+            texts as soon as it is read, defaults to False.
+        :type streaming: `bool`
+        :param hypernym_cache: persistent cache used to look up
+            hypernyms before WordNet, defaults to None.
+        :type hypernym_cache: `bacalhau.hypernym_cache.HypernymCache`
+        :param token_cache: cache of the WordNet lookups for each
+            token, shared by all the texts in the corpus (if the
+            document class accepts a `pipeline` argument), defaults
+            to a new `bacalhau.token_cache.TokenCache`.
+        :type token_cache: `bacalhau.token_cache.TokenCache`
+        :param document_cache: on disk cache of the term counts of
+            each file; only used in streaming mode, since otherwise
+            every file is parsed to keep its document, defaults to
+            None.
+        :type document_cache: `bacalhau.document_cache.DocumentCache`
+        :param profiler: profiler used to measure the stages of the
+            topic tree generation, defaults to None. Reading the
+            corpus is measured as the `ingestion:<document class>`
+            stage, followed by `get_top_terms`, `select_senses` (only
+            with a `sense_selector`), `get_hypernyms`,
+            `get_topic_tree` and `annotate_topic_tree`.
+        :type profiler: `bacalhau.profiler.Profiler`
+        :param prefetch: number of files read ahead, in background
+            threads, while the corpus is read by a single process
+            (see `bacalhau.file_prefetcher.FilePrefetcher`); the
+            documents are then parsed from the content read, so the
+            document class must accept a `content` argument. Defaults
+            to 0, which reads each file when it is parsed.
+        :type prefetch: `int`
+        :param wordnet_index: precomputed index of the WordNet nouns,
+            used to look up tokens (unless a `token_cache` is given)
+            and hypernyms instead of the WordNet corpus reader;
+            defaults to None. It must have been built from the
+            installed WordNet.
+        :type wordnet_index: `bacalhau.wordnet_index.WordNetIndex`
+        :param sense_selector: selects the WordNet sense of the top
+            terms of each text, from which their hypernyms are taken,
+            and whose leaves are then named after the term and the
+            sense; defaults to None, which uses the first sense of
+            each term (see
+            `bacalhau.sense_selector.FirstSenseSelector`).
+        :type sense_selector: `bacalhau.sense_selector.SenseSelector`
+        :param fast_tokenization: whether to count the terms of the
+            texts with the fast path of `bacalhau.pipeline.Pipeline`,
+            which gives the same counts but requires the tokenizer to
+            be a `nltk.tokenize.regexp.WordPunctTokenizer`; defaults
+            to False.
+        :type fast_tokenization: `bool`
+        :param shard: (index, count) of the shard of the corpus files
+            to read: the files whose position in the sorted file
+            paths, modulo `count`, is `index`; defaults to None,
+            which reads all the files.
+        :type shard: `tuple`
+        :param partials: paths of the partial results of every shard
+            of the corpus, written by `.save_partial`, to merge
+            instead of reading the corpus files (which implies
+            `streaming`); defaults to None. The partial results must
+            have been produced with the same document class,
+            tokenizer, stopwords, document arguments and WordNet.
+        :type partials: `list`
         """
+        if wordnet_index is not None:
+            if wordnet_index.get_wordnet_version() != get_wordnet_version():
+                raise ValueError(
+                    'The WordNet index was built from WordNet %s, not '
+                    'the installed WordNet %s' % (
+                        wordnet_index.get_wordnet_version(),
+                        get_wordnet_version()))
+
+            if token_cache is None:
+                token_cache = TokenCache(wordnet_index=wordnet_index)
+
         self._corpus_path = os.path.abspath(corpus_path)
         self._document_class = document_class
         self._tokenizer = tokenizer
         self._stopwords = stopwords
-        self._document_kwargs = document_kwargs
-        self._documents = self._get_documents()
+        # All the texts in the corpus share the same pipeline, when
+        # the document class accepts one.
+        self._pipeline = Pipeline(tokenizer, stopwords, token_cache,
+                                  fast_tokenization)
+        self._document_kwargs = dict(document_kwargs)
+        if _accepts_argument(document_class.__init__, 'pipeline'):
+            self._document_kwargs['pipeline'] = self._pipeline
+        self._workers = workers
+        self._hypernym_cache = hypernym_cache
+        self._document_cache = document_cache
+        self._profiler = profiler
+        self._prefetch = prefetch
+        self._wordnet_index = wordnet_index
+        self._sense_selector = sense_selector
+        self._shard = shard
+        self._partials = partials
+        # File path -> ids of the texts in the file.
+        self._document_text_ids = OrderedDict()
+
+        with self._profile(self._get_ingestion_stage()):
+            if streaming or partials is not None:
+                self._documents = None
+            else:
+                self._documents = self._get_documents()
+
+            self._term_matrix = self._get_term_matrix()
+
         # Total number of texts (not documents) in the corpus.
         self._text_count = self._get_text_count()
         self._hypernyms = None
+        # Number of hypernym paths through each node and edge of the
+        # last generated topic tree; used to patch the tree.
+        self._path_counts = None
+
+    def _profile(self, stage):
+        """Returns a context manager that measures `stage` with the
+        corpus `bacalhau.profiler.Profiler`, if it has one.
+
+        :param stage: name of the stage.
+        :type stage: `str`
+        """
+        if self._profiler is None:
+            return _no_profile()
+
+        caches = {'token_cache': self._pipeline.get_token_cache(),
+                  'hypernym_cache': self._hypernym_cache,
+                  'document_cache': self._document_cache}
+        return self._profiler.profile(stage, caches)
+
+    def _get_ingestion_stage(self):
+        """Returns the name of the stage in which the corpus files are
+        read, which includes the name of the document class.
+
+        :rtype: `str`
+        """
+        return 'ingestion:%s' % self._document_class.__name__
 
     def _get_documents(self):
         """Creates a `bacalhau.document.Document` object for each
         of the files in the corpus, and returns them in a `list`.
 
-        :param corpus_path: path to the corpus files.
-        :type corpus_path: `str`
+        When the corpus uses more than one worker the documents are
+        created in a process pool; they are still returned in the
+        same order as the files, so the results match a serial run.
+
         :returns: documents in this corpus.
         :rtype: `list`
         """
-        documents = []
+        if self._workers > 1:
+            pool = self._get_pool()
+            try:
+                documents = pool.map(_load_document, self._get_filepaths())
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            documents = list(self._iter_documents())
+
+        return documents
+
+    def _iter_documents(self):
+        """Yields a `bacalhau.document.Document` object for each of
+        the files in the corpus, one at a time.
+
+        :rtype: `generator`
+        """
+        args = self._get_document_args()
+
+        for filepath, content in self._iter_files():
+            yield _create_document(filepath, args, content)
+
+    def _iter_files(self):
+        """Yields the path of each of the files in the corpus, with its
+        content if files are prefetched, or else None.
+
+        :rtype: `generator`
+        """
+        filepaths = self._get_filepaths()
+
+        if self._prefetch > 0:
+            for filepath, content in FilePrefetcher(filepaths,
+                                                    self._prefetch):
+                yield filepath, content
+        else:
+            for filepath in filepaths:
+                yield filepath, None
+
+    def _get_document_args(self):
+        """Returns the arguments used to create the documents in the
+        corpus, and read their term counts: the document class,
+        tokenizer, stopwords, document keyword arguments, document
+        cache and the description of these settings used for the
+        cache keys.
+
+        :rtype: `tuple`
+        """
+        settings = None
+
+        if self._document_cache is not None:
+            settings = self._get_settings()
+
+        return (self._document_class, self._tokenizer, self._stopwords,
+                self._document_kwargs, self._document_cache, settings)
+
+    def _get_settings(self):
+        """Returns a description of the settings that the term counts
+        of the corpus files depend on: the versions of bacalhau and
+        WordNet, the document class, the document keyword arguments,
+        the tokenizer and the stopwords.
+
+        :rtype: `str`
+        """
+        kwargs = sorted((key, value) for key, value
+                        in self._document_kwargs.iteritems()
+                        if key != 'pipeline')
+        return repr((bacalhau.__version__, get_wordnet_version(),
+                     self._get_class_path(self._document_class), kwargs,
+                     self._get_tokenizer_settings(), sorted(self._stopwords)))
+
+    def _get_class_path(self, value_class):
+        """Returns the dotted path to `value_class`.
+
+        :param value_class: the class to get the path of.
+        :type value_class: `type`
+        :rtype: `str`
+        """
+        return '%s.%s' % (value_class.__module__, value_class.__name__)
+
+    def _get_tokenizer_settings(self):
+        """Returns a description of the tokenizer that is the same
+        in every process: its class path and its configuration (for
+        instance the pattern and flags of a regular expression
+        tokenizer). Attributes that are not plain values, such as
+        compiled regular expressions, are described by their class
+        path only, since their representation holds a memory address.
+
+        :rtype: `tuple`
+        """
+        plain_types = (basestring, int, long, float, bool, type(None))
+        attributes = []
+
+        for name, value in sorted(getattr(self._tokenizer, '__dict__',
+                                          {}).iteritems()):
+            if not isinstance(value, plain_types):
+                value = self._get_class_path(type(value))
+            attributes.append((name, value))
+
+        return self._get_class_path(type(self._tokenizer)), attributes
+
+    def _get_pool(self):
+        """Returns a process pool whose workers create documents with
+        the arguments of this corpus.
+
+        :rtype: `multiprocessing.pool.Pool`
+        """
+        return multiprocessing.Pool(self._workers, _init_worker,
+                                    (self._get_document_args(),))
+
+    def _get_term_matrix(self):
+        """Returns a `bacalhau.term_matrix.TermMatrix` with the term
+        counts of all the texts in the corpus. In streaming mode the
+        documents are read one at a time and discarded once their
+        terms are counted.
+
+        :rtype: `bacalhau.term_matrix.TermMatrix`
+        """
+        if self._partials is not None:
+            return self._merge_partials()
+
+        term_matrix = TermMatrix()
+
+        if self._documents is not None:
+            for document in self._documents:
+                self._add_term_counts(term_matrix, document.get_path(),
+                                      document.get_term_counts())
+        elif self._workers > 1:
+            filepaths = self._get_filepaths()
+            pool = self._get_pool()
+            try:
+                # imap keeps the order of the files, and only holds
+                # the results that are waiting to be added.
+                for filepath, term_counts in zip(
+                        filepaths, pool.imap(_load_term_counts, filepaths)):
+                    self._add_term_counts(term_matrix, filepath,
+                                          term_counts)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            args = self._get_document_args()
+
+            for filepath, content in self._iter_files():
+                self._add_term_counts(
+                    term_matrix, filepath,
+                    _read_term_counts(filepath, args, content))
+
+        return term_matrix
+
+    def _merge_partials(self):
+        """Returns a `bacalhau.term_matrix.TermMatrix` with the term
+        counts of the partial results of the corpus, merged in the
+        order of their shards.
+
+        Raises a ValueError if the partial results were produced with
+        other settings than this corpus, or if they do not cover each
+        shard of the corpus once.
+
+        :rtype: `bacalhau.term_matrix.TermMatrix`
+        """
+        partials = []
+        settings = self._get_settings()
+
+        for filepath in self._partials:
+            term_matrix, metadata = TermMatrix.load(filepath)
+
+            if metadata['settings'] != settings:
+                raise ValueError('The partial result %s was produced with '
+                                 'other settings' % filepath)
+
+            partials.append((tuple(metadata['shard']), term_matrix,
+                             metadata['documents']))
+
+        partials.sort(key=lambda partial: partial[0])
+        shards = [shard for shard, term_matrix, documents in partials]
+        count = shards[0][1] if shards else 0
+
+        if not shards or shards != [(index, count)
+                                    for index in xrange(count)]:
+            raise ValueError('The partial results do not cover each shard '
+                             'of the corpus once: %s' % shards)
+
+        for shard, term_matrix, documents in partials:
+            text_ids = iter(term_matrix.get_text_ids())
+
+            for filepath, text_count in documents:
+                self._document_text_ids[filepath] = [
+                    text_id for text_id in islice(text_ids, text_count)]
+
+        return TermMatrix.merge([term_matrix for shard, term_matrix,
+                                 documents in partials])
+
+    def save_partial(self, filepath):
+        """Saves the term counts of the corpus, with the shard it was
+        read from, as a partial result to be merged by a `.Corpus`
+        created with `partials`.
+
+        The partial result is written to a temporary file that is
+        then renamed, so that a partial result in a shared directory
+        is never seen half written.
+
+        :param filepath: path to the file.
+        :type filepath: `str`
+        """
+        # The rows of the term matrix are in the order of the files.
+        documents = [[path, len(text_ids)] for path, text_ids
+                     in self._document_text_ids.iteritems()]
+        metadata = {'settings': self._get_settings(),
+                    'shard': list(self._shard or (0, 1)),
+                    'documents': documents}
+        temporary_filepath = '%s.%d.tmp' % (filepath, os.getpid())
+        self._term_matrix.save(temporary_filepath, metadata)
+        os.rename(temporary_filepath, filepath)
+
+    def _add_term_counts(self, term_matrix, filepath, term_counts):
+        """Adds the term counts of the texts in the file at `filepath`
+        to `term_matrix`.
+
+        :param term_matrix: the matrix to add the term counts to.
+        :type term_matrix: `bacalhau.term_matrix.TermMatrix`
+        :param filepath: path to the file.
+        :type filepath: `str`
+        :param term_counts: (text id, term counts) tuples, as returned
+            by `bacalhau.document.Document.get_term_counts`.
+        :type term_counts: `list`
+        """
+        for text_id, counts in term_counts:
+            term_matrix.add_text(text_id, counts)
+
+        self._document_text_ids[filepath] = [text_id for text_id, counts
+                                             in term_counts]
+
+    def add_document(self, filepath):
+        """Adds the file at `filepath` to the corpus, updating the term
+        counts without reading the rest of the corpus. If the file is
+        already in the corpus, it is read again.
+
+        Call `.update_topic_tree` to update a topic tree with the
+        change.
+
+        :param filepath: path to the file.
+        :type filepath: `str`
+        """
+        filepath = os.path.abspath(filepath)
+
+        if filepath in self._document_text_ids:
+            self.remove_document(filepath)
+
+        args = self._get_document_args()
+
+        with self._profile(self._get_ingestion_stage()):
+            if self._documents is None:
+                term_counts = _read_term_counts(filepath, args)
+            else:
+                document = _create_document(filepath, args)
+                term_counts = document.get_term_counts()
+                self._documents.append(document)
+
+            self._add_term_counts(self._term_matrix, filepath, term_counts)
+
+        self._text_count = self._get_text_count()
+
+    def remove_document(self, filepath):
+        """Removes the file at `filepath` from the corpus, updating the
+        term counts without reading the rest of the corpus.
+
+        Call `.update_topic_tree` to update a topic tree with the
+        change.
+
+        :param filepath: path to the file.
+        :type filepath: `str`
+        """
+        filepath = os.path.abspath(filepath)
+        # The rows of the term matrix are in the order of the files.
+        start = 0
+        for path, text_ids in self._document_text_ids.iteritems():
+            if path == filepath:
+                break
+            start += len(text_ids)
+
+        text_ids = self._document_text_ids.pop(filepath)
+        self._term_matrix.remove_rows(range(start, start + len(text_ids)))
+
+        if self._documents is not None:
+            self._documents = [document for document in self._documents
+                               if document.get_path() != filepath]
+
+        self._text_count = self._get_text_count()
+
+    def _get_filepaths(self):
+        """Returns the paths of the files in the corpus, in the order
+        they are found by `os.walk`; or, if the corpus is a shard,
+        the paths of the files in the shard, in sorted order.
+
+        :rtype: `list`
+        """
+        filepaths = []
 
         for (path, dirs, files) in os.walk(self._corpus_path):
             for filename in files:
-                document = self._document_class(
-                        os.path.join(path, filename), self._tokenizer,
-                        self._stopwords, **self._document_kwargs)
-                documents.append(document)
+                filepaths.append(os.path.join(path, filename))
 
-        return documents
+        if self._shard is not None:
+            index, count = self._shard
+            filepaths = sorted(filepaths)[index::count]
+
+        return filepaths
 
     def _get_text_count(self):
         """Returns the number of `bacalhau.text.Text` objects in this
@@ -66,14 +807,9 @@ class Corpus(object):
 
         :rtype: `float`
         """
-        count = 0
-
-        for document in self._documents:
-            count += document.get_text_count()
-
-        return float(count)
+        return float(self._term_matrix.get_text_count())
 
-    def generate_topic_tree(self, n_terms):
+    def generate_topic_tree(self, n_terms, compact=False, annotate=False):
         """Generates a `bacalhau.topic_tree.TopicTree` for the corpus,
         using a maximum of `n_terms` from each
         `bacalhau.text.Text`. First extracts top terms; second gets
@@ -83,15 +819,193 @@ class Corpus(object):
         :param n_terms: maximum number of terms to be used from each
             `Text`.
         :type n_terms: `int`
+        :param compact: whether to generate a
+            `bacalhau.compact_topic_tree.CompactTopicTree`, which can
+            not be updated by `.update_topic_tree`, defaults to False.
+        :type compact: `bool`
+        :param annotate: whether to annotate the nodes with the texts
+            they relate to as the tree is generated (see
+            `.annotate_topic_tree`), defaults to False.
+        :type annotate: `bool`
         :returns: the generated topic tree.
         :rtype: `bacalhau.topic_tree.TopicTree`
         """
         top_terms = self.get_top_terms(n_terms)
         hypernyms = self.get_hypernyms(top_terms)
-        tree = self.get_topic_tree(hypernyms)
+        tree = self.get_topic_tree(hypernyms, compact, annotate)
         self._hypernyms = hypernyms
+        self._path_counts = None
         return tree
 
+    def generate_topic_trees(self, settings, workers=1):
+        """Generates a topic tree for each of `settings`, and yields
+        them in the same order.
+
+        The TF.IDF values are computed, and the top terms selected,
+        once, for the largest number of terms; the hypernyms of those
+        terms are looked up once too. Since the top terms of each text
+        are ordered by decreasing TF.IDF, the top terms for a smaller
+        number are the first ones of that selection, so each tree only
+        costs building it from the hypernyms already looked up (and
+        pruning and compressing it).
+
+        Each item of `settings` is a dictionary with any of the keys
+        of `TREE_SETTINGS`, which gives their defaults: `n_terms`, the
+        maximum number of terms used from each text; `compress`,
+        whether to compress the tree, with `min_children`; `prune`,
+        the names of the nodes to remove from the tree before it is
+        compressed; and `compact` and `annotate`, as for
+        `.generate_topic_tree`.
+
+        :param settings: settings of each tree.
+        :type settings: `list`
+        :param workers: number of processes used to build the trees,
+            defaults to 1.
+        :type workers: `int`
+        :rtype: `generator`
+        """
+        settings = [self._get_tree_settings(tree_settings)
+                    for tree_settings in settings]
+        if not settings:
+            return
+
+        top_terms = self.get_top_terms(max(tree_settings['n_terms']
+                                           for tree_settings in settings))
+        args = (top_terms, self.get_hypernyms(top_terms))
+
+        if workers > 1:
+            pool = multiprocessing.Pool(workers, _init_tree_worker, (args,))
+            try:
+                for tree in pool.imap(_build_worker_tree, settings):
+                    yield tree
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for tree_settings in settings:
+                with self._profile('generate_topic_trees'):
+                    tree = _build_configured_tree(tree_settings, *args)
+                yield tree
+
+    def _get_tree_settings(self, settings):
+        """Returns `settings` with the defaults of `TREE_SETTINGS` for
+        the missing keys.
+
+        :param settings: settings of a tree.
+        :type settings: `dict`
+        :rtype: `dict`
+        """
+        unknown = set(settings) - set(TREE_SETTINGS)
+        if unknown:
+            raise ValueError('Unknown topic tree settings: %s' %
+                             ', '.join(sorted(unknown)))
+
+        return dict(TREE_SETTINGS, **settings)
+
+    def update_topic_tree(self, tree, n_terms):
+        """Updates `tree`, the (uncompressed) topic tree returned by
+        the last call to `.generate_topic_tree`, after documents have
+        been added to or removed from the corpus.
+
+        The top terms of every text are selected again, since the
+        TF.IDF values depend on the number of texts, but only the
+        hypernym paths of the (text, term) pairs that changed are
+        looked up, removed from, or added to the tree.
+
+        :param tree: topic tree to update.
+        :type tree: `bacalhau.topic_tree.TopicTree`
+        :param n_terms: maximum number of terms to be used from each
+            `Text`.
+        :type n_terms: `int`
+        :returns: the updated topic tree.
+        :rtype: `bacalhau.topic_tree.TopicTree`
+        """
+        if self._hypernyms is None:
+            raise ValueError('Only a topic tree generated by '
+                             'generate_topic_tree can be updated')
+
+        old_hypernyms = self._hypernyms
+        if self._path_counts is None:
+            self._path_counts = self._get_path_counts(old_hypernyms)
+        top_terms = self.get_top_terms(n_terms)
+        new_terms = defaultdict(list)
+        hypernyms = defaultdict(dict)
+
+        for text, terms in top_terms.iteritems():
+            for term in terms:
+                if term in old_hypernyms.get(text, {}):
+                    hypernyms[text][term] = old_hypernyms[text][term]
+                else:
+                    new_terms[text].append(term)
+
+        for text, data in self.get_hypernyms(new_terms).iteritems():
+            for term, hypernym in data.iteritems():
+                hypernyms[text][term] = hypernym
+                self._add_tree_path(tree, hypernym)
+
+        for text, data in old_hypernyms.iteritems():
+            for term, hypernym in data.iteritems():
+                if term not in hypernyms.get(text, {}):
+                    self._remove_tree_path(tree, hypernym)
+
+        self._hypernyms = hypernyms
+        return tree
+
+    def _get_path_counts(self, hypernyms):
+        """Returns the number of hypernym paths going through each
+        node and edge of the topic tree for `hypernyms`.
+
+        :param hypernyms: dictionary of hypernyms.
+        :type hypernyms: `dict`
+        :rtype: `collections.Counter`
+        """
+        path_counts = Counter()
+
+        for data in hypernyms.itervalues():
+            for hypernym in data.itervalues():
+                path_counts.update(hypernym)
+                path_counts.update(zip(hypernym[:-1], hypernym[1:]))
+
+        return path_counts
+
+    def _add_tree_path(self, tree, hypernym):
+        """Adds the path of `hypernym` to `tree`.
+
+        :param tree: topic tree of terms.
+        :type tree: `bacalhau.topic_tree.TopicTree`
+        :param hypernym: the hypernym path to add.
+        :type hypernym: `list`
+        """
+        tree.add_nodes_from(hypernym)
+        tree.node[hypernym[len(hypernym) - 1]]['is_leaf'] = True
+        tree.node[hypernym[0]]['is_root'] = True
+        tree.add_path(hypernym)
+        self._path_counts.update(hypernym)
+        self._path_counts.update(zip(hypernym[:-1], hypernym[1:]))
+
+    def _remove_tree_path(self, tree, hypernym):
+        """Removes the path of `hypernym` from `tree`, keeping the
+        nodes and edges that are in the path of another hypernym.
+
+        :param tree: topic tree of terms.
+        :type tree: `bacalhau.topic_tree.TopicTree`
+        :param hypernym: the hypernym path to remove.
+        :type hypernym: `list`
+        """
+        path_counts = self._path_counts
+
+        for edge in zip(hypernym[:-1], hypernym[1:]):
+            path_counts[edge] -= 1
+            if path_counts[edge] == 0:
+                del path_counts[edge]
+                tree.remove_edge(*edge)
+
+        for node in hypernym:
+            path_counts[node] -= 1
+            if path_counts[node] == 0:
+                del path_counts[node]
+                tree.remove_node(node)
+
     def get_top_terms(self, n_terms):
         """Returns a dictionary with the highest `n_terms` for each
         `bacalhau.text.Text` from the term data dictionary.
@@ -101,43 +1015,55 @@ class Corpus(object):
         :type n_terms: `int`
         :returns: `dict`
         """
-        term_data = self._add_tf_idf(self._get_term_data())
         top_terms = defaultdict(list)
-        top_terms_meta = defaultdict(dict)
 
-        for term, data in term_data.iteritems():
-            for text, v in data.iteritems():
-                count = len(top_terms[text])
-                tf_idf = v['tf.idf']
+        for text, scores in self.get_top_term_scores(n_terms).iteritems():
+            top_terms[text] = [term for term, tf_idf in scores]
 
-                if count < n_terms:
-                    top_terms[text].append(term)
-                    top_terms_meta[text][tf_idf] = term
-                else:
-                    lower_tf_idf = sorted(top_terms_meta[text])[0]
+        return top_terms
+
+    def get_top_term_scores(self, n_terms):
+        """Returns a dictionary with the highest `n_terms` for each
+        `bacalhau.text.Text`, and their TF.IDF values.
+
+        The terms of each text are ordered by decreasing TF.IDF;
+        terms with the same TF.IDF are ordered alphabetically, so the
+        selection does not depend on the order of the corpus files.
+
+        :param n_terms: maximum number of terms to be used from each
+            text.
+        :type n_terms: `int`
+        :returns: {text: [(term, tf.idf)]}.
+        :rtype: `dict`
+        """
+        with self._profile('get_top_terms'):
+            term_matrix = self._term_matrix
+            terms = term_matrix.get_terms()
+            text_ids = term_matrix.get_text_ids()
+            tf_idf = term_matrix.get_tf_idf()
+            top_terms = defaultdict(list)
 
-                    if tf_idf > lower_tf_idf:
-                        lower_term = top_terms_meta[text][lower_tf_idf]
-                        top_terms[text].remove(lower_term)
-                        top_terms[text].append(term)
-                        top_terms_meta[text].pop(lower_tf_idf)
-                        top_terms_meta[text][tf_idf] = term
+            selected = term_matrix.select_top(tf_idf, n_terms,
+                                              self._workers)
+            # Only the selected postings are converted to Python values.
+            postings = zip(term_matrix.get_rows()[selected].tolist(),
+                           term_matrix.get_counts()[1][selected].tolist(),
+                           tf_idf[selected].tolist())
+
+            for row, term_id, score in postings:
+                top_terms[text_ids[row]].append((terms[term_id], score))
 
         return top_terms
 
     def _get_term_data(self):
         """Returns term data for all of the
-        `bacalhau.document.Document` objects in this corpus.
+        `bacalhau.document.Document` objects in this corpus, as a
+        nested dictionary view of the corpus
+        `bacalhau.term_matrix.TermMatrix`.
 
         :rtype: `dict`
         """
-        term_data = defaultdict(dict)
-        for document in self._documents:
-            document_term_data = document.get_term_data()
-            for term, new_term_data in document_term_data.items():
-                term_data[term].update(new_term_data)
-
-        return term_data
+        return self._term_matrix.get_term_data()
 
     def _add_tf_idf(self, term_data):
         """Returns `term_data` with a TF.IDF value added to each
@@ -164,32 +1090,87 @@ class Corpus(object):
         :returns: {text: {term: hypernym}}.
         :rtype: `dict`
         """
+        if self._sense_selector is not None:
+            return self._get_selected_hypernyms(top_terms)
+
         hypernyms = defaultdict(dict)
         cache = {}
 
-        for text, terms in top_terms.iteritems():
-            for term in terms:
-                h = cache.get(term)
+        with self._profile('get_hypernyms'):
+            for text, terms in top_terms.iteritems():
+                for term in terms:
+                    h = cache.get(term)
 
-                if h is None:
-                    h = self._get_hypernym(term)
-                    h.reverse()
-                    cache[term] = h
+                    if h is None:
+                        h = self._get_cached_hypernym(term)
+                        h.reverse()
+                        cache[term] = h
 
-                hypernyms[text][term] = h
+                    hypernyms[text][term] = h
+
+            if self._hypernym_cache is not None:
+                self._hypernym_cache.sync()
 
         return hypernyms
 
-    def _get_hypernym(self, word):
-        """Returns a list of the hypernyms for the given word.
+    def _get_selected_hypernyms(self, top_terms):
+        """Returns a dictionary with the hypernyms for the given terms,
+        from the senses selected by the corpus
+        `bacalhau.sense_selector.SenseSelector`. The selection is
+        measured as the `select_senses` stage.
 
-        :param word: the word to get the hypernym for.
-        :type word: `str`
+        Each leaf is named after the term and its synset (such as
+        "pain (pain.n.04)"), since a term may be given different
+        senses in different texts, and a node of a topic tree has a
+        single parent. The name does not depend on the other terms
+        looked up, so trees updated by `.update_topic_tree` name their
+        leaves as new trees do.
+
+        :param top_terms: dict with term/text information.
+        :type top_terms: `dict`
+        :returns: {text: {term: hypernym}}.
+        :rtype: `dict`
+        """
+        hypernyms = defaultdict(dict)
+        # Synset name -> hypernym path from the synset to its root.
+        cache = {}
+
+        with self._profile('select_senses'):
+            senses = self._sense_selector.select_senses(
+                top_terms, self._term_matrix, self._pipeline)
+
+        with self._profile('get_hypernyms'):
+            for text, terms in top_terms.iteritems():
+                for term in terms:
+                    synset = senses[text][term]
+
+                    if synset is None:
+                        hypernyms[text][term] = [term]
+                        continue
+
+                    path = cache.get(synset.name)
+
+                    if path is None:
+                        path = self._get_synset_hypernym(synset)
+                        path.reverse()
+                        cache[synset.name] = path
+
+                    hypernyms[text][term] = path + [
+                        '%s (%s)' % (term, synset.name)]
+
+        return hypernyms
+
+    def _get_synset_hypernym(self, synset):
+        """Returns a list with the name of `synset` and of its
+        hypernyms, following the first hypernym of each synset.
+
+        :param synset: the synset to get the hypernyms for.
+        :type synset: `nltk.corpus.reader.wordnet.Synset`
         :rtype: `list`
         """
-        hypernym = [word]
+        hypernym = []
+        synsets = [synset]
 
-        synsets = nltk.corpus.wordnet.synsets(word)
         while len(synsets) > 0:
             s = synsets[0]
             hypernym.append(s.name)
@@ -197,44 +1178,86 @@ class Corpus(object):
 
         return hypernym
 
-    def get_topic_tree(self, hypernyms):
+    def _get_cached_hypernym(self, word):
+        """Returns a list of the hypernyms for the given word, from
+        the corpus `bacalhau.hypernym_cache.HypernymCache` if it has
+        one and the word is in it; otherwise from WordNet.
+
+        :param word: the word to get the hypernym for.
+        :type word: `str`
+        :rtype: `list`
+        """
+        if self._hypernym_cache is None:
+            return self._get_hypernym(word)
+
+        hypernym = self._hypernym_cache.get(word)
+
+        if hypernym is None:
+            hypernym = self._get_hypernym(word)
+            self._hypernym_cache.set(word, hypernym)
+
+        return hypernym
+
+    def _get_hypernym(self, word):
+        """Returns a list of the hypernyms for the given word, from
+        the corpus `bacalhau.wordnet_index.WordNetIndex` if it has one
+        and the word is a noun lemma in it; otherwise from WordNet.
+
+        :param word: the word to get the hypernym for.
+        :type word: `str`
+        :rtype: `list`
+        """
+        if self._wordnet_index is not None:
+            hypernym = self._wordnet_index.get_hypernym(word)
+
+            if hypernym is not None:
+                return hypernym
+
+        synsets = nltk.corpus.wordnet.synsets(word)
+
+        if not synsets:
+            return [word]
+
+        return [word] + self._get_synset_hypernym(synsets[0])
+
+    def get_topic_tree(self, hypernyms, compact=False, annotate=False):
         """Generates and returns a `bacalhau.topic_tree.TopicTree` for
         the given hypernyms.
 
         :param hypernyms: dictionary of hypernyms.
         :type hypernyms: `dict`
+        :param compact: whether to return a
+            `bacalhau.compact_topic_tree.CompactTopicTree` instead,
+            defaults to False.
+        :type compact: `bool`
+        :param annotate: whether to annotate the nodes with the texts
+            they relate to, defaults to False.
+        :type annotate: `bool`
         :rtype: `bacalhau.topic_tree.TopicTree`
         """
-        tree = TopicTree()
-
-        for text, data in hypernyms.iteritems():
-            for term, hypernym in data.iteritems():
-                tree.add_nodes_from(hypernym)
-                tree.node[hypernym[len(hypernym) - 1]]['is_leaf'] = True
-                tree.node[hypernym[0]]['is_root'] = True
-                tree.add_path(hypernym)
-
-        return tree
+        with self._profile('get_topic_tree'):
+            return _build_topic_tree(hypernyms, compact, annotate)
 
     def annotate_topic_tree(self, tree):
         """Annotates the nodes in the `bacalhau.topic_tree.TopicTree`
         with information about which `bacalhau.text.Text` and counts
         the nodes relate to.
 
+        Each node gets the (sorted, distinct) indices of its texts in
+        the `texts` attribute of the tree, and their number as its
+        count; see `bacalhau.topic_tree.TopicTree.add_text`.
+
         :param tree: topic tree of terms
         :type tree: `bacalhau.topic_tree.TopicTree`
         :rtype: `bacalhau.topic_tree.TopicTree`
         """
         hypernyms = self._hypernyms
 
-        for text, data in hypernyms.iteritems():
-            for hypernym in data.values():
-                for node in tree.nbunch_iter(hypernym):
-                    texts = tree.node[node].setdefault('texts', [])
-                    texts.append(text)
-
-                    if 'count' not in tree.node[node]:
-                        tree.node[node]['count'] = 0
-                    tree.node[node]['count'] += 1
+        with self._profile('annotate_topic_tree'):
+            for text, data in hypernyms.iteritems():
+                for hypernym in data.itervalues():
+                    for node in hypernym:
+                        if tree.has_node(node):
+                            tree.add_text(node, text)
 
         return tree
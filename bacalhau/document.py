@@ -1,13 +1,17 @@
 import abc
+from io import BytesIO
 import os
 
+from bacalhau.pipeline import Pipeline
+
 
 class Document:
     """Abstract class to read from/write to files. Different implementations
     should extend this class and override the abstract methods."""
     __metaclass__ = abc.ABCMeta
 
-    def __init__(self, filepath, tokenizer, stopwords):
+    def __init__(self, filepath, tokenizer, stopwords, pipeline=None,
+                 content=None):
         """Creates a new `Document` for the given file path.
 
         :param filepath: path to the file.
@@ -16,13 +20,26 @@ class Document:
         :type tokenizer: `nltk.tokenize.api.TokenizerI`
         :param stopwords: words to be removed from the texts.
         :type stopwords: `list`
+        :param pipeline: pipeline shared by the texts in a corpus to
+            count their terms, defaults to a new
+            `bacalhau.pipeline.Pipeline` for `tokenizer` and
+            `stopwords`.
+        :type pipeline: `bacalhau.pipeline.Pipeline`
+        :param content: content of the file, if it has already been
+            read, defaults to None; the file is then not opened.
+        :type content: `str`
         """
         self._path = os.path.abspath(filepath)
         self._document_id = os.path.splitext(os.path.basename(self._path))[0]
         self._base_filepath = os.path.splitext(self._path)[0]
         self._tokenizer = tokenizer
         self._stopwords = stopwords
+        if pipeline is None:
+            pipeline = Pipeline(tokenizer, stopwords)
+        self._pipeline = pipeline
+        self._content = content
         self._texts = self.get_texts()
+        self._content = None
 
     @abc.abstractmethod
     def get_texts(self):
@@ -42,6 +59,33 @@ class Document:
         """
         return
 
+    def _get_source(self):
+        """Returns the file to read the document from: a File-like
+        object with its content if it has already been read, or else
+        its path.
+
+        :rtype: `str` or `io.BytesIO`
+        """
+        if self._content is not None:
+            return BytesIO(self._content)
+        return self._path
+
+    def get_path(self):
+        """Returns the absolute path to the file of this document.
+
+        :rtype: `str`
+        """
+        return self._path
+
+    def get_term_counts(self):
+        """Returns the term counts of each `bacalhau.text.Text` within
+        this document, as a list of (text id, term counts) tuples.
+
+        :rtype: `list`
+        """
+        return [(text.get_text_id(), text.get_term_counts())
+                for text in self._texts]
+
     def get_text_count(self):
         """Returns the number of `bacalhau.text.Text` objects for this
         `.Document`.
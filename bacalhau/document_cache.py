@@ -0,0 +1,124 @@
+import hashlib
+import marshal
+import os
+import tempfile
+import zlib
+
+
+class DocumentCache(object):
+    """On disk cache of the term counts of the texts in each corpus
+    file, so that files that have not changed are not parsed and
+    tokenized again on later runs.
+
+    Entries are keyed by a hash of the name and content of the file,
+    and of the settings used to count the terms (document class and
+    arguments, tokenizer, stopwords, library and WordNet versions; see
+    `bacalhau.corpus.Corpus`). The file name is part of the key
+    because the stored text ids are built from it, so a copied or
+    renamed file is counted again, but the directory is not, so the
+    cache still hits when the corpus is moved or mounted elsewhere.
+
+    Entries are stored as zlib compressed `marshal` data, one file per
+    entry, written to a temporary file and renamed, so several
+    processes can share the same cache directory."""
+
+    def __init__(self, directory):
+        """Creates a new `.DocumentCache` in `directory`, which is
+        created if it does not exist.
+
+        :param directory: path to the cache directory.
+        :type directory: `str`
+        """
+        self._directory = os.path.abspath(directory)
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory)
+        self._hits = 0
+        self._misses = 0
+
+    def get_key(self, filepath, settings, content=None):
+        """Returns the cache key for the file at `filepath`, when its
+        terms are counted with `settings`.
+
+        :param filepath: path to the file; its name is part of the key
+            even if `content` is given.
+        :type filepath: `str`
+        :param settings: description of the settings used to count
+            the terms.
+        :type settings: `str`
+        :param content: content of the file, if it has already been
+            read, defaults to None.
+        :type content: `str`
+        :rtype: `str`
+        """
+        key = hashlib.sha1(settings)
+        key.update('\0%s\0' % os.path.basename(filepath))
+
+        if content is not None:
+            key.update(content)
+            return key.hexdigest()
+
+        with open(filepath, 'rb') as corpus_file:
+            for chunk in iter(lambda: corpus_file.read(1 << 20), ''):
+                key.update(chunk)
+
+        return key.hexdigest()
+
+    def _get_entry_path(self, key):
+        """Returns the path to the file of the entry for `key`.
+
+        :param key: cache key.
+        :type key: `str`
+        :rtype: `str`
+        """
+        return os.path.join(self._directory, key[:2], key)
+
+    def get(self, key):
+        """Returns the term counts stored for `key`, or None if there
+        are none.
+
+        :param key: cache key, as returned by `.get_key`.
+        :type key: `str`
+        :returns: (text id, term counts) tuples.
+        :rtype: `list`
+        """
+        try:
+            with open(self._get_entry_path(key), 'rb') as entry_file:
+                data = entry_file.read()
+        except IOError:
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        return marshal.loads(zlib.decompress(data))
+
+    def set(self, key, term_counts):
+        """Stores `term_counts` for `key`.
+
+        :param key: cache key, as returned by `.get_key`.
+        :type key: `str`
+        :param term_counts: (text id, term counts) tuples, as returned
+            by `bacalhau.document.Document.get_term_counts`.
+        :type term_counts: `list`
+        """
+        entry_path = self._get_entry_path(key)
+        entry_directory = os.path.dirname(entry_path)
+
+        if not os.path.isdir(entry_directory):
+            try:
+                os.makedirs(entry_directory)
+            except OSError:
+                # Created by another process in the meantime.
+                if not os.path.isdir(entry_directory):
+                    raise
+
+        handle, temporary_path = tempfile.mkstemp(dir=entry_directory)
+        with os.fdopen(handle, 'wb') as entry_file:
+            entry_file.write(zlib.compress(marshal.dumps(term_counts)))
+        os.rename(temporary_path, entry_path)
+
+    def get_statistics(self):
+        """Returns the number of cache hits and misses.
+
+        :rtype: `dict`
+        """
+        return {'hits': self._hits, 'misses': self._misses}
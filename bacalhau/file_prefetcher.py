@@ -0,0 +1,94 @@
+from collections import deque
+from itertools import islice
+import Queue
+import sys
+import threading
+
+
+class FilePrefetcher(object):
+    """Reads the content of files ahead of their use, in background
+    threads, so that waiting on storage (for instance a network
+    mount) overlaps with processing the files already read.
+
+    At most `depth` files are read, or being read, ahead of the file
+    being processed, which bounds the memory used by the prefetched
+    content. Files are yielded in the order of their paths; if a file
+    can not be read, the error is raised when its turn comes."""
+
+    def __init__(self, filepaths, depth=8, threads=None):
+        """Creates a new `.FilePrefetcher` for `filepaths`.
+
+        :param filepaths: paths of the files to read.
+        :type filepaths: `list`
+        :param depth: maximum number of files read ahead, defaults to
+            8.
+        :type depth: `int`
+        :param threads: number of threads reading the files, defaults
+            to `depth`, up to 4.
+        :type threads: `int`
+        """
+        if depth < 1:
+            raise ValueError('The prefetch depth must be at least 1')
+
+        self._filepaths = filepaths
+        self._depth = depth
+        self._threads = threads or min(depth, 4)
+
+    def __iter__(self):
+        """Yields (file path, content) tuples, in the order of the
+        file paths."""
+        tasks = Queue.Queue()
+        # (file path, result queue) of the files requested, in order.
+        pending = deque()
+        threads = [threading.Thread(target=self._read_files, args=(tasks,))
+                   for i in xrange(self._threads)]
+
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        filepaths = iter(self._filepaths)
+
+        def request(filepath):
+            result = Queue.Queue(1)
+            tasks.put((filepath, result))
+            pending.append((filepath, result))
+
+        try:
+            for filepath in islice(filepaths, self._depth):
+                request(filepath)
+
+            while pending:
+                filepath, result = pending.popleft()
+                content, exc_info = result.get()
+
+                for next_filepath in islice(filepaths, 1):
+                    request(next_filepath)
+
+                if exc_info is not None:
+                    raise exc_info[0], exc_info[1], exc_info[2]
+
+                yield filepath, content
+        finally:
+            for thread in threads:
+                tasks.put(None)
+
+    def _read_files(self, tasks):
+        """Reads the files requested in `tasks` until it gets None, and
+        puts their content, or the error raised while reading them, in
+        their result queue.
+
+        :param tasks: (file path, result queue) of the files to read.
+        :type tasks: `Queue.Queue`
+        """
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+
+            filepath, result = task
+            try:
+                with open(filepath, 'rb') as input_file:
+                    result.put((input_file.read(), None))
+            except Exception:
+                result.put((None, sys.exc_info()))
@@ -0,0 +1,161 @@
+import re
+import sqlite3
+import time
+
+from nltk.corpus import wordnet
+
+
+def get_wordnet_version():
+    """Returns the version of the installed WordNet.
+
+    `nltk.corpus.wordnet.get_version` reads it from a file handle
+    shared with the synset lookups, and returns None once that has
+    been used, so the version is read from a new handle instead.
+
+    :rtype: `str`
+    """
+    data_file = wordnet.open('data.adj')
+    try:
+        for line in data_file:
+            match = re.search(r'WordNet (\d+\.\d+) Copyright', line)
+            if match is not None:
+                return match.group(1)
+    finally:
+        data_file.close()
+
+
+class HypernymCache(object):
+    """Persistent cache of WordNet hypernym paths, stored in an SQLite
+    database so that it can be reused by later runs, and shared by
+    concurrent ones.
+
+    Paths are keyed by lemma and WordNet version. New paths, and the
+    use of cached ones, are written in a single transaction by
+    `.sync`; when the cache holds more than `max_size` paths, the
+    least recently used ones are removed."""
+
+    def __init__(self, path, max_size=None, version=None, timeout=60):
+        """Creates a new `.HypernymCache`, backed by the SQLite
+        database at `path`. The database is created if it does not
+        exist.
+
+        :param path: path to the database file.
+        :type path: `str`
+        :param max_size: maximum number of paths to keep, defaults to
+            no limit.
+        :type max_size: `int`
+        :param version: WordNet version the paths belong to, defaults
+            to the version of the installed WordNet.
+        :type version: `str`
+        :param timeout: seconds to wait for other processes to
+            release the database, defaults to 60.
+        :type timeout: `float`
+        """
+        self._path = path
+        self._max_size = max_size
+        self._version = version or get_wordnet_version()
+        self._connection = sqlite3.connect(path, timeout=timeout)
+        self._connection.text_factory = str
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS hypernyms ('
+                'lemma TEXT NOT NULL, version TEXT NOT NULL, '
+                'path TEXT NOT NULL, last_used REAL NOT NULL, '
+                'PRIMARY KEY (lemma, version))')
+            self._connection.execute(
+                'CREATE INDEX IF NOT EXISTS hypernyms_last_used '
+                'ON hypernyms (last_used)')
+        # Paths added, and lemmas read, since the last sync.
+        self._new = {}
+        self._used = set()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, lemma):
+        """Returns the cached hypernym path for `lemma`, or None if it
+        is not in the cache.
+
+        :param lemma: the lemma to get the path for.
+        :type lemma: `str`
+        :rtype: `list`
+        """
+        path = self._new.get(lemma)
+
+        if path is None:
+            row = self._connection.execute(
+                'SELECT path FROM hypernyms WHERE lemma = ? AND version = ?',
+                (lemma, self._version)).fetchone()
+
+            if row is not None:
+                path = row[0]
+                self._used.add(lemma)
+
+        if path is None:
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        return path.split(' ')
+
+    def set(self, lemma, path):
+        """Adds the hypernym path for `lemma` to the cache. The path
+        is stored on the next `.sync`.
+
+        :param lemma: the lemma the path belongs to.
+        :type lemma: `str`
+        :param path: the hypernym path.
+        :type path: `list`
+        """
+        self._new[lemma] = ' '.join(path)
+
+    def sync(self):
+        """Writes the paths added since the last call to the database,
+        marks the paths read as recently used, and evicts the least
+        recently used paths if the cache is over its size."""
+        now = time.time()
+
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO hypernyms VALUES (?, ?, ?, ?)',
+                [(lemma, self._version, path, now)
+                 for lemma, path in self._new.iteritems()])
+            self._connection.executemany(
+                'UPDATE hypernyms SET last_used = ? '
+                'WHERE lemma = ? AND version = ?',
+                [(now, lemma, self._version) for lemma in self._used])
+
+            if self._max_size is not None:
+                excess = self.get_size() - self._max_size
+
+                if excess > 0:
+                    self._connection.execute(
+                        'DELETE FROM hypernyms WHERE rowid IN '
+                        '(SELECT rowid FROM hypernyms '
+                        'ORDER BY last_used LIMIT ?)', (excess,))
+
+        self._new = {}
+        self._used = set()
+
+    def get_size(self):
+        """Returns the number of paths in the database, for all
+        WordNet versions.
+
+        :rtype: `int`
+        """
+        return self._connection.execute(
+            'SELECT COUNT(*) FROM hypernyms').fetchone()[0]
+
+    def get_statistics(self):
+        """Returns the number of cache hits and misses since this
+        `.HypernymCache` was created, and the current size of the
+        cache.
+
+        :rtype: `dict`
+        """
+        return {'hits': self._hits, 'misses': self._misses,
+                'size': self.get_size()}
+
+    def close(self):
+        """Writes any pending changes and closes the database."""
+        self.sync()
+        self._connection.close()
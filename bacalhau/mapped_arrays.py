@@ -0,0 +1,131 @@
+import json
+import mmap
+import struct
+
+import numpy as np
+
+
+def write_arrays(filepath, magic, version, arrays, metadata=None):
+    """Writes `arrays` to the file at `filepath`, in a format that
+    `read_arrays` maps into memory.
+
+    The file starts with `magic`, followed by the length of a JSON
+    header (as a little endian 32 bit integer) and the header itself,
+    which holds `version`, the data type, offset and length of each
+    array and `metadata`. The arrays follow, each starting at a
+    multiple of 8 bytes.
+
+    :param filepath: path to the file.
+    :type filepath: `str`
+    :param magic: bytes that identify the format of the file.
+    :type magic: `str`
+    :param version: version of the format.
+    :type version: `int`
+    :param arrays: (name, array) tuples.
+    :type arrays: `list`
+    :param metadata: JSON serialisable data to keep in the header,
+        defaults to none.
+    :type metadata: `dict`
+    """
+    header = {'version': version, 'sections': {}}
+    if metadata is not None:
+        header['metadata'] = metadata
+
+    offset = 0
+    for name, values in arrays:
+        header['sections'][name] = [values.dtype.str, offset, len(values)]
+        offset = _align(offset + values.nbytes)
+    header = json.dumps(header)
+
+    with open(filepath, 'wb') as output_file:
+        output_file.write(magic)
+        output_file.write(struct.pack('<I', len(header)))
+        output_file.write(header)
+        position = len(magic) + 4 + len(header)
+        output_file.write('\0' * (_align(position) - position))
+
+        for name, values in arrays:
+            output_file.write(values.tostring())
+            output_file.write('\0' * (_align(values.nbytes) - values.nbytes))
+
+
+def read_arrays(filepath, magic, version):
+    """Maps the file at `filepath`, written by `write_arrays`, into
+    memory, and returns the mapping, the arrays, as `numpy` views of
+    the mapping (so nothing is copied, and processes that map the
+    same file share its pages), and the metadata.
+
+    Raises a ValueError if the file does not start with `magic`, or
+    is not of `version`.
+
+    :param filepath: path to the file.
+    :type filepath: `str`
+    :param magic: bytes that identify the format of the file.
+    :type magic: `str`
+    :param version: version of the format.
+    :type version: `int`
+    :returns: (mapping, {name: array}, metadata).
+    :rtype: `tuple`
+    """
+    with open(filepath, 'rb') as input_file:
+        mapping = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    header_start = len(magic) + 4
+    if mapping[:len(magic)] != magic:
+        mapping.close()
+        raise ValueError('Unknown file format: %s' % filepath)
+
+    header_length = struct.unpack('<I', mapping[len(magic):header_start])[0]
+    header = json.loads(mapping[header_start:header_start + header_length])
+    if header['version'] != version:
+        mapping.close()
+        raise ValueError('Unsupported file format version %s: %s' %
+                         (header['version'], filepath))
+
+    data_start = _align(header_start + header_length)
+    arrays = {}
+    for name, (dtype, offset, count) in header['sections'].iteritems():
+        arrays[str(name)] = np.frombuffer(mapping, dtype=str(dtype),
+                                          count=count,
+                                          offset=data_start + offset)
+
+    return mapping, arrays, header.get('metadata')
+
+
+def get_string_table(strings):
+    """Returns the concatenated bytes of `strings`, and the offsets of
+    each string in them.
+
+    :param strings: strings of the table.
+    :type strings: `list`
+    :rtype: `tuple`
+    """
+    offsets = np.zeros(len(strings) + 1, dtype='<i8')
+    np.cumsum([len(string) for string in strings], out=offsets[1:])
+    return np.frombuffer(''.join(strings), dtype='u1'), offsets
+
+
+def get_strings(blob, offsets):
+    """Returns all the strings of a string table.
+
+    :param blob: concatenated bytes of the strings.
+    :type blob: `numpy.ndarray`
+    :param offsets: offsets of the strings in `blob`.
+    :type offsets: `numpy.ndarray`
+    :rtype: `list`
+    """
+    blob = blob.tostring()
+    offsets = offsets.tolist()
+    return [blob[offsets[index]:offsets[index + 1]]
+            for index in xrange(len(offsets) - 1)]
+
+
+def _align(position):
+    """Returns `position` rounded up to a multiple of 8 bytes, where
+    the arrays start.
+
+    :param position: position in the file.
+    :type position: `int`
+    :rtype: `int`
+    """
+    return (position + 7) & ~7
@@ -0,0 +1,137 @@
+from collections import Counter
+import re
+
+from nltk.tokenize.regexp import WordPunctTokenizer
+
+from bacalhau.token_cache import TokenCache
+
+
+class Pipeline(object):
+    """Tokenizes the content of `bacalhau.text.Text`\s and reduces it to
+    term counts.
+
+    A `.Pipeline` is built once per corpus and shared by all its
+    texts: it holds the tokenizer, the stopwords (as a `frozenset`),
+    the compiled check for non alphabetical tokens and the
+    `bacalhau.token_cache.TokenCache` used to check and lemmatize
+    nouns, so that no per text setup is needed and each token is
+    checked in constant time.
+
+    With `fast_tokenization`, the content is split with a compiled
+    regular expression instead of the tokenizer, and only the distinct
+    tokens of each content are checked and lemmatised (so the token
+    cache is consulted once per distinct token, rather than once per
+    token). This is only done for a
+    `nltk.tokenize.regexp.WordPunctTokenizer`, whose alphabetical
+    tokens are exactly the runs of word characters that the
+    expression finds, so the term counts are the same."""
+
+    NON_ALPHABETIC = re.compile(r'[^A-Za-z]')
+    # The word tokens of `nltk.tokenize.regexp.WordPunctTokenizer`,
+    # with the same flags.
+    WORDS = re.compile(r'\w+', re.UNICODE | re.MULTILINE | re.DOTALL)
+
+    def __init__(self, tokenizer, stopwords, token_cache=None,
+                 fast_tokenization=False):
+        """Creates a new `.Pipeline`.
+
+        :param tokenizer: tokenizer used to tokenize the texts.
+        :type tokenizer: `nltk.tokenize.api.TokenizerI`
+        :param stopwords: words to be removed from the texts.
+        :type stopwords: `list`
+        :param token_cache: cache of the WordNet lookups for each
+            token, defaults to a new
+            `bacalhau.token_cache.TokenCache`.
+        :type token_cache: `bacalhau.token_cache.TokenCache`
+        :param fast_tokenization: whether to count the terms with a
+            compiled regular expression and `collections.Counter`
+            instead of the tokenizer, defaults to False. The tokenizer
+            must be a `nltk.tokenize.regexp.WordPunctTokenizer`.
+        :type fast_tokenization: `bool`
+        """
+        if fast_tokenization and not isinstance(tokenizer,
+                                                WordPunctTokenizer):
+            raise ValueError('Fast tokenization requires a '
+                             'WordPunctTokenizer, not %r' % tokenizer)
+
+        self._tokenizer = tokenizer
+        self._stopwords = frozenset(stopwords)
+        if token_cache is None:
+            token_cache = TokenCache()
+        self._token_cache = token_cache
+        self._fast_tokenization = fast_tokenization
+
+    def get_token_cache(self):
+        """Returns the `bacalhau.token_cache.TokenCache` used by this
+        pipeline.
+
+        :rtype: `bacalhau.token_cache.TokenCache`
+        """
+        return self._token_cache
+
+    def get_term_counts(self, content):
+        """Returns the number of times each (lemmatised) term occurs
+        in `content`. Only valid tokens (see `.is_valid_token`) are
+        counted.
+
+        :param content: the (lowercased) content to count the terms
+            of.
+        :type content: `str`
+        :rtype: `dict`
+        """
+        if self._fast_tokenization:
+            return self._get_fast_term_counts(content)
+
+        term_counts = {}
+        stopwords = self._stopwords
+        non_alphabetic = self.NON_ALPHABETIC.search
+        token_cache = self._token_cache
+
+        for token in self._tokenizer.tokenize(content):
+            if token in stopwords or non_alphabetic(token):
+                continue
+            if token_cache.is_noun(token):
+                lemma = token_cache.lemmatize(token)
+                term_counts[lemma] = term_counts.get(lemma, 0) + 1
+
+        return term_counts
+
+    def _get_fast_term_counts(self, content):
+        """Returns the number of times each (lemmatised) term occurs
+        in `content`, counting its word tokens first, and then
+        checking each distinct token once.
+
+        :param content: the (lowercased) content to count the terms
+            of.
+        :type content: `str`
+        :rtype: `dict`
+        """
+        term_counts = {}
+        stopwords = self._stopwords
+        non_alphabetic = self.NON_ALPHABETIC.search
+        token_cache = self._token_cache
+
+        for token, count in Counter(self.WORDS.findall(content)).iteritems():
+            if token in stopwords or non_alphabetic(token):
+                continue
+            if token_cache.is_noun(token):
+                lemma = token_cache.lemmatize(token)
+                term_counts[lemma] = term_counts.get(lemma, 0) + count
+
+        return term_counts
+
+    def is_valid_token(self, token):
+        """Checks if the `token` is suitable for processing. A token is
+        suitable if: it is not in the list of stopwords; it is composed of
+        alphabetical character; and is a considered a noun by WordNet.
+
+        :param token: the token to validate.
+        :type token: `str`
+        :returns: True if `token` is valid.
+        :rtype: `bool`
+        """
+        if token in self._stopwords:
+            return False
+        if self.NON_ALPHABETIC.search(token):
+            return False
+        return self._token_cache.is_noun(token)
@@ -0,0 +1,173 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import resource
+import sys
+import time
+
+
+class Profiler(object):
+    """Records the wall time, number of calls, peak memory and cache
+    hit rates of the stages of a `bacalhau.corpus.Corpus` run.
+
+    Each stage is measured with `.profile`; the measurements of every
+    call are passed to the hooks added with `.add_hook` (for instance
+    to export them as metrics), and added up by stage, in the order
+    the stages first ran, for `.get_statistics` and `.get_report`.
+
+    Peak memory is the maximum resident set size of the process when
+    the stage ends. Cache hit rates are those of the calls to the
+    caches (see `bacalhau.token_cache.TokenCache`,
+    `bacalhau.hypernym_cache.HypernymCache` and
+    `bacalhau.document_cache.DocumentCache`) made during the stage by
+    this process; lookups made by worker processes are not seen."""
+
+    def __init__(self):
+        """Creates a new `.Profiler`, with no stages and no hooks."""
+        # Stage -> statistics, in the order the stages first ran.
+        self._stages = OrderedDict()
+        self._hooks = []
+
+    def add_hook(self, hook):
+        """Adds a function to be called with the name of the stage and
+        its measurements (a `dict` with `time`, `peak_memory` and
+        `caches`, as in `.get_statistics`) each time a stage ends.
+
+        :param hook: function to call.
+        :type hook: `function`
+        """
+        self._hooks.append(hook)
+
+    @contextmanager
+    def profile(self, stage, caches=None):
+        """Returns a context manager that measures the code it runs as
+        a call to `stage`. A call that raises an exception is measured
+        up to the exception.
+
+        :param stage: name of the stage.
+        :type stage: `str`
+        :param caches: name -> cache, for the caches to get the hit
+            rates of, defaults to none.
+        :type caches: `dict`
+        """
+        caches = dict((name, cache) for name, cache
+                      in (caches or {}).iteritems() if cache is not None)
+        before = self._get_cache_statistics(caches)
+        start = time.time()
+
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            after = self._get_cache_statistics(caches)
+            cache_counts = {}
+            for name, (hits, misses) in after.iteritems():
+                hits -= before[name][0]
+                misses -= before[name][1]
+                if hits or misses:
+                    cache_counts[name] = {'hits': hits, 'misses': misses}
+
+            measurements = {'time': elapsed,
+                            'peak_memory': get_peak_memory(),
+                            'caches': cache_counts}
+            self._add(stage, measurements)
+
+            for hook in self._hooks:
+                hook(stage, measurements)
+
+    def _get_cache_statistics(self, caches):
+        """Returns the hits and misses of each of `caches`.
+
+        :param caches: name -> cache.
+        :type caches: `dict`
+        :returns: name -> (hits, misses).
+        :rtype: `dict`
+        """
+        statistics = {}
+
+        for name, cache in caches.iteritems():
+            cache_statistics = cache.get_statistics()
+            statistics[name] = (cache_statistics['hits'],
+                                cache_statistics['misses'])
+
+        return statistics
+
+    def _add(self, stage, measurements):
+        """Adds the measurements of a call to `stage` to its
+        statistics.
+
+        :param stage: name of the stage.
+        :type stage: `str`
+        :param measurements: measurements of the call.
+        :type measurements: `dict`
+        """
+        statistics = self._stages.get(stage)
+
+        if statistics is None:
+            statistics = self._stages[stage] = {
+                'calls': 0, 'time': 0.0, 'peak_memory': 0, 'caches': {}}
+
+        statistics['calls'] += 1
+        statistics['time'] += measurements['time']
+        statistics['peak_memory'] = max(statistics['peak_memory'],
+                                        measurements['peak_memory'])
+
+        for name, counts in measurements['caches'].iteritems():
+            cache = statistics['caches'].setdefault(
+                name, {'hits': 0, 'misses': 0})
+            cache['hits'] += counts['hits']
+            cache['misses'] += counts['misses']
+
+    def get_statistics(self):
+        """Returns the statistics of each stage, in the order the
+        stages first ran: the number of `calls`, the total `time` in
+        seconds, the `peak_memory` in bytes, and the `hits` and
+        `misses` of each cache used in the stage, with their
+        `hit_rate`.
+
+        :rtype: `collections.OrderedDict`
+        """
+        stages = OrderedDict()
+
+        for stage, statistics in self._stages.iteritems():
+            caches = {}
+            for name, counts in statistics['caches'].iteritems():
+                caches[name] = dict(counts, hit_rate=float(counts['hits']) /
+                                    (counts['hits'] + counts['misses']))
+            stages[stage] = dict(statistics, caches=caches)
+
+        return stages
+
+    def get_report(self):
+        """Returns a table with the statistics of each stage.
+
+        :rtype: `str`
+        """
+        lines = ['%-30s %6s %10s %12s  %s' % (
+            'stage', 'calls', 'time (s)', 'memory (MB)', 'cache hit rates')]
+
+        for stage, statistics in self.get_statistics().iteritems():
+            caches = ', '.join(
+                '%s %.1f%% (%d/%d)' % (
+                    name, 100 * counts['hit_rate'], counts['hits'],
+                    counts['hits'] + counts['misses'])
+                for name, counts in sorted(statistics['caches'].items()))
+            lines.append(('%-30s %6d %10.3f %12.1f  %s' % (
+                stage, statistics['calls'], statistics['time'],
+                statistics['peak_memory'] / float(1 << 20), caches)).rstrip())
+
+        return '\n'.join(lines)
+
+
+def get_peak_memory():
+    """Returns the maximum resident set size of this process so far, in
+    bytes.
+
+    :rtype: `int`
+    """
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports kilobytes, OS X bytes.
+    if sys.platform != 'darwin':
+        peak_memory *= 1024
+
+    return peak_memory
@@ -0,0 +1,231 @@
+import abc
+
+from nltk.corpus import wordnet
+import numpy as np
+
+
+class SenseSelector(object):
+    """Selects the WordNet sense (synset) of the top terms of each
+    text, from which `bacalhau.corpus.Corpus` builds their hypernym
+    paths.
+
+    Senses are selected for all the texts of a corpus in a single
+    call, so that implementations can score the candidate senses of
+    every term in one batch."""
+    __metaclass__ = abc.ABCMeta
+
+    @abc.abstractmethod
+    def select_senses(self, top_terms, term_matrix, pipeline):
+        """Returns the sense selected for each term of each text.
+
+        :param top_terms: the terms of each text, as returned by
+            `bacalhau.corpus.Corpus.get_top_terms`.
+        :type top_terms: `dict`
+        :param term_matrix: term counts of the texts of the corpus.
+        :type term_matrix: `bacalhau.term_matrix.TermMatrix`
+        :param pipeline: pipeline used to reduce the corpus texts to
+            terms.
+        :type pipeline: `bacalhau.pipeline.Pipeline`
+        :returns: {text: {term: synset}}, with None for the terms
+            that have no synset.
+        :rtype: `dict`
+        """
+        return
+
+    def _get_candidates(self, term):
+        """Returns the candidate senses of `term`, in WordNet order.
+
+        :param term: the term to get the senses of.
+        :type term: `str`
+        :rtype: `list`
+        """
+        return wordnet.synsets(term)
+
+
+class FirstSenseSelector(SenseSelector):
+    """Selects the first WordNet sense of each term, whatever the
+    text; this is the sense `bacalhau.corpus.Corpus` uses when it has
+    no `.SenseSelector`."""
+
+    def select_senses(self, top_terms, term_matrix, pipeline):
+        senses = {}
+        cache = {}
+
+        for text, terms in top_terms.iteritems():
+            text_senses = senses[text] = {}
+
+            for term in terms:
+                if term not in cache:
+                    candidates = self._get_candidates(term)
+                    cache[term] = candidates[0] if candidates else None
+
+                text_senses[term] = cache[term]
+
+        return senses
+
+
+class OverlapSenseSelector(SenseSelector):
+    """Selects the sense of each term with the largest overlap between
+    its signature and the terms of the text, weighted by their TF.IDF
+    (a simplified Lesk algorithm). Ties, including terms with no
+    overlap at all, go to the first sense.
+
+    The signature of a sense is the set of corpus terms in its
+    definition, examples and lemma names, and in the lemma names of
+    its hypernyms and hyponyms, reduced to terms by the corpus
+    `bacalhau.pipeline.Pipeline`. Signatures are computed once per
+    sense and kept by the selector.
+
+    The scores of all the candidate senses of all the texts are
+    computed at once with `numpy`: each (candidate, signature term)
+    pair is looked up in the sorted (text, term) postings of the
+    `bacalhau.term_matrix.TermMatrix`, and the TF.IDF values found are
+    summed per candidate."""
+
+    def __init__(self):
+        """Creates a new `.OverlapSenseSelector`."""
+        # Synset name -> terms of its signature.
+        self._signatures = {}
+
+    def _get_signature(self, synset, pipeline):
+        """Returns the terms in the signature of `synset`.
+
+        :param synset: the synset to get the signature of.
+        :type synset: `nltk.corpus.reader.wordnet.Synset`
+        :param pipeline: pipeline used to reduce the signature to
+            terms.
+        :type pipeline: `bacalhau.pipeline.Pipeline`
+        :rtype: `list`
+        """
+        signature = self._signatures.get(synset.name)
+
+        if signature is None:
+            words = [synset.definition] + list(synset.examples)
+            for related in [synset] + synset.hypernyms() + synset.hyponyms():
+                words.extend(name.replace('_', ' ')
+                             for name in related.lemma_names)
+            signature = pipeline.get_term_counts(' '.join(words).lower())
+            signature = self._signatures[synset.name] = list(signature)
+
+        return signature
+
+    def _get_candidates(self, term):
+        """Returns the candidate senses of `term`: its noun senses,
+        since the corpus terms are nouns, or all its senses if it has
+        none.
+
+        :param term: the term to get the senses of.
+        :type term: `str`
+        :rtype: `list`
+        """
+        return (wordnet.synsets(term, pos=wordnet.NOUN) or
+                super(OverlapSenseSelector, self)._get_candidates(term))
+
+    def select_senses(self, top_terms, term_matrix, pipeline):
+        term_ids = dict((term, term_id) for term_id, term
+                        in enumerate(term_matrix.get_terms()))
+        text_rows = dict((text_id, row) for row, text_id
+                         in enumerate(term_matrix.get_text_ids()))
+        term_count = len(term_ids)
+        candidate_cache = {}
+        # One entry per (text, term) pair, and per candidate sense.
+        pairs = []
+        pair_candidates = []
+        candidates = []
+        candidate_ranks = []
+        # Candidate, and (row * term count + term id), of each
+        # signature term.
+        signature_candidates = []
+        signature_terms = []
+
+        for text, terms in top_terms.iteritems():
+            row = text_rows[text]
+
+            for term in terms:
+                if term not in candidate_cache:
+                    candidate_cache[term] = [
+                        (synset, [term_ids[signature_term] for signature_term
+                                  in self._get_signature(synset, pipeline)
+                                  if signature_term in term_ids])
+                        for synset in self._get_candidates(term)]
+
+                pair = len(pairs)
+                pairs.append((text, term))
+
+                for rank, (synset, signature) in enumerate(
+                        candidate_cache[term]):
+                    candidate = len(candidates)
+                    candidates.append(synset)
+                    pair_candidates.append(pair)
+                    candidate_ranks.append(rank)
+                    signature_candidates.extend([candidate] * len(signature))
+                    signature_terms.extend(
+                        row * term_count + term_id for term_id in signature)
+
+        scores = self._get_scores(term_matrix, len(candidates),
+                                  np.array(signature_candidates, dtype=int),
+                                  np.array(signature_terms, dtype=np.int64))
+        selected = self._select(np.array(pair_candidates, dtype=int),
+                                np.array(candidate_ranks, dtype=int), scores)
+
+        senses = dict((text, {}) for text in top_terms)
+        for text, term in pairs:
+            senses[text][term] = None
+        for pair, candidate in selected:
+            text, term = pairs[pair]
+            senses[text][term] = candidates[candidate]
+
+        return senses
+
+    def _get_scores(self, term_matrix, count, candidates, keys):
+        """Returns the score of each of the `count` candidate senses:
+        the sum of the TF.IDF of the postings in `keys`.
+
+        :param term_matrix: term counts of the texts of the corpus.
+        :type term_matrix: `bacalhau.term_matrix.TermMatrix`
+        :param count: number of candidate senses.
+        :type count: `int`
+        :param candidates: candidate of each signature term.
+        :type candidates: `numpy.ndarray`
+        :param keys: (row * term count + term id) of each signature
+            term.
+        :type keys: `numpy.ndarray`
+        :rtype: `numpy.ndarray`
+        """
+        indices = term_matrix.get_counts()[1]
+
+        if not len(indices):
+            return np.zeros(count)
+
+        posting_keys = (term_matrix.get_rows().astype(np.int64) *
+                        term_matrix.get_term_count() + indices)
+        order = np.argsort(posting_keys)
+        posting_keys = posting_keys[order]
+        tf_idf = term_matrix.get_tf_idf()[order]
+
+        positions = np.searchsorted(posting_keys, keys)
+        positions[positions == len(posting_keys)] = 0
+        found = posting_keys[positions] == keys
+
+        return np.bincount(candidates[found], weights=tf_idf[positions[found]],
+                           minlength=count)
+
+    def _select(self, pairs, ranks, scores):
+        """Returns (pair, candidate) tuples with the candidate of
+        highest score of each (text, term) pair; ties go to the
+        candidate of lowest rank.
+
+        :param pairs: (text, term) pair of each candidate.
+        :type pairs: `numpy.ndarray`
+        :param ranks: rank of each candidate among the senses of its
+            term.
+        :type ranks: `numpy.ndarray`
+        :param scores: score of each candidate.
+        :type scores: `numpy.ndarray`
+        :rtype: `list`
+        """
+        order = np.lexsort((ranks, -scores, pairs))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = pairs[order][1:] != pairs[order][:-1]
+        selected = order[first]
+        return zip(pairs[selected].tolist(), selected.tolist())
@@ -0,0 +1,198 @@
+from bacalhau.tei_document import TEIDocument
+from lxml import etree
+import re
+
+
+class StreamingTEIDocument (TEIDocument):
+    """Implementation of `bacalhau.tei_document.TEIDocument` for very
+    large TEI files, which are read with `lxml.etree.iterparse`
+    instead of being loaded as a whole.
+
+    Only simple XPaths can be streamed: location paths of element
+    steps (a name or `*`, optionally prefixed by a namespace from
+    `ns_map`) joined by `/` or `//`, each with any number of
+    `[@attribute = "value"]` predicates; for example
+    `//tei:body/tei:div[@type = "dummy"]`. Each matched element is
+    reduced to the term counts of its `bacalhau.text.Text` and then
+    cleared, along with everything that precedes it, so that memory
+    is bounded by the largest text unit rather than by the file. Any
+    other XPath falls back to the full tree of
+    `bacalhau.tei_document.TEIDocument`."""
+
+    STEP = re.compile(r'(//?)([^/\[]+((?:\[[^\]]*\])*))')
+    NAME = re.compile(r'^(?:(\w[\w.-]*):)?(\w[\w.-]*|\*)$')
+    PREDICATE = re.compile(
+        r'\[\s*@(?:(\w[\w.-]*):)?(\w[\w.-]*)\s*=\s*'
+        r'(?:"([^"]*)"|\'([^\']*)\')\s*\]')
+
+    def get_texts(self):
+        """Returns a list of `bacalhau.text.Text` objects within this
+        document, with their terms already counted.
+
+        :returns: `bacalhau.text.Text` objects within this document.
+        :rtype: `list`
+        """
+        steps = self._get_steps()
+
+        if steps is None:
+            return super(StreamingTEIDocument, self).get_texts()
+
+        # Texts are added when their elements end, but are returned
+        # in document order, as with the XPath.
+        texts = []
+        # Matched elements that have started, but not ended.
+        open_elements = []
+        # Matched element that has ended, but whose tail (included in
+        # its content) may not have been parsed yet.
+        pending = None
+
+        for event, element in etree.iterparse(
+                self._get_source(), events=('start', 'end')):
+            if pending is not None:
+                self._add_text(texts, pending, open_elements)
+                pending = None
+
+            if event == 'start':
+                if self._matches(element, steps, len(steps) - 1):
+                    open_elements.append((element, len(texts)))
+                    texts.append(None)
+            elif open_elements and open_elements[-1][0] is element:
+                pending = open_elements.pop()
+            elif not open_elements:
+                self._clear(element)
+
+        if pending is not None:
+            self._add_text(texts, pending, open_elements)
+
+        return texts
+
+    def _add_text(self, texts, match, open_elements):
+        """Adds the `bacalhau.text.Text` for the matched element in
+        `match` to `texts`, and clears the element unless it is within
+        another matched element.
+
+        :param texts: texts of this document.
+        :type texts: `list`
+        :param match: matched element and its position in `texts`.
+        :type match: `tuple`
+        :param open_elements: matched elements that have not ended.
+        :type open_elements: `list`
+        """
+        text_element, position = match
+        text = self._get_text(text_element)
+        text.get_term_counts()
+        texts[position] = text
+
+        if not open_elements:
+            self._clear(text_element)
+
+    def _clear(self, element):
+        """Clears `element` and removes its preceding siblings, which
+        are no longer needed.
+
+        :param element: an element that has been fully parsed.
+        :type element: `lxml.etree._Element`
+        """
+        element.clear()
+        parent = element.getparent()
+
+        if parent is not None:
+            while element.getprevious() is not None:
+                del parent[0]
+
+    def _get_steps(self):
+        """Returns the steps of the XPath of this document, as (axis,
+        tag, attributes) tuples, or None if the XPath can not be
+        streamed.
+
+        :rtype: `list`
+        """
+        steps = []
+        end = 0
+
+        for match in self.STEP.finditer(self._xpath):
+            if match.start() != end:
+                return None
+            end = match.end()
+
+            axis, step, predicates = match.groups()
+            name = self.NAME.match(step[:len(step) - len(predicates)].strip())
+            if name is None:
+                return None
+            tag = self._get_name(*name.groups())
+
+            attributes = {}
+            predicate_end = 0
+            for predicate in self.PREDICATE.finditer(predicates):
+                if predicate.start() != predicate_end:
+                    return None
+                predicate_end = predicate.end()
+                prefix, local_name, double, single = predicate.groups()
+                attribute = self._get_name(prefix, local_name)
+                if attribute is None or attribute in attributes:
+                    return None
+                attributes[attribute] = double if single is None else single
+            if predicate_end != len(predicates):
+                return None
+
+            if tag is None:
+                return None
+            steps.append((axis, tag, attributes))
+
+        if not steps or end != len(self._xpath):
+            return None
+
+        return steps
+
+    def _get_name(self, prefix, local_name):
+        """Returns the `lxml` name for `local_name` in the namespace
+        mapped to `prefix`, or None if the prefix is not mapped.
+
+        :param prefix: namespace prefix, or None.
+        :type prefix: `str`
+        :param local_name: local name.
+        :type local_name: `str`
+        :rtype: `str`
+        """
+        if prefix is None:
+            return local_name
+        if prefix not in self._ns_map or local_name == '*':
+            return None
+        return '{%s}%s' % (self._ns_map[prefix], local_name)
+
+    def _matches(self, element, steps, index):
+        """Returns True if `element` is matched by the XPath `steps`
+        up to `index`.
+
+        :param element: the element to check.
+        :type element: `lxml.etree._Element`
+        :param steps: steps of the XPath, as returned by
+            `._get_steps`.
+        :type steps: `list`
+        :param index: index of the step `element` must match.
+        :type index: `int`
+        :rtype: `bool`
+        """
+        axis, tag, attributes = steps[index]
+
+        if tag != '*' and element.tag != tag:
+            return False
+        if not isinstance(element.tag, basestring):
+            return False
+        for attribute, value in attributes.iteritems():
+            if element.get(attribute) != value:
+                return False
+
+        parent = element.getparent()
+
+        if index == 0:
+            return axis == '//' or parent is None
+        if axis == '/':
+            return parent is not None and self._matches(
+                parent, steps, index - 1)
+
+        while parent is not None:
+            if self._matches(parent, steps, index - 1):
+                return True
+            parent = parent.getparent()
+        return False
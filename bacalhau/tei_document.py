@@ -15,7 +15,7 @@ class TEIDocument (Document):
     NS_MAP = {'tei': TEI_NAMESPACE, 'xml': XML_NAMESPACE}
 
     def __init__(self, filepath, tokenizer, stopwords, xpath,
-                 ns_map=NS_MAP):
+                 ns_map=NS_MAP, pipeline=None, content=None):
         """Creates a new `.TEIDocument` for the given file path.
 
         :param filepath: path to the file.
@@ -30,11 +30,19 @@ class TEIDocument (Document):
         :type xpath: `str`
         :param ns_map: namespaces used in the `.TEIDocument`.
         :type ns_map: `dict`
+        :param pipeline: pipeline shared by the texts in a corpus to
+            count their terms, defaults to a new
+            `bacalhau.pipeline.Pipeline` for `tokenizer` and
+            `stopwords`.
+        :type pipeline: `bacalhau.pipeline.Pipeline`
+        :param content: content of the file, if it has already been
+            read, defaults to None.
+        :type content: `str`
         """
         self._xpath = xpath
         self._ns_map = ns_map
         super(TEIDocument, self).__init__(filepath, tokenizer,
-                stopwords)
+                stopwords, pipeline, content)
 
     def get_texts(self):
         """Returns a list of `bacalhau.text.Text` objects within this
@@ -44,18 +52,28 @@ class TEIDocument (Document):
         :rtype: `list`
         """
         texts = []
-        tree = etree.parse(self._path)
+        tree = etree.parse(self._get_source())
         text_elements = tree.xpath(self._xpath,
                 namespaces=self._ns_map)
         for text_element in text_elements:
-            xml_id = text_element.get(self.XML + 'id')
-            text_id = '%s-%s' % (self._document_id, xml_id)
-            content = etree.tostring(text_element, encoding='utf-8',
-                                     method='text')
-            texts.append(Text(text_id, content, self._tokenizer,
-                              self._stopwords))
+            texts.append(self._get_text(text_element))
         return texts
 
+    def _get_text(self, text_element):
+        """Returns a `bacalhau.text.Text` for the content of
+        `text_element`.
+
+        :param text_element: element matched by the XPath.
+        :type text_element: `lxml.etree._Element`
+        :rtype: `bacalhau.text.Text`
+        """
+        xml_id = text_element.get(self.XML + 'id')
+        text_id = '%s-%s' % (self._document_id, xml_id)
+        content = etree.tostring(text_element, encoding='utf-8',
+                                 method='text')
+        return Text(text_id, content, self._tokenizer, self._stopwords,
+                    self._pipeline)
+
     def get_term_data(self):
         """Returns term data for each `bacalhau.text.Text` within this
         document.
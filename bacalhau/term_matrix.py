@@ -0,0 +1,534 @@
+from array import array
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from bacalhau.mapped_arrays import (get_string_table, get_strings,
+                                     read_arrays, write_arrays)
+
+
+class TermMatrix(object):
+    """Sparse text/term matrix with the term counts of the
+    `bacalhau.text.Text`\s in a corpus.
+
+    Each row holds the counts of one text. Terms and texts are
+    interned to integer ids and the counts are kept in compressed
+    sparse row (CSR) format, so no `bacalhau.text.Text` (or its
+    content) needs to be kept in memory once its terms have been
+    counted, and term frequencies and TF.IDF values are computed for
+    all the postings at once with `numpy`.
+
+    A matrix can be saved to a file, and the matrices of several
+    parts of a corpus merged into the matrix of the whole corpus."""
+
+    MAGIC = 'BCLHTERM'
+    VERSION = 1
+
+    def __init__(self):
+        """Creates a new, empty, `.TermMatrix`."""
+        # Term id -> term, and term -> term id.
+        self._terms = []
+        self._term_ids = {}
+        # Row -> text id.
+        self._text_ids = []
+        # The counts for row i are in _counts[_indptr[i]:_indptr[i+1]],
+        # and the ids of the terms they belong to in _indices. Rows
+        # are appended to these arrays, and copied to `numpy` arrays
+        # by `_get_arrays` when they are needed.
+        self._indptr = array('l', [0])
+        self._indices = array('i')
+        self._counts = array('i')
+        self._arrays = None
+        # Term id -> number of texts containing the term.
+        self._document_frequencies = array('i')
+
+    def add_text(self, text_id, term_counts):
+        """Adds a row with the term counts of a `bacalhau.text.Text`.
+
+        :param text_id: id of the text.
+        :type text_id: `str`
+        :param term_counts: number of occurrences of each term in the
+            text.
+        :type term_counts: `dict`
+        """
+        for term in sorted(term_counts):
+            term_id = self._term_ids.get(term)
+
+            if term_id is None:
+                term_id = len(self._terms)
+                self._terms.append(term)
+                self._term_ids[term] = term_id
+                self._document_frequencies.append(0)
+
+            self._indices.append(term_id)
+            self._counts.append(term_counts[term])
+            self._document_frequencies[term_id] += 1
+
+        self._text_ids.append(text_id)
+        self._indptr.append(len(self._indices))
+        self._arrays = None
+
+    def remove_rows(self, rows):
+        """Removes the given rows. Rows are removed by position rather
+        than by text id, since texts in different files may share an
+        id. Terms that are no longer in any text are kept in the
+        vocabulary, with a document frequency of 0.
+
+        :param rows: indices of the rows to remove.
+        :type rows: `list`
+        """
+        keep = np.ones(self.get_text_count(), dtype=bool)
+        keep[np.asarray(rows, dtype=int)] = False
+        indptr, indices, counts = self._get_arrays()
+        keep_postings = keep[self.get_rows()]
+        removed = np.bincount(indices[~keep_postings],
+                              minlength=self.get_term_count())
+        document_frequencies = self.get_document_frequencies() - removed
+        indptr = np.concatenate(([0], np.cumsum(np.diff(indptr)[keep])))
+
+        self._text_ids = [text_id for text_id, kept
+                          in zip(self._text_ids, keep) if kept]
+        self._set_arrays(indptr, indices[keep_postings],
+                         counts[keep_postings], document_frequencies)
+
+    @classmethod
+    def merge(cls, matrices):
+        """Returns a new `.TermMatrix` with the rows of all of
+        `matrices`, in order, such as the matrices of the parts of a
+        corpus.
+
+        The terms are interned to new ids, in order of appearance,
+        and the document frequencies of each term are summed, so the
+        TF.IDF values and top terms of the merged matrix are those of
+        a matrix built from all the texts.
+
+        :param matrices: the matrices to merge.
+        :type matrices: `list`
+        :rtype: `.TermMatrix`
+        """
+        merged = cls()
+        indptr = [np.zeros(1, dtype=np.int64)]
+        indices = []
+        counts = []
+        # Merged term ids, and document frequencies, of the terms of
+        # each matrix.
+        term_ids_list = []
+        document_frequencies = []
+
+        for matrix in matrices:
+            matrix_indptr, matrix_indices, matrix_counts = \
+                matrix._get_arrays()
+            term_ids = np.empty(matrix.get_term_count(), dtype=np.int64)
+
+            for term_id, term in enumerate(matrix.get_terms()):
+                merged_id = merged._term_ids.get(term)
+
+                if merged_id is None:
+                    merged_id = len(merged._terms)
+                    merged._terms.append(term)
+                    merged._term_ids[term] = merged_id
+
+                term_ids[term_id] = merged_id
+
+            indptr.append(matrix_indptr[1:] + indptr[-1][-1])
+            indices.append(term_ids[matrix_indices])
+            counts.append(matrix_counts)
+            term_ids_list.append(term_ids)
+            document_frequencies.append(matrix.get_document_frequencies())
+            merged._text_ids.extend(matrix.get_text_ids())
+
+        empty = [np.empty(0, dtype=np.int64)]
+        document_frequencies = np.bincount(
+            np.concatenate(term_ids_list + empty),
+            weights=np.concatenate(document_frequencies + empty),
+            minlength=merged.get_term_count())
+        merged._set_arrays(np.concatenate(indptr),
+                           np.concatenate(indices + empty),
+                           np.concatenate(counts + empty),
+                           document_frequencies)
+        return merged
+
+    def save(self, filepath, metadata=None):
+        """Saves this matrix to the file at `filepath`, from which
+        `.load` reads it.
+
+        :param filepath: path to the file.
+        :type filepath: `str`
+        :param metadata: JSON serialisable data to keep with the
+            matrix, defaults to none.
+        :type metadata: `dict`
+        """
+        indptr, indices, counts = self._get_arrays()
+        terms, term_offsets = get_string_table(
+            [_encode(term) for term in self._terms])
+        text_ids, text_id_offsets = get_string_table(
+            [_encode(text_id) for text_id in self._text_ids])
+
+        write_arrays(filepath, self.MAGIC, self.VERSION, [
+            ('terms', terms),
+            ('term_offsets', term_offsets),
+            ('text_ids', text_ids),
+            ('text_id_offsets', text_id_offsets),
+            ('indptr', indptr.astype('<i8')),
+            ('indices', indices.astype('<i4')),
+            ('counts', counts.astype('<i4')),
+            ('document_frequencies',
+             self.get_document_frequencies().astype('<i4')),
+        ], metadata)
+
+    @classmethod
+    def load(cls, filepath):
+        """Reads a matrix saved by `.save` from the file at
+        `filepath`, and returns it with the metadata saved with it.
+
+        :param filepath: path to the file.
+        :type filepath: `str`
+        :returns: (matrix, metadata).
+        :rtype: `tuple`
+        """
+        mapping, arrays, metadata = read_arrays(filepath, cls.MAGIC,
+                                                cls.VERSION)
+        try:
+            matrix = cls()
+            matrix._terms = [_decode(term) for term in get_strings(
+                arrays['terms'], arrays['term_offsets'])]
+            matrix._term_ids = dict((term, term_id) for term_id, term
+                                    in enumerate(matrix._terms))
+            matrix._text_ids = [_decode(text_id) for text_id in get_strings(
+                arrays['text_ids'], arrays['text_id_offsets'])]
+            matrix._set_arrays(arrays['indptr'], arrays['indices'],
+                               arrays['counts'],
+                               arrays['document_frequencies'])
+        finally:
+            del arrays
+            mapping.close()
+
+        return matrix, metadata
+
+    def _set_arrays(self, indptr, indices, counts, document_frequencies):
+        """Replaces the postings and document frequencies of this
+        matrix with (copies of) the given `numpy` arrays.
+
+        :param indptr: row pointers.
+        :type indptr: `numpy.ndarray`
+        :param indices: term id of each posting.
+        :type indices: `numpy.ndarray`
+        :param counts: count of each posting.
+        :type counts: `numpy.ndarray`
+        :param document_frequencies: number of texts containing each
+            term.
+        :type document_frequencies: `numpy.ndarray`
+        """
+        self._indptr = self._to_array(self._indptr.typecode, indptr)
+        self._indices = self._to_array(self._indices.typecode, indices)
+        self._counts = self._to_array(self._counts.typecode, counts)
+        self._document_frequencies = self._to_array(
+            self._document_frequencies.typecode, document_frequencies)
+        self._arrays = None
+
+    def _to_array(self, typecode, values):
+        """Returns the `numpy` array `values` as an `array.array` with
+        the given typecode.
+
+        :param typecode: typecode of the new array.
+        :type typecode: `str`
+        :param values: values of the new array.
+        :type values: `numpy.ndarray`
+        :rtype: `array.array`
+        """
+        new_array = array(typecode)
+        new_array.fromstring(values.astype(typecode).tostring())
+        return new_array
+
+    def _get_arrays(self):
+        """Returns the `numpy` (indptr, indices, counts) arrays of
+        this matrix.
+
+        :rtype: `tuple`
+        """
+        if self._arrays is None:
+            self._arrays = tuple(
+                np.frombuffer(a, dtype=a.typecode).copy()
+                for a in (self._indptr, self._indices, self._counts))
+
+        return self._arrays
+
+    def get_text_count(self):
+        """Returns the number of texts (rows) in this matrix.
+
+        :rtype: `int`
+        """
+        return len(self._text_ids)
+
+    def get_term_count(self):
+        """Returns the number of distinct terms in this matrix.
+
+        :rtype: `int`
+        """
+        return len(self._terms)
+
+    def get_text_ids(self):
+        """Returns the text ids, indexed by row.
+
+        :rtype: `list`
+        """
+        return self._text_ids
+
+    def get_terms(self):
+        """Returns the terms, indexed by term id.
+
+        :rtype: `list`
+        """
+        return self._terms
+
+    def get_counts(self):
+        """Returns the matrix in CSR format, as a tuple of `numpy`
+        arrays: the row pointers, the term id of each posting and the
+        count of each posting.
+
+        :rtype: `tuple`
+        """
+        return self._get_arrays()
+
+    def get_rows(self):
+        """Returns the row (text) index of each posting.
+
+        :rtype: `numpy.ndarray`
+        """
+        indptr = self._get_arrays()[0]
+        return np.repeat(np.arange(self.get_text_count()),
+                         np.diff(indptr))
+
+    def get_document_frequencies(self):
+        """Returns the number of texts containing each term, indexed
+        by term id.
+
+        :rtype: `numpy.ndarray`
+        """
+        return np.frombuffer(self._document_frequencies,
+                             dtype=self._document_frequencies.typecode).copy()
+
+    def get_frequencies(self):
+        """Returns the frequency of each posting, that is, its count
+        normalised by the highest count in the same text.
+
+        :rtype: `numpy.ndarray`
+        """
+        indptr, indices, counts = self._get_arrays()
+        max_counts = np.zeros(self.get_text_count(), dtype=np.int32)
+        non_empty = np.diff(indptr) > 0
+
+        if counts.size:
+            max_counts[non_empty] = np.maximum.reduceat(
+                counts, indptr[:-1][non_empty])
+
+        return counts.astype(np.float64) / max_counts[self.get_rows()]
+
+    def get_tf_idf(self):
+        """Returns the TF.IDF value of each posting.
+
+        :rtype: `numpy.ndarray`
+        """
+        indices = self._get_arrays()[1]
+        text_count = float(self.get_text_count())
+        # Only the terms in the postings are used, since terms of
+        # removed texts may not be in any text.
+        matches = self.get_document_frequencies()[indices]
+        return self.get_frequencies() * np.log(text_count / matches)
+
+    def get_term_ranks(self):
+        """Returns the position of each term in the alphabetically
+        sorted vocabulary, indexed by term id.
+
+        :rtype: `numpy.ndarray`
+        """
+        term_count = self.get_term_count()
+        ranks = np.empty(term_count, dtype=np.int64)
+        ranks[sorted(xrange(term_count), key=self._terms.__getitem__)] = \
+            np.arange(term_count)
+        return ranks
+
+    def select_top(self, scores, n, workers=1):
+        """Returns the indices of the postings with the `n` highest
+        `scores` in each row.
+
+        Postings are selected by decreasing score; postings with the
+        same score are selected in alphabetical order of their terms,
+        so the selection does not depend on the order the texts were
+        added in. The indices are returned in that order, row by row.
+
+        The rows are split into `workers` shards of consecutive rows
+        with about the same number of postings, which are selected
+        from by a pool of threads; the selection is made of `numpy`
+        operations over whole shards, which release the GIL. Since
+        the shards do not share rows, joining their selections gives
+        the same result as selecting from all the rows at once.
+
+        :param scores: score of each posting.
+        :type scores: `numpy.ndarray`
+        :param n: maximum number of postings to select from each row.
+        :type n: `int`
+        :param workers: number of threads, defaults to 1.
+        :type workers: `int`
+        :rtype: `numpy.ndarray`
+        """
+        shards = self._get_shards(workers)
+
+        if len(shards) == 1:
+            return self._select_top_rows(scores, n, *shards[0])
+
+        pool = ThreadPool(len(shards))
+        try:
+            selections = pool.map(
+                lambda shard: self._select_top_rows(scores, n, *shard),
+                shards)
+        finally:
+            pool.close()
+
+        return np.concatenate(selections)
+
+    def _get_shards(self, count):
+        """Returns up to `count` (first row, end row) ranges of
+        consecutive rows, with about the same number of postings each.
+
+        :param count: maximum number of shards.
+        :type count: `int`
+        :rtype: `list`
+        """
+        indptr = self._get_arrays()[0]
+        text_count = self.get_text_count()
+        count = max(1, min(count, text_count))
+        bounds = np.searchsorted(
+            indptr, np.linspace(0, indptr[-1], count + 1)[1:-1])
+        bounds = np.unique(np.concatenate(([0], bounds, [text_count])))
+        return zip(bounds[:-1].tolist(), bounds[1:].tolist()) or [(0, 0)]
+
+    def _select_top_rows(self, scores, n, first_row, end_row):
+        """Returns the indices of the postings with the `n` highest
+        `scores` in each of the rows from `first_row` up to `end_row`,
+        as `.select_top` does.
+
+        The `n` highest distinct scores of each row are found first,
+        with one maximum per row and round; only the postings scoring
+        at least the last of them (which include the `n` highest,
+        and all postings tied with them) are then sorted, on row,
+        decreasing score and term.
+
+        :param scores: score of each posting.
+        :type scores: `numpy.ndarray`
+        :param n: maximum number of postings to select from each row.
+        :type n: `int`
+        :param first_row: first row of the shard.
+        :type first_row: `int`
+        :param end_row: row after the last row of the shard.
+        :type end_row: `int`
+        :rtype: `numpy.ndarray`
+        """
+        indptr, indices = self._get_arrays()[:2]
+        start, end = indptr[first_row], indptr[end_row]
+        shard_scores = scores[start:end]
+        lengths = np.diff(indptr[first_row:end_row + 1])
+        rows = np.repeat(np.arange(end_row - first_row), lengths)
+        non_empty = lengths > 0
+        row_starts = indptr[first_row:end_row][non_empty] - start
+        remaining = shard_scores.copy()
+        thresholds = np.empty(end_row - first_row)
+        thresholds.fill(-np.inf)
+
+        # NaN scores are ignored by fmax, and kept as candidates.
+        with np.errstate(invalid='ignore'):
+            if len(remaining):
+                for i in xrange(n):
+                    thresholds[non_empty] = np.fmax.reduceat(remaining,
+                                                             row_starts)
+                    remaining[remaining >= thresholds[rows]] = -np.inf
+
+            candidates = np.flatnonzero(
+                (shard_scores >= thresholds[rows]) | np.isnan(shard_scores))
+        candidate_rows = rows[candidates]
+        order = np.lexsort((
+            self._get_relative_ranks(indices[start:end][candidates]),
+            -shard_scores[candidates], candidate_rows))
+        candidate_rows = candidate_rows[order]
+        # Position of each sorted candidate within its row.
+        positions = np.arange(len(order)) - np.searchsorted(
+            candidate_rows, candidate_rows)
+        return start + candidates[order][positions < n]
+
+    def _get_relative_ranks(self, term_ids):
+        """Returns the position of the term of each of `term_ids` in
+        the alphabetically sorted terms of `term_ids`, which orders
+        them as `.get_term_ranks` does without sorting the whole
+        vocabulary.
+
+        :param term_ids: term ids.
+        :type term_ids: `numpy.ndarray`
+        :rtype: `numpy.ndarray`
+        """
+        unique_ids, inverse = np.unique(term_ids, return_inverse=True)
+        terms = self._terms
+        ranks = np.empty(len(unique_ids), dtype=np.int64)
+        ranks[sorted(xrange(len(unique_ids)),
+                     key=lambda i: terms[unique_ids[i]])] = \
+            np.arange(len(unique_ids))
+        return ranks[inverse]
+
+    def iter_texts(self):
+        """Yields, for each text, its id and a `list` of (term, count)
+        tuples.
+
+        :rtype: `generator`
+        """
+        indptr, indices, counts = [a.tolist() for a in self._get_arrays()]
+
+        for row, text_id in enumerate(self._text_ids):
+            start, end = indptr[row], indptr[row + 1]
+            yield text_id, [(self._terms[term_id], count)
+                            for term_id, count in zip(indices[start:end],
+                                                      counts[start:end])]
+
+    def get_term_data(self):
+        """Returns the contents of this matrix as term data, in the
+        nested dictionary (term -> text -> counts) format returned by
+        `bacalhau.text.Text.get_term_data`.
+
+        :rtype: `dict`
+        """
+        term_data = {}
+        indices, counts = self._get_arrays()[1:]
+        postings = zip(indices.tolist(), self.get_rows().tolist(),
+                       counts.tolist(), self.get_frequencies().tolist())
+
+        for term_id, row, count, frequency in postings:
+            term_data.setdefault(self._terms[term_id], {})[
+                self._text_ids[row]] = {'count': count,
+                                        'frequency': frequency}
+
+        return term_data
+
+
+def _encode(string):
+    """Returns `string` as UTF-8 encoded bytes.
+
+    :param string: the string to encode.
+    :type string: `basestring`
+    :rtype: `str`
+    """
+    if isinstance(string, unicode):
+        return string.encode('utf-8')
+    return string
+
+
+def _decode(string):
+    """Returns the UTF-8 encoded `string` as a `str` if it is ASCII,
+    as terms and text ids usually are, or else as `unicode`.
+
+    :param string: the string to decode.
+    :type string: `str`
+    :rtype: `basestring`
+    """
+    try:
+        string.decode('ascii')
+        return string
+    except UnicodeDecodeError:
+        return string.decode('utf-8')
@@ -1,12 +1,11 @@
-from nltk.corpus import wordnet
-from nltk.stem import WordNetLemmatizer
-import re
+from bacalhau.pipeline import Pipeline
 
 
 class Text(object):
     """Represents a text unit from a `bacalhau.document.Document`."""
 
-    def __init__(self, text_id, content, tokenizer, stopwords):
+    def __init__(self, text_id, content, tokenizer, stopwords,
+                 pipeline=None):
         """Creates a new `.Text` object.
 
         :param text_id: id of the `.Text`.
@@ -17,12 +16,18 @@ class Text(object):
         :type tokenizer: `nltk.tokenize.api.TokenizerI`
         :param stopwords: words to be removed from the texts.
         :type stopwords: `list` of words.
+        :param pipeline: pipeline shared by the texts in a corpus to
+            count their terms, defaults to a new
+            `bacalhau.pipeline.Pipeline` for `tokenizer` and
+            `stopwords`.
+        :type pipeline: `bacalhau.pipeline.Pipeline`
         """
         self._text_id = text_id
         self._content = content.lower()
-        self._tokenizer = tokenizer
-        self._stopwords = stopwords
-        self._lemmatizer = WordNetLemmatizer()
+        if pipeline is None:
+            pipeline = Pipeline(tokenizer, stopwords)
+        self._pipeline = pipeline
+        self._term_counts = None
 
     def get_term_data(self):
         """Returns term data for this text.
@@ -39,25 +44,41 @@ class Text(object):
 
         """
         term_data = {}
-        tokens = self._tokenizer.tokenize(self._content)
-        max_token_count = 0
-        # This provides a "term count" that is unnormalised, meaning
-        # that the length of the text is not accounted for.
-        for token in tokens:
-            if self._is_valid_token(token):
-                lemma = self._lemmatizer.lemmatize(token)
-                token_data = term_data.setdefault(lemma,
-                        {self._text_id: {'count': 0}})
-                if (token_data[self._text_id]['count'] + 1) > max_token_count:
-                    max_token_count += 1
-                term_data[lemma][self._text_id]['count'] += 1
+        term_counts = self.get_term_counts()
+        max_token_count = max(term_counts.values()) if term_counts else 0
         # Normalise the term counts to provide a "term frequency" for
         # each term.
-        for term, text_data in term_data.items():
-            count = float(text_data[self._text_id]['count'])
-            text_data[self._text_id]['frequency'] = count / max_token_count
+        for term, count in term_counts.items():
+            term_data[term] = {self._text_id: {
+                    'count': count,
+                    'frequency': float(count) / max_token_count}}
         return term_data
 
+    def get_term_counts(self):
+        """Returns the number of times each (lemmatised) term occurs
+        in this text.
+
+        This provides a "term count" that is unnormalised, meaning
+        that the length of the text is not accounted for. The counts
+        are only computed once; later calls return the same
+        dictionary, and the content of the text is then released.
+
+        :rtype: `dict`
+
+        """
+        if self._term_counts is None:
+            self._term_counts = self._pipeline.get_term_counts(
+                self._content)
+            self._content = None
+        return self._term_counts
+
+    def get_text_id(self):
+        """Returns the id of this text.
+
+        :rtype: `str`
+        """
+        return self._text_id
+
     def _is_valid_token(self, token):
         """Checks if the `token` is suitable for processing. A token is
         suitable if: it is not in the list of stopwords; it is composed of
@@ -69,10 +90,4 @@ class Text(object):
         :rtype: `bool`
 
         """
-        if token in self._stopwords:
-            return False
-        if re.search(r'[^A-Za-z]', token):
-            return False
-        if not wordnet.synsets(token, pos=wordnet.NOUN):
-            return False
-        return True
+        return self._pipeline.is_valid_token(token)
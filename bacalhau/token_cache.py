@@ -0,0 +1,159 @@
+from nltk.corpus import wordnet
+from nltk.stem import WordNetLemmatizer
+
+from bacalhau.wordnet_index import read_noun_exceptions
+
+
+class TokenCache(object):
+    """Cache of the WordNet lookups made for each token of a
+    `bacalhau.text.Text`: whether the token is a noun, and its lemma.
+
+    A single `.TokenCache` is shared by all the texts in a corpus, so
+    each distinct token is only looked up once. The cache holds at
+    most `max_size` tokens; once it is full new tokens are still
+    looked up, but not stored, which keeps the most frequent tokens
+    (that are usually seen first) in the cache.
+
+    If `prebuild` is True, the set of noun lemmas and the noun
+    exceptions are loaded from WordNet when the cache is created, and
+    tokens are looked up by applying WordNet's morphological rules to
+    that set, instead of through the WordNet corpus reader. A
+    `bacalhau.wordnet_index.WordNetIndex` can be given instead, to
+    look tokens up in the same way against its memory mapped noun
+    lemmas, which avoids loading them from WordNet."""
+
+    def __init__(self, max_size=1000000, prebuild=False,
+                 wordnet_index=None):
+        """Creates a new `.TokenCache`.
+
+        :param max_size: maximum number of tokens to keep, defaults to
+            1000000.
+        :type max_size: `int`
+        :param prebuild: whether to load the WordNet noun lemmas when
+            the cache is created, defaults to False.
+        :type prebuild: `bool`
+        :param wordnet_index: index to look up the noun lemmas and
+            exceptions in, defaults to none.
+        :type wordnet_index: `bacalhau.wordnet_index.WordNetIndex`
+        """
+        self._max_size = max_size
+        self._tokens = {}
+        self._hits = 0
+        self._misses = 0
+        self._lemmatizer = WordNetLemmatizer()
+        self._nouns = None
+        self._exceptions = None
+        self._substitutions = wordnet.MORPHOLOGICAL_SUBSTITUTIONS[
+            wordnet.NOUN]
+
+        if wordnet_index is not None:
+            self._nouns = wordnet_index
+            self._exceptions = wordnet_index.get_exceptions()
+        elif prebuild:
+            self._nouns = frozenset(wordnet.all_lemma_names(
+                pos=wordnet.NOUN))
+            self._exceptions = read_noun_exceptions()
+
+    def is_noun(self, token):
+        """Returns True if `token` is a noun in WordNet; that is, if
+        `nltk.corpus.wordnet.synsets(token, pos=NOUN)` is not empty.
+
+        Cache hits and misses are counted by this method.
+
+        :param token: the token to check.
+        :type token: `str`
+        :rtype: `bool`
+        """
+        entry = self._tokens.get(token)
+
+        if entry is None:
+            self._misses += 1
+            entry = self._add(token)
+        else:
+            self._hits += 1
+
+        return entry[0]
+
+    def lemmatize(self, token):
+        """Returns the lemma of `token`, as returned by
+        `nltk.stem.WordNetLemmatizer.lemmatize`.
+
+        :param token: the token to lemmatize.
+        :type token: `str`
+        :rtype: `str`
+        """
+        entry = self._tokens.get(token)
+
+        if entry is None:
+            entry = self._add(token)
+
+        return entry[1]
+
+    def _add(self, token):
+        """Looks up `token` and adds it to the cache, unless the cache
+        is full. Returns a tuple with whether the token is a noun, and
+        its lemma.
+
+        :param token: the token to look up.
+        :type token: `str`
+        :rtype: `tuple`
+        """
+        if self._nouns is None:
+            entry = (bool(wordnet.synsets(token, pos=wordnet.NOUN)),
+                     self._lemmatizer.lemmatize(token))
+        else:
+            forms = self._morphy(token)
+            entry = (bool(forms), min(forms, key=len) if forms else token)
+
+        if len(self._tokens) < self._max_size:
+            self._tokens[token] = entry
+
+        return entry
+
+    def _morphy(self, form):
+        """Returns the base forms of `form` that are noun lemmas,
+        following the same rules as WordNet's morphy (and
+        `nltk.corpus.wordnet._morphy`), but using the prebuilt noun
+        lemma set.
+
+        :param form: the form to get the base forms of.
+        :type form: `str`
+        :rtype: `list`
+        """
+        def apply_rules(forms):
+            return [form[:-len(old)] + new
+                    for form in forms
+                    for old, new in self._substitutions
+                    if form.endswith(old)]
+
+        def filter_forms(forms):
+            result = []
+            for form in forms:
+                if form in self._nouns and form not in result:
+                    result.append(form)
+            return result
+
+        if form in self._exceptions:
+            return filter_forms([form] + self._exceptions[form])
+
+        forms = apply_rules([form])
+        results = filter_forms([form] + forms)
+        if results:
+            return results
+
+        while forms:
+            forms = apply_rules(forms)
+            results = filter_forms(forms)
+            if results:
+                return results
+
+        return []
+
+    def get_statistics(self):
+        """Returns the number of cache hits and misses, and the number
+        of tokens in the cache.
+
+        :rtype: `dict`
+        """
+        return {'hits': self._hits, 'misses': self._misses,
+                'size': len(self._tokens)}
@@ -1,11 +1,128 @@
 # -*- coding: utf-8 -*-
 
-from networkx.readwrite import json_graph
+from array import array
+from bisect import bisect_left
+import gzip
+from itertools import islice
+import json
+
 import networkx as nx
 
+from bacalhau.topic_tree_snapshot import TopicTreeSnapshot
+
+
+def insert_sorted(values, value):
+    """Inserts `value` into the sorted `values`, unless it is already
+    in it.
+
+    :param values: sorted values, without duplicates.
+    :type values: `array.array`
+    :param value: the value to insert.
+    :type value: int.
+    """
+    if not values or values[-1] < value:
+        values.append(value)
+    else:
+        position = bisect_left(values, value)
+        if values[position] != value:
+            values.insert(position, value)
+
+
+def write_json_graph(filepath, graph, nodes, links, gzipped=False,
+                     chunk_size=1000):
+    """Writes a tree to a file in the JSON Graph (node-link) format of
+    `networkx.readwrite.json_graph`. Nodes and links are encoded and
+    written `chunk_size` at a time, so the whole document is never
+    held in memory.
+
+    :param filepath: path to the file, or File-like object.
+    :type filepath: `str`
+    :param graph: (key, value) graph attributes.
+    :type graph: list.
+    :param nodes: dictionaries with the id and attributes of each
+        node.
+    :type nodes: iterable.
+    :param links: (source, target) positions of the nodes of each
+        link.
+    :type links: iterable.
+    :param gzipped: whether to compress the file with gzip, defaults
+        to False.
+    :type gzipped: bool.
+    :param chunk_size: number of nodes or links written at a time,
+        defaults to 1000.
+    :type chunk_size: int.
+    """
+    if isinstance(filepath, basestring):
+        json_file = open(filepath, 'wb')
+    else:
+        json_file = filepath
+    if gzipped:
+        output_file = gzip.GzipFile(fileobj=json_file, mode='wb')
+    else:
+        output_file = json_file
+
+    encode = json.JSONEncoder(default=list).encode
+
+    def write_items(items):
+        separator = ''
+        while True:
+            chunk = list(islice(items, chunk_size))
+            if not chunk:
+                break
+            output_file.write(separator + ', '.join(chunk))
+            separator = ', '
+
+    output_file.write('{"directed": true, "multigraph": false, '
+                      '"graph": %s, "nodes": [' % encode(graph))
+    write_items(encode(node) for node in nodes)
+    output_file.write('], "links": [')
+    write_items('{"source": %d, "target": %d}' % link for link in links)
+    output_file.write(']}')
+
+    if gzipped:
+        output_file.close()
+    if isinstance(filepath, basestring):
+        json_file.close()
+
+
+def read_json_graph(filepath):
+    """Returns the data of a tree in JSON Graph format, as written by
+    `.write_json_graph`, from a file that may be compressed with gzip.
+
+    :param filepath: path to the file, or File-like object.
+    :type filepath: `str`
+    :rtype: dict.
+    """
+    if isinstance(filepath, basestring):
+        json_file = open(filepath, 'rb')
+    else:
+        json_file = filepath
+
+    try:
+        position = json_file.tell()
+        is_gzipped = json_file.read(2) == '\x1f\x8b'
+        json_file.seek(position)
+
+        if is_gzipped:
+            input_file = gzip.GzipFile(fileobj=json_file, mode='rb')
+            try:
+                return json.load(input_file)
+            finally:
+                input_file.close()
+        return json.load(json_file)
+    finally:
+        if isinstance(filepath, basestring):
+            json_file.close()
+
 
 class TopicTree(nx.DiGraph):
-    """Represents a TopicTree. Extends `networkx.DiGraph`."""
+    """Represents a TopicTree. Extends `networkx.DiGraph`.
+
+    Nodes can be annotated with the texts they relate to (see
+    `.add_text`). The ids of the texts are kept once, in the `texts`
+    attribute of the tree, and each annotated node has a `texts`
+    attribute with the sorted positions of its texts in that list,
+    and a `count` attribute with their number."""
 
     def __init__(self, data=None, **attr):
         """Creates a new `.TopicTree`.
@@ -17,6 +134,34 @@ class TopicTree(nx.DiGraph):
         :type attr: key/value pairs.
         """
         super(TopicTree, self).__init__(data, **attr)
+        # Text id -> position in the texts attribute of the tree.
+        self._text_indices = {}
+
+    def add_text(self, node, text):
+        """Adds `text` to the texts `node` relates to.
+
+        :param node: name of the node.
+        :type node: str.
+        :param text: id of the text.
+        :type text: str.
+        """
+        text_ids = self.graph.setdefault('texts', [])
+
+        if len(self._text_indices) != len(text_ids):
+            self._text_indices = dict(
+                (text_id, index) for index, text_id in enumerate(text_ids))
+
+        index = self._text_indices.get(text)
+        if index is None:
+            index = self._text_indices[text] = len(text_ids)
+            text_ids.append(text)
+
+        data = self.node[node]
+        texts = data.get('texts')
+        if texts is None:
+            texts = data['texts'] = array('i')
+        insert_sorted(texts, index)
+        data['count'] = len(texts)
 
     def compress(self, min_children=2):
         """Compresses the tree based on the castanet algorithm: 1. starting
@@ -24,35 +169,65 @@ class TopicTree(nx.DiGraph):
         `min_children`, unless the parent is the root; 2. eliminate a child
         whose name appears within the parent's name.
 
+        Each step walks up from every leaf, but stops at the first
+        ancestor from where the walk would not change the tree, so
+        that the ancestors shared by many leaves are not processed
+        again for each of them. The result is the same as walking up
+        to the root from every leaf, for trees where every node has a
+        single parent (as those generated by
+        `bacalhau.corpus.Corpus`).
+
         :param min_children: minimum number of children that a parent should
             have, defaults to 2.
         :type min_children: int.
         """
+        visited = set()
         for n in self.nodes(data=True):
-            if 'is_leaf' in n[1]:
-                self._eliminate_parents(n[0], min_children)
+            if 'is_leaf' in n[1] and self.has_node(n[0]):
+                self._eliminate_parents(n[0], min_children, visited)
 
+        visited = _VisitedNodes(
+            [n for n in self.nodes_iter() if not self.pred[n]],
+            self.successors_iter)
         for n in self.nodes(data=True):
-            if 'is_leaf' in n[1]:
-                self._eliminate_child_with_parent_name(n[0])
+            if 'is_leaf' in n[1] and self.has_node(n[0]):
+                self._eliminate_child_with_parent_name(n[0], visited)
 
-    def _eliminate_parents(self, node, min_children):
-        """Recursively eliminates a parent of the current node that has fewer
-        than min_children children, unless the parent is the root.
+    def _eliminate_parents(self, node, min_children, visited=None):
+        """Eliminates the ancestors of the current node that have fewer
+        than min_children children, unless they are the root.
+
+        Ancestors that are kept are added to `visited`, and are not
+        processed again: the number of children of a node never
+        decreases when its descendants are eliminated, so they would
+        be kept again, and so would their own ancestors.
 
         :param node: name of node to process.
         :type node: str.
         :param min_children: minimum number of children that a parent should
             have
         :type min_children: int.
+        :param visited: ancestors already processed and kept, defaults
+            to none.
+        :type visited: set.
         """
-        for p in self.predecessors(node):
-            if self.has_node(p):
-                n_children = len(self.out_edges(p))
-                has_parent = len(self.predecessors(p)) > 0
+        if visited is None:
+            visited = set()
+
+        nodes = [node]
+
+        while nodes:
+            node = nodes.pop()
+
+            for p in self.predecessors(node):
+                if p in visited or not self.has_node(p):
+                    continue
+
+                n_children = len(self.succ[p])
+                ancestors = self.predecessors(p)
 
-                if n_children < min_children and has_parent:
-                    ancestor = self.predecessors(p)[0]
+                if n_children < min_children and ancestors:
+                    ancestor = ancestors[0]
                     children = self.successors(p)
 
                     self.remove_node(p)
@@ -60,32 +235,54 @@ class TopicTree(nx.DiGraph):
                     for child in children:
                         self.add_edge(ancestor, child)
 
-                    self._eliminate_parents(node, min_children)
+                    # The node has a new parent, which is checked next.
+                    nodes.append(node)
                 else:
-                    self._eliminate_parents(p, min_children)
+                    visited.add(p)
+                    nodes.append(p)
 
-    def _eliminate_child_with_parent_name(self, node):
-        """Eliminate a child node whose name appears within the parent's
-        name.
+    def _eliminate_child_with_parent_name(self, node, visited=None):
+        """Eliminates the current node, and each of its ancestors, whose
+        name appears within their parent's name.
+
+        If `visited` is given, the walk up stops at the first node for
+        which `_VisitedNodes.is_settled` is True, as neither it nor
+        its ancestors would be eliminated.
 
         :param node: name of node to process.
         :type node: str.
+        :param visited: nodes already processed, defaults to none.
+        :type visited: `_VisitedNodes`
         """
-        for p in self.predecessors(node):
-            if self.has_node(p):
-                node_name = node[:node.find('.')]
-                p_name = p[:p.find('.')]
+        nodes = [node]
 
-                if node_name in p_name or p_name in node_name:
-                    children = self.successors(node)
-                    self.remove_node(node)
+        while nodes:
+            node = nodes.pop()
 
-                    for child in children:
-                        self.add_edge(p, child)
+            if visited is not None:
+                if visited.is_settled(node):
+                    continue
+                visited.add(node)
 
-                    self._eliminate_child_with_parent_name(p)
-                else:
-                    self._eliminate_child_with_parent_name(p)
+            for p in self.predecessors(node):
+                if not self.has_node(p):
+                    continue
+
+                if self.has_node(node):
+                    node_name = node[:node.find('.')]
+                    p_name = p[:p.find('.')]
+
+                    if node_name in p_name or p_name in node_name:
+                        children = self.successors(node)
+                        self.remove_node(node)
+
+                        for child in children:
+                            self.add_edge(p, child)
+
+                            if visited is not None:
+                                visited.move(child)
+
+                nodes.append(p)
 
     def prune(self, nodes):
         """Removes the given nodes from the tree.
@@ -108,15 +305,196 @@ class TopicTree(nx.DiGraph):
 
         agraph.draw(filepath, format=format, prog=prog)
 
-    def to_json(self, filepath):
+    def to_json(self, filepath, gzipped=False):
         """Serializes the TopicTree to JSON Graph format and writes it
-        to a file.
+        to a file, as it is serialized (see
+        `bacalhau.topic_tree.write_json_graph`).
+
+        `filepath` is a file path or File-like object; if `gzipped` is
+        True, the JSON is compressed with gzip."""
+        positions = dict((node, position)
+                         for position, node in enumerate(self))
+        nodes = (dict(data, id=node) for node, data in self.nodes_iter(
+            data=True))
+        links = ((positions[source], positions[target])
+                 for source, target in self.edges_iter())
+        write_json_graph(filepath, list(self.graph.items()), nodes, links,
+                         gzipped)
+
+    @classmethod
+    def from_json(cls, filepath):
+        """Returns a new `.TopicTree` read from a file written by
+        `.to_json`, which may be compressed with gzip.
 
         `filepath` is a file path or File-like object."""
-        if isinstance(filepath, basestring):
-            json_file = open(filepath, 'w')
-        else:
-            json_file = filepath
-        json_file.write(json_graph.dumps(self))
-        if isinstance(filepath, basestring):
-            json_file.close()
+        data = read_json_graph(filepath)
+        tree = cls()
+        tree.graph.update(data['graph'])
+
+        names = []
+        nodes = []
+        for node in data['nodes']:
+            name = node.pop('id')
+            if 'texts' in node:
+                node['texts'] = array('i', node['texts'])
+            names.append(name)
+            nodes.append((name, node))
+
+        tree.add_nodes_from(nodes)
+        tree.add_edges_from((names[link['source']], names[link['target']])
+                            for link in data['links'])
+
+        return tree
+
+    def save(self, filepath):
+        """Saves the TopicTree to the file at `filepath`, in the binary
+        format of `bacalhau.topic_tree_snapshot.TopicTreeSnapshot`.
+
+        Only the `is_leaf`, `is_root`, `count` and `texts` node
+        attributes, and the `texts` graph attribute, are saved."""
+        positions = dict((node, position)
+                         for position, node in enumerate(self))
+        edges = ((positions[source], positions[target])
+                 for source, target in self.edges_iter())
+        TopicTreeSnapshot.write(filepath, self.nodes_iter(data=True), edges,
+                                self.graph.get('texts'))
+
+    @classmethod
+    def load(cls, filepath):
+        """Returns a new `.TopicTree` read from a file written by
+        `.save`.
+
+        To look up nodes without building the whole tree, or to share
+        the tree between processes, open the file as a
+        `bacalhau.topic_tree_snapshot.TopicTreeSnapshot` instead."""
+        snapshot = TopicTreeSnapshot(filepath)
+
+        try:
+            tree = cls()
+            text_ids = snapshot.get_text_ids()
+            if text_ids:
+                tree.graph['texts'] = text_ids
+            tree.add_nodes_from(snapshot.nodes_iter(data=True))
+            tree.add_edges_from(snapshot.edges())
+        finally:
+            snapshot.close()
+
+        return tree
+
+
+class _VisitedNodes(object):
+    """Nodes of a `.TopicTree` visited while eliminating children with
+    their parent's name, and which of them have been moved to a new
+    parent since.
+
+    A visited node is compared again with its parent only if it, or
+    one of its ancestors, has been moved. To check this without
+    walking up the tree, nodes are numbered in depth first order when
+    the `._VisitedNodes` is created, so that the descendants of each
+    node have consecutive numbers (eliminating nodes does not change
+    which nodes are descendants of which), and the number of moved
+    ancestors of each node is kept in a binary indexed tree over those
+    numbers.
+
+    Marking a node as moved or visited, and checking whether it is
+    settled, take O(log n) time for a tree of n nodes, so the walks of
+    `.TopicTree.compress` that use it take O(n log n) time overall,
+    not linear time."""
+
+    def __init__(self, roots, get_children):
+        """Creates a new `._VisitedNodes` for the tree with `roots`.
+
+        :param roots: the roots of the tree being compressed.
+        :type roots: list.
+        :param get_children: function that returns the children of a
+            node.
+        :type get_children: function.
+        """
+        self._first = {}
+        self._last = {}
+        self._visited = set()
+        self._moved = set()
+
+        position = 0
+        for root in roots:
+            nodes = [(root, False)]
+            while nodes:
+                node, done = nodes.pop()
+
+                if done:
+                    self._last[node] = position
+                else:
+                    position += 1
+                    self._first[node] = position
+                    nodes.append((node, True))
+                    nodes.extend((child, False)
+                                 for child in get_children(node))
+
+        self._counts = [0] * (position + 2)
+
+    def _add(self, node, value):
+        """Adds `value` to the number of moved ancestors of `node`
+        and of its descendants.
+
+        :param node: the node moved, or no longer moved.
+        :type node: str.
+        :param value: 1 or -1.
+        :type value: int.
+        """
+        counts = self._counts
+        size = len(counts)
+
+        position = self._first[node]
+        while position < size:
+            counts[position] += value
+            position += position & -position
+
+        position = self._last[node] + 1
+        while position < size:
+            counts[position] -= value
+            position += position & -position
+
+    def add(self, node):
+        """Marks `node` as visited, and as not moved.
+
+        :param node: the node visited.
+        :type node: str.
+        """
+        self._visited.add(node)
+
+        if node in self._moved:
+            self._moved.remove(node)
+            self._add(node, -1)
+
+    def move(self, node):
+        """Marks `node` as moved to a new parent.
+
+        :param node: the node moved.
+        :type node: str.
+        """
+        if node in self._visited and node not in self._moved and \
+                node in self._first:
+            self._moved.add(node)
+            self._add(node, 1)
+
+    def is_settled(self, node):
+        """Returns True if `node` has been visited, and neither it nor
+        any of its ancestors have been moved since they were last
+        visited.
+
+        :param node: the node to check.
+        :type node: str.
+        :rtype: bool.
+        """
+        if node not in self._visited or node not in self._first:
+            return False
+
+        counts = self._counts
+        moved = 0
+
+        position = self._first[node]
+        while position:
+            moved += counts[position]
+            position -= position & -position
+
+        return moved == 0
@@ -0,0 +1,157 @@
+from array import array
+
+from bacalhau.compact_topic_tree import CompactTopicTree
+from bacalhau.topic_tree import TopicTree, insert_sorted
+
+
+class TopicTreeBuilder(object):
+    """Builds a `bacalhau.topic_tree.TopicTree`, or a
+    `bacalhau.compact_topic_tree.CompactTopicTree`, from hypernym
+    paths.
+
+    Many texts share terms, and so hypernym paths, and paths share
+    their prefixes. Paths are deduplicated as they are added, and
+    merged into a trie keyed by path prefix, so that each node and
+    edge is only recorded the first time it is seen; the tree is then
+    created with all the nodes (with their leaf and root flags) and
+    edges at once. Nodes and edges are added to the tree in the order
+    they are first seen, as when adding the paths one by one.
+
+    If paths are added with the text they come from, the nodes are
+    annotated with their texts as the paths are added (see
+    `bacalhau.topic_tree.TopicTree.add_text`): texts are interned to
+    integer ids, in the order they are first seen, and each node keeps
+    the sorted ids of its texts in an array."""
+
+    def __init__(self):
+        """Creates a new, empty, `.TopicTreeBuilder`."""
+        self._paths = set()
+        self._trie = {}
+        # Node -> attributes, and nodes in the order they were seen.
+        self._attributes = {}
+        self._nodes = []
+        self._edges = []
+        # Text id -> index, index -> text id, and node -> text indices.
+        self._text_indices = {}
+        self._text_ids = []
+        self._node_texts = {}
+
+    def add_path(self, path, text=None):
+        """Adds a hypernym path, from its root to its leaf.
+
+        :param path: names of the nodes in the path.
+        :type path: `list`
+        :param text: id of the text the path comes from, to annotate
+            the nodes in the path with, defaults to none.
+        :type text: `str`
+        """
+        key = tuple(path)
+        if not key:
+            return
+        if text is not None:
+            self._add_text(key, text)
+        if key in self._paths:
+            return
+        self._paths.add(key)
+
+        attributes = self._attributes
+        trie = self._trie
+        parent = None
+
+        for node in key:
+            child_trie = trie.get(node)
+
+            if child_trie is None:
+                child_trie = trie[node] = {}
+
+                if node not in attributes:
+                    attributes[node] = {}
+                    self._nodes.append(node)
+                if parent is not None:
+                    self._edges.append((parent, node))
+
+            parent = node
+            trie = child_trie
+
+        attributes[key[-1]]['is_leaf'] = True
+        attributes[key[0]]['is_root'] = True
+
+    def _add_text(self, path, text):
+        """Annotates the nodes in `path` with `text`.
+
+        :param path: names of the nodes in the path.
+        :type path: `tuple`
+        :param text: id of the text.
+        :type text: `str`
+        """
+        index = self._text_indices.get(text)
+        if index is None:
+            index = self._text_indices[text] = len(self._text_ids)
+            self._text_ids.append(text)
+
+        node_texts = self._node_texts
+
+        for node in path:
+            texts = node_texts.get(node)
+
+            if texts is None:
+                node_texts[node] = array('i', [index])
+            elif texts[-1] != index:
+                insert_sorted(texts, index)
+
+    def get_topic_tree(self):
+        """Returns a `bacalhau.topic_tree.TopicTree` with the paths
+        added so far.
+
+        :rtype: `bacalhau.topic_tree.TopicTree`
+        """
+        tree = TopicTree()
+
+        if self._node_texts:
+            tree.graph['texts'] = list(self._text_ids)
+
+        tree.add_nodes_from((node, self._get_node_data(node))
+                            for node in self._nodes)
+        tree.add_edges_from(self._edges)
+        return tree
+
+    def _get_node_data(self, node):
+        """Returns the attributes of `node` in a
+        `bacalhau.topic_tree.TopicTree`.
+
+        :param node: name of the node.
+        :type node: `str`
+        :rtype: `dict`
+        """
+        data = dict(self._attributes[node])
+        texts = self._node_texts.get(node)
+
+        if texts is not None:
+            data['texts'] = array('i', texts)
+            data['count'] = len(texts)
+
+        return data
+
+    def get_compact_topic_tree(self):
+        """Returns a `bacalhau.compact_topic_tree.CompactTopicTree`
+        with the paths added so far.
+
+        :rtype: `bacalhau.compact_topic_tree.CompactTopicTree`
+        """
+        attributes = self._attributes
+        node_texts = self._node_texts
+        tree = CompactTopicTree(self._text_ids)
+
+        for node in self._nodes:
+            tree.add_node(node)
+            if 'is_leaf' in attributes[node]:
+                tree.set_leaf(node)
+            if 'is_root' in attributes[node]:
+                tree.set_root(node)
+            if node in node_texts:
+                tree.set_texts(node, node_texts[node])
+
+        for parent, child in self._edges:
+            tree.add_edge(parent, child)
+
+        return tree
@@ -0,0 +1,361 @@
+from array import array
+
+import numpy as np
+
+from bacalhau.mapped_arrays import (get_string_table, get_strings,
+                                     read_arrays, write_arrays)
+
+
+class TopicTreeSnapshot(object):
+    """Read only view of a topic tree saved in a compact binary format
+    by `bacalhau.topic_tree.TopicTree.save` or
+    `bacalhau.compact_topic_tree.CompactTopicTree.save`.
+
+    The file (see `bacalhau.mapped_arrays.write_arrays`) holds a
+    string table with the node names, another with the ids of the
+    texts the nodes are annotated with, and integer arrays with the
+    children and the parents of each node (in compressed sparse row
+    format), the node flags and counts, and the texts of each node.
+    The file is memory mapped and the arrays are `numpy` views of the
+    mapping, so opening a snapshot does not read or copy the tree,
+    and processes that open the same file share its pages. Nodes are
+    looked up with a binary search over their names, which are also
+    stored in sorted order."""
+
+    MAGIC = 'BCLHTREE'
+    VERSION = 1
+
+    # Node flags.
+    IS_LEAF = 1
+    IS_ROOT = 2
+    HAS_TEXTS = 4
+
+    def __init__(self, filepath):
+        """Opens the snapshot in the file at `filepath`.
+
+        :param filepath: path to the file.
+        :type filepath: `str`
+        """
+        self._mmap, arrays = read_arrays(filepath, self.MAGIC,
+                                         self.VERSION)[:2]
+
+        self._names = arrays['names']
+        self._name_offsets = arrays['name_offsets']
+        self._name_order = arrays['name_order']
+        self._flags = arrays['flags']
+        self._counts = arrays['counts']
+        self._text_offsets = arrays['text_offsets']
+        self._texts = arrays['texts']
+        self._child_offsets = arrays['child_offsets']
+        self._children = arrays['children']
+        self._parent_offsets = arrays['parent_offsets']
+        self._parents = arrays['parents']
+        self._text_ids = arrays['text_ids']
+        self._text_id_offsets = arrays['text_id_offsets']
+
+    @classmethod
+    def write(cls, filepath, nodes, edges, text_ids=None):
+        """Writes a snapshot of a tree to the file at `filepath`. Node
+        attributes other than `is_leaf`, `is_root`, `count` and
+        `texts` are not saved.
+
+        :param filepath: path to the file.
+        :type filepath: `str`
+        :param nodes: (name, attributes) of each node, with the texts
+            as indices in `text_ids`.
+        :type nodes: iterable
+        :param edges: (parent, child) edges, as positions of the nodes
+            in `nodes`.
+        :type edges: iterable
+        :param text_ids: ids of the texts the nodes are annotated with,
+            defaults to none.
+        :type text_ids: `list`
+        """
+        names = []
+        flags = bytearray()
+        counts = array('i')
+        text_offsets = array('l', [0])
+        texts = array('i')
+
+        for name, data in nodes:
+            if isinstance(name, unicode):
+                name = name.encode('utf-8')
+            names.append(name)
+            node_flags = 0
+
+            if 'is_leaf' in data:
+                node_flags |= cls.IS_LEAF
+            if 'is_root' in data:
+                node_flags |= cls.IS_ROOT
+            if 'texts' in data:
+                node_flags |= cls.HAS_TEXTS
+                texts.extend(data['texts'])
+                counts.append(data.get('count', len(data['texts'])))
+            else:
+                counts.append(0)
+
+            flags.append(node_flags)
+            text_offsets.append(len(texts))
+
+        size = len(names)
+        edge_positions = array('i')
+        for edge in edges:
+            edge_positions.extend(edge)
+        edge_positions = np.frombuffer(edge_positions.tostring(),
+                                       dtype='i4').reshape(-1, 2)
+        parents = edge_positions[:, 0].astype('<i4')
+        children = edge_positions[:, 1].astype('<i4')
+        names_blob, name_offsets = get_string_table(names)
+        text_ids_blob, text_id_offsets = get_string_table(
+            [text_id.encode('utf-8') if isinstance(text_id, unicode)
+             else text_id for text_id in text_ids or []])
+        name_order = np.argsort(np.array(names, dtype='S'),
+                                kind='mergesort')
+
+        sections = [
+            ('names', names_blob),
+            ('name_offsets', name_offsets),
+            ('name_order', name_order.astype('<i4')),
+            ('flags', np.array(flags, dtype='u1')),
+            ('counts', np.array(counts, dtype='<i4')),
+            ('text_offsets', np.array(text_offsets, dtype='<i8')),
+            ('texts', np.array(texts, dtype='<i4')),
+            ('child_offsets', _get_offsets(parents, size)),
+            ('children', children[np.argsort(parents, kind='mergesort')]),
+            ('parent_offsets', _get_offsets(children, size)),
+            ('parents', parents[np.argsort(children, kind='mergesort')]),
+            ('text_ids', text_ids_blob),
+            ('text_id_offsets', text_id_offsets),
+        ]
+
+        write_arrays(filepath, cls.MAGIC, cls.VERSION, sections)
+
+    def close(self):
+        """Closes the memory mapping of the snapshot. The arrays of
+        the snapshot must not be used after it is closed."""
+        self._mmap.close()
+
+    def number_of_nodes(self):
+        """Returns the number of nodes in the tree.
+
+        :rtype: `int`
+        """
+        return len(self._flags)
+
+    def number_of_edges(self):
+        """Returns the number of edges in the tree.
+
+        :rtype: `int`
+        """
+        return len(self._children)
+
+    def nodes(self):
+        """Returns the names of the nodes in the tree, in the order
+        they were saved.
+
+        :rtype: `list`
+        """
+        return get_strings(self._names, self._name_offsets)
+
+    def nodes_iter(self, data=False):
+        """Yields the names of the nodes in the tree, in the order they
+        were saved, or (name, attributes) tuples if `data` is True.
+
+        :param data: whether to yield the attributes of the nodes.
+        :type data: `bool`
+        """
+        names = self.nodes()
+
+        if not data:
+            for name in names:
+                yield name
+            return
+
+        flags = self._flags.tolist()
+        counts = self._counts.tolist()
+        text_offsets = self._text_offsets.tolist()
+        texts = self._texts
+
+        for node_id, name in enumerate(names):
+            yield name, self._make_node_data(
+                flags[node_id], counts[node_id],
+                texts[text_offsets[node_id]:text_offsets[node_id + 1]])
+
+    def edges(self):
+        """Returns the (parent, child) edges of the tree.
+
+        :rtype: `list`
+        """
+        names = self.nodes()
+        parents = np.repeat(np.arange(len(names)),
+                            np.diff(self._child_offsets)).tolist()
+
+        return [(names[parent_id], names[child_id])
+                for parent_id, child_id in zip(parents,
+                                               self._children.tolist())]
+
+    def has_node(self, node):
+        """Returns True if `node` is in the tree.
+
+        :param node: name of the node.
+        :type node: `str`
+        :rtype: `bool`
+        """
+        return self._find_id(node) is not None
+
+    def get_children(self, node):
+        """Returns the names of the children of `node`.
+
+        :param node: name of the node.
+        :type node: `str`
+        :rtype: `list`
+        """
+        node_id = self._get_id(node)
+        start, end = self._child_offsets[node_id:node_id + 2]
+        return [self._get_name(child_id)
+                for child_id in self._children[start:end]]
+
+    def get_parents(self, node):
+        """Returns the names of the parents of `node`.
+
+        :param node: name of the node.
+        :type node: `str`
+        :rtype: `list`
+        """
+        node_id = self._get_id(node)
+        start, end = self._parent_offsets[node_id:node_id + 2]
+        return [self._get_name(parent_id)
+                for parent_id in self._parents[start:end]]
+
+    def get_node_data(self, node):
+        """Returns the attributes of `node`, as in the `node`
+        dictionary of a `bacalhau.topic_tree.TopicTree`.
+
+        :param node: name of the node.
+        :type node: `str`
+        :rtype: `dict`
+        """
+        return self._get_node_data(self._get_id(node))
+
+    def get_text_ids(self):
+        """Returns the ids of the texts the nodes are annotated with,
+        indexed by the text indices in the node attributes.
+
+        :rtype: `list`
+        """
+        return get_strings(self._text_ids, self._text_id_offsets)
+
+    def _get_name(self, node_id):
+        """Returns the name of the node with `node_id`.
+
+        :param node_id: id of the node.
+        :type node_id: `int`
+        :rtype: `str`
+        """
+        return _get_string(self._names, self._name_offsets, node_id)
+
+    def _find_id(self, node):
+        """Returns the id of `node`, or None if it is not in the tree.
+
+        :param node: name of the node.
+        :type node: `str`
+        :rtype: `int`
+        """
+        if isinstance(node, unicode):
+            node = node.encode('utf-8')
+
+        name_order = self._name_order
+        low = 0
+        high = len(name_order)
+
+        while low < high:
+            middle = (low + high) // 2
+            if self._get_name(name_order[middle]) < node:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < len(name_order) and \
+                self._get_name(name_order[low]) == node:
+            return int(name_order[low])
+        return None
+
+    def _get_id(self, node):
+        """Returns the id of `node`, raising a KeyError if it is not in
+        the tree.
+
+        :param node: name of the node.
+        :type node: `str`
+        :rtype: `int`
+        """
+        node_id = self._find_id(node)
+
+        if node_id is None:
+            raise KeyError(node)
+        return node_id
+
+    def _get_node_data(self, node_id):
+        """Returns the attributes of the node with `node_id`.
+
+        :param node_id: id of the node.
+        :type node_id: `int`
+        :rtype: `dict`
+        """
+        start, end = self._text_offsets[node_id:node_id + 2]
+        return self._make_node_data(self._flags[node_id],
+                                    self._counts[node_id],
+                                    self._texts[start:end])
+
+    def _make_node_data(self, flags, count, texts):
+        """Returns the attributes of a node with `flags`, `count` and
+        `texts`.
+
+        :param flags: flags of the node.
+        :type flags: `int`
+        :param count: count of the node.
+        :type count: `int`
+        :param texts: text indices of the node.
+        :type texts: `numpy.ndarray`
+        :rtype: `dict`
+        """
+        data = {}
+
+        if flags & self.IS_LEAF:
+            data['is_leaf'] = True
+        if flags & self.IS_ROOT:
+            data['is_root'] = True
+        if flags & self.HAS_TEXTS:
+            data['texts'] = array('i', texts.tostring())
+            data['count'] = int(count)
+
+        return data
+
+
+def _get_string(blob, offsets, index):
+    """Returns the string at `index` of a string table.
+
+    :param blob: concatenated bytes of the strings.
+    :type blob: `numpy.ndarray`
+    :param offsets: offsets of the strings in `blob`.
+    :type offsets: `numpy.ndarray`
+    :param index: index of the string.
+    :type index: `int`
+    :rtype: `str`
+    """
+    return blob[offsets[index]:offsets[index + 1]].tostring()
+
+
+def _get_offsets(values, size):
+    """Returns the offsets of the runs of each of the ids 0 to `size`
+    in `values` sorted, as the row offsets of a compressed sparse row
+    array.
+
+    :param values: ids of the rows.
+    :type values: `numpy.ndarray`
+    :param size: number of rows.
+    :type size: `int`
+    :rtype: `numpy.ndarray`
+    """
+    offsets = np.zeros(size + 1, dtype='<i8')
+    np.cumsum(np.bincount(values, minlength=size), out=offsets[1:])
+    return offsets
@@ -0,0 +1,182 @@
+from nltk.corpus import wordnet
+import numpy as np
+
+from bacalhau.hypernym_cache import get_wordnet_version
+from bacalhau.mapped_arrays import read_arrays, write_arrays
+
+
+def read_noun_exceptions():
+    """Returns the WordNet noun exception list, as a dictionary of
+    inflected form -> base forms.
+
+    :rtype: `dict`
+    """
+    exceptions = {}
+    exception_file = wordnet.open('noun.exc')
+
+    try:
+        for line in exception_file:
+            terms = line.split()
+            exceptions[terms[0]] = terms[1:]
+    finally:
+        exception_file.close()
+
+    return exceptions
+
+
+class WordNetIndex(object):
+    """Precomputed index of the WordNet nouns, to check nouns and get
+    hypernym paths without the `nltk` WordNet corpus reader.
+
+    The index is compiled from WordNet once, by `.build`, into a file
+    with the sorted noun lemmas and the id of the first synset of
+    each (the first of `nltk.corpus.wordnet.synsets(lemma)`), the
+    name of each noun synset and the id of its first hypernym, and
+    the noun exception list. The file is memory mapped when the index
+    is opened (see `bacalhau.mapped_arrays.read_arrays`), so loading
+    it costs nothing, and lemmas are looked up with a binary search
+    over the mapped arrays; no WordNet data file is read, and no
+    `nltk` synset is created.
+
+    The hypernym path of a noun lemma is the same as the one
+    `bacalhau.corpus.Corpus` gets from WordNet: the first synset of
+    the lemma, followed by the first hypernym of each synset.
+
+    An index is pickled as the path to its file, so worker processes
+    map the same file (and share its pages) instead of copying it."""
+
+    MAGIC = 'BCLHWNIX'
+    VERSION = 1
+    NONE = -1
+
+    def __init__(self, filepath):
+        """Opens the index in the file at `filepath`.
+
+        :param filepath: path to the file, written by `.build`.
+        :type filepath: `str`
+        """
+        self._filepath = filepath
+        self._mmap, arrays, metadata = read_arrays(filepath, self.MAGIC,
+                                                   self.VERSION)
+        self._lemmas = arrays['lemmas']
+        self._lemma_synsets = arrays['lemma_synsets']
+        self._synsets = arrays['synsets']
+        self._parents = arrays['parents']
+        self._exception_forms = arrays['exception_forms']
+        self._exception_bases = arrays['exception_bases']
+        self._wordnet_version = metadata['wordnet_version']
+
+    @classmethod
+    def build(cls, filepath):
+        """Compiles the nouns of the installed WordNet into an index,
+        and writes it to the file at `filepath`.
+
+        :param filepath: path to the file.
+        :type filepath: `str`
+        """
+        synsets = list(wordnet.all_synsets(wordnet.NOUN))
+        ids = dict((synset.offset, synset_id)
+                   for synset_id, synset in enumerate(synsets))
+        parents = []
+
+        for synset in synsets:
+            hypernyms = synset.hypernyms()
+            parents.append(ids[hypernyms[0].offset] if hypernyms
+                           else cls.NONE)
+
+        lemmas = sorted(wordnet.all_lemma_names(pos=wordnet.NOUN))
+        lemma_synsets = [ids[wordnet.synsets(lemma)[0].offset]
+                         for lemma in lemmas]
+        exceptions = sorted(read_noun_exceptions().iteritems())
+
+        arrays = [
+            ('lemmas', np.array(lemmas, dtype='S')),
+            ('lemma_synsets', np.array(lemma_synsets, dtype='<i4')),
+            ('synsets', np.array([synset.name for synset in synsets],
+                                 dtype='S')),
+            ('parents', np.array(parents, dtype='<i4')),
+            ('exception_forms', np.array([form for form, bases
+                                          in exceptions], dtype='S')),
+            ('exception_bases', np.array([' '.join(bases) for form, bases
+                                          in exceptions], dtype='S')),
+        ]
+        write_arrays(filepath, cls.MAGIC, cls.VERSION, arrays,
+                     {'wordnet_version': get_wordnet_version()})
+
+    def __getstate__(self):
+        return self._filepath
+
+    def __setstate__(self, filepath):
+        self.__init__(filepath)
+
+    def close(self):
+        """Closes the memory mapping of the index."""
+        self._mmap.close()
+
+    def __contains__(self, lemma):
+        """Returns True if `lemma` is a noun lemma in WordNet.
+
+        :param lemma: the lemma to check.
+        :type lemma: `str`
+        :rtype: `bool`
+        """
+        return self._find(self._lemmas, lemma) is not None
+
+    def _find(self, values, value):
+        """Returns the index of `value` in the sorted `values`, or None
+        if it is not in them.
+
+        :param values: sorted strings.
+        :type values: `numpy.ndarray`
+        :param value: the string to look for.
+        :type value: `str`
+        :rtype: `int`
+        """
+        index = int(np.searchsorted(values, value))
+
+        if index < len(values) and values[index] == value:
+            return index
+        return None
+
+    def get_hypernym(self, word):
+        """Returns the hypernym path of `word`, from the word itself
+        up to the root of its first synset, as
+        `bacalhau.corpus.Corpus` gets it from WordNet, or None if
+        `word` is not a noun lemma.
+
+        :param word: the word to get the hypernym path for.
+        :type word: `str`
+        :rtype: `list`
+        """
+        index = self._find(self._lemmas, word.lower())
+
+        if index is None:
+            return None
+
+        hypernym = [word]
+        synset_id = int(self._lemma_synsets[index])
+        synsets = self._synsets
+        parents = self._parents
+
+        while synset_id != self.NONE:
+            hypernym.append(str(synsets[synset_id]))
+            synset_id = int(parents[synset_id])
+
+        return hypernym
+
+    def get_exceptions(self):
+        """Returns the WordNet noun exception list, as
+        `read_noun_exceptions` does.
+
+        :rtype: `dict`
+        """
+        return dict((str(form), str(bases).split())
+                    for form, bases in zip(self._exception_forms,
+                                           self._exception_bases))
+
+    def get_wordnet_version(self):
+        """Returns the version of WordNet the index was built from.
+
+        :rtype: `str`
+        """
+        return self._wordnet_version
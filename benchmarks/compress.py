@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+"""Benchmarks `bacalhau.topic_tree.TopicTree.compress` against the
+original recursive implementation, and against
+`bacalhau.compact_topic_tree.CompactTopicTree.compress`, on synthetic
+trees.
+
+Usage: python benchmarks/compress.py [-s SIZES] [--skip-recursive N]
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, '.')
+
+from bacalhau.compact_topic_tree import CompactTopicTree
+from bacalhau.topic_tree import TopicTree
+
+
+class RecursiveTopicTree(TopicTree):
+    """`TopicTree` with the original, recursive, compression: every
+    leaf walks up to the root, and each walk restarts from the same
+    node after an elimination."""
+
+    def compress(self, min_children=2):
+        for n in self.nodes(data=True):
+            if 'is_leaf' in n[1]:
+                self._eliminate_parents(n[0], min_children)
+
+        for n in self.nodes(data=True):
+            if 'is_leaf' in n[1]:
+                self._eliminate_child_with_parent_name(n[0])
+
+    def _eliminate_parents(self, node, min_children):
+        for p in self.predecessors(node):
+            if self.has_node(p):
+                n_children = len(self.out_edges(p))
+                has_parent = len(self.predecessors(p)) > 0
+
+                if n_children < min_children and has_parent:
+                    ancestor = self.predecessors(p)[0]
+                    children = self.successors(p)
+
+                    self.remove_node(p)
+
+                    for child in children:
+                        self.add_edge(ancestor, child)
+
+                    self._eliminate_parents(node, min_children)
+                else:
+                    self._eliminate_parents(p, min_children)
+
+    def _eliminate_child_with_parent_name(self, node):
+        for p in self.predecessors(node):
+            if self.has_node(p):
+                node_name = node[:node.find('.')]
+                p_name = p[:p.find('.')]
+
+                if node_name in p_name or p_name in node_name:
+                    children = self.successors(node)
+                    self.remove_node(node)
+
+                    for child in children:
+                        self.add_edge(p, child)
+
+                    self._eliminate_child_with_parent_name(p)
+                else:
+                    self._eliminate_child_with_parent_name(p)
+
+
+def generate_tree(tree_class, n_nodes, depth=0.5, seed=0):
+    """Returns a random tree of `tree_class` with `n_nodes` nodes,
+    named like WordNet synsets. Each node is added under one of the
+    last nodes added, so that a higher `depth` (between 0 and 1) gives
+    longer chains."""
+    rng = random.Random(seed)
+    names = []
+    parents = []
+
+    for i in xrange(n_nodes):
+        name = ''.join(rng.choice('abcde') for j in xrange(
+            rng.randint(2, 6)))
+        names.append('%s.n.%d' % (name, i))
+        if i:
+            parents.append(names[i - 1 - int((i - 1) * rng.random() ** (
+                1 / (1 - depth)))])
+
+    tree = tree_class()
+    tree.add_edges_from(zip(parents, names[1:]))
+    tree.node[names[0]]['is_root'] = True
+    for node in tree.nodes():
+        if not tree.succ[node]:
+            tree.node[node]['is_leaf'] = True
+
+    return tree
+
+
+def is_same_tree(tree, other_tree):
+    """Returns True if both trees have the same nodes and edges."""
+    return (sorted(tree.edges()) == sorted(other_tree.edges()) and
+            sorted(tree.nodes()) == sorted(other_tree.nodes()))
+
+
+def time_compress(tree, min_children):
+    """Returns the seconds taken to compress `tree`. The compression
+    runs in a thread with a large stack, so that the recursive
+    implementation can go deep."""
+    times = []
+
+    def compress():
+        start = time.time()
+        tree.compress(min_children)
+        times.append(time.time() - start)
+
+    thread = threading.Thread(target=compress)
+    thread.start()
+    thread.join()
+
+    return times[0] if times else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-s', '--sizes', default='100000,1000000',
+                        help='comma separated number of nodes of the '
+                        'trees')
+    parser.add_argument('-d', '--depth', type=float, default=0.5,
+                        help='depth of the trees, between 0 and 1')
+    parser.add_argument('-m', '--min-children', type=int, default=2)
+    parser.add_argument('--skip-recursive', type=int, default=100000,
+                        help='only time the recursive implementation '
+                        'on trees up to this size')
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(10 ** 7)
+    threading.stack_size(512 * 1024 * 1024)
+
+    for size in [int(size) for size in args.sizes.split(',')]:
+        tree = generate_tree(TopicTree, size, args.depth)
+        elapsed = time_compress(tree, args.min_children)
+        print '%9d nodes  iterative %8.2fs  %d nodes left' % (
+            size, elapsed, tree.number_of_nodes())
+
+        compact_tree = CompactTopicTree.from_networkx(
+            generate_tree(TopicTree, size, args.depth))
+        elapsed = time_compress(compact_tree, args.min_children)
+        print '%9d nodes  compact   %8.2fs  %s result' % (
+            size, elapsed,
+            'same' if is_same_tree(tree, compact_tree) else 'DIFFERENT')
+
+        if size <= args.skip_recursive:
+            recursive_tree = generate_tree(RecursiveTopicTree, size,
+                                           args.depth)
+            elapsed = time_compress(recursive_tree, args.min_children)
+
+            if elapsed is None:
+                print '%9d nodes  recursive failed' % size
+            else:
+                print '%9d nodes  recursive %8.2fs  %s result' % (
+                    size, elapsed, 'same' if is_same_tree(
+                        tree, recursive_tree) else 'DIFFERENT')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+"""Benchmarks each stage of the bacalhau pipeline on a synthetic TEI
+corpus, and saves the results as JSON.
+
+The stages are timed separately: ingestion (creating the
+`bacalhau.corpus.Corpus`), getting the term data, the top terms, the
+hypernyms and the topic tree, compressing the tree and writing it as
+JSON. The hypernyms are also looked up with the senses selected by
+`bacalhau.sense_selector.OverlapSenseSelector`, and the throughput of
+both lookups, in (text, term) pairs per second, is reported. Each run uses a new corpus object, so the bacalhau caches start
+empty; the best time of the runs, after an untimed one, is reported
+for each stage. The results include
+the commit, parameters and environment, so that runs can be compared
+across commits with --compare.
+
+Usage: python benchmarks/pipeline.py [-n DOCUMENTS] [-t TEXTS]
+       [-v VOCABULARY] [-w WORDS] [-r RUNS] [-o OUTPUT]
+       [--compare RESULTS]
+"""
+
+import argparse
+from collections import OrderedDict
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, '.')
+
+from bacalhau.corpus import Corpus
+from bacalhau.profiler import Profiler
+from bacalhau.sense_selector import OverlapSenseSelector
+from bacalhau.tei_document import TEIDocument
+from bacalhau.token_cache import TokenCache
+from tei_corpus import XPATH, generate_corpus
+
+STAGES = ['ingestion', 'get_term_data', 'get_top_terms', 'get_hypernyms',
+          'get_hypernyms:overlap', 'get_topic_tree', 'compress', 'to_json']
+# Stages whose throughput, in (text, term) pairs per second, is
+# reported.
+HYPERNYM_STAGES = ['get_hypernyms', 'get_hypernyms:overlap']
+
+
+def get_commit():
+    """Returns the hash of the checked out commit, or None if it can
+    not be found."""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            stderr=open(os.devnull, 'w')).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(corpus_path, n_terms, output_directory):
+    """Runs every stage once on the corpus at `corpus_path`, and
+    returns the `bacalhau.profiler.Profiler` that measured them and
+    the number of (text, term) pairs whose hypernyms were looked
+    up."""
+    profiler = Profiler()
+    caches = {'token_cache': TokenCache()}
+
+    with profiler.profile('ingestion', caches):
+        corpus = Corpus(corpus_path, TEIDocument,
+                        token_cache=caches['token_cache'], xpath=XPATH)
+
+    with profiler.profile('get_term_data', caches):
+        corpus._get_term_data()
+    with profiler.profile('get_top_terms', caches):
+        top_terms = corpus.get_top_terms(n_terms)
+    with profiler.profile('get_hypernyms', caches):
+        hypernyms = corpus.get_hypernyms(top_terms)
+    # A new selector, so that the sense signatures are not cached.
+    corpus._sense_selector = OverlapSenseSelector()
+    with profiler.profile('get_hypernyms:overlap', caches):
+        corpus.get_hypernyms(top_terms)
+    corpus._sense_selector = None
+    with profiler.profile('get_topic_tree', caches):
+        tree = corpus.get_topic_tree(hypernyms)
+    with profiler.profile('compress', caches):
+        tree.compress()
+    with profiler.profile('to_json', caches):
+        tree.to_json(os.path.join(output_directory, 'tree.js'))
+
+    return profiler, sum(len(terms) for terms in top_terms.itervalues())
+
+
+def benchmark(args, corpus_path, output_directory):
+    """Runs the stages `args.runs` times and returns the results."""
+    stages = OrderedDict((stage, {'times': []}) for stage in STAGES)
+    # WordNet is loaded, and fills its own caches, in the first run;
+    # that run is not timed.
+    run(corpus_path, args.number, output_directory)
+
+    for i in xrange(args.runs):
+        profiler, pairs = run(corpus_path, args.number, output_directory)
+        statistics = profiler.get_statistics()
+
+        for stage, results in stages.iteritems():
+            results['times'].append(statistics[stage]['time'])
+            results['peak_memory'] = max(results.get('peak_memory', 0),
+                                         statistics[stage]['peak_memory'])
+            results['caches'] = statistics[stage]['caches']
+
+    for results in stages.itervalues():
+        results['time'] = min(results['times'])
+
+    for stage in HYPERNYM_STAGES:
+        if stages[stage]['time'] > 0:
+            stages[stage]['throughput'] = pairs / stages[stage]['time']
+
+    return OrderedDict([
+        ('commit', get_commit()),
+        ('date', time.strftime('%Y-%m-%dT%H:%M:%S')),
+        ('python', platform.python_version()),
+        ('platform', platform.platform()),
+        ('parameters', OrderedDict([
+            ('documents', args.documents), ('texts', args.texts),
+            ('vocabulary', args.vocabulary), ('words', args.words),
+            ('seed', args.seed), ('number', args.number),
+            ('runs', args.runs)])),
+        ('stages', stages),
+    ])
+
+
+def print_results(results, baseline=None):
+    """Prints the time and peak memory of each stage, and the ratio of
+    the time to that of `baseline`, if given."""
+    if baseline is not None:
+        print 'Compared with %s (%s)' % (baseline['commit'],
+                                         baseline['date'])
+        parameters = dict(results['parameters'], runs=None)
+        if dict(baseline['parameters'], runs=None) != parameters:
+            print 'Warning: the parameters of the runs differ'
+
+    for stage, stage_results in results['stages'].iteritems():
+        line = '%-21s %10.3fs %10.1f MB' % (
+            stage, stage_results['time'],
+            stage_results['peak_memory'] / float(1 << 20))
+
+        if baseline is not None and stage in baseline['stages']:
+            baseline_time = baseline['stages'][stage]['time']
+            if baseline_time > 0:
+                line += '  %6.2fx' % (stage_results['time'] / baseline_time)
+
+        if 'throughput' in stage_results:
+            line += '  %10.0f terms/s' % stage_results['throughput']
+
+        print line
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-n', '--documents', type=int, default=50,
+                        help='number of documents')
+    parser.add_argument('-t', '--texts', type=int, default=10,
+                        help='number of texts in each document')
+    parser.add_argument('-v', '--vocabulary', type=int, default=5000,
+                        help='number of distinct nouns in the corpus')
+    parser.add_argument('-w', '--words', type=int, default=500,
+                        help='number of words in each text')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--number', type=int, default=10,
+                        help='number of terms used from each text')
+    parser.add_argument('-r', '--runs', type=int, default=3,
+                        help='number of runs of each stage')
+    parser.add_argument('--corpus', help='directory to generate the '
+                        'corpus in, and reuse on later runs; defaults '
+                        'to a temporary directory')
+    parser.add_argument('-o', '--output', help='file to save the '
+                        'results to, as JSON')
+    parser.add_argument('--compare', help='results of an earlier run to '
+                        'compare with')
+    args = parser.parse_args()
+
+    output_directory = tempfile.mkdtemp()
+    corpus_path = args.corpus or os.path.join(output_directory, 'corpus')
+
+    try:
+        if not os.path.isdir(corpus_path) or not os.listdir(corpus_path):
+            generate_corpus(corpus_path, args.documents, args.texts,
+                            args.vocabulary, args.words, args.seed)
+        results = benchmark(args, corpus_path, output_directory)
+    finally:
+        shutil.rmtree(output_directory)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+"""Generates a synthetic TEI corpus for the benchmarks.
+
+Each document has a number of texts (``div`` elements of type
+``text``) made of sentences of nouns, drawn from a vocabulary of
+WordNet noun lemmas with a Zipf distribution, mixed with stopwords.
+The same arguments always generate the same corpus.
+
+Usage: python benchmarks/tei_corpus.py DIRECTORY [-n DOCUMENTS]
+       [-t TEXTS] [-v VOCABULARY] [-w WORDS] [--seed SEED]
+"""
+
+import argparse
+from bisect import bisect
+import os
+import random
+import re
+
+from nltk.corpus import stopwords as nltk_stopwords
+from nltk.corpus import wordnet
+
+# XPath of the texts in the generated documents.
+XPATH = '//tei:body/tei:div[@type = "text"]'
+
+TEI_TEMPLATE = '''<?xml version="1.0" encoding="UTF-8"?>
+<TEI xml:id="%(id)s" xmlns="http://www.tei-c.org/ns/1.0">
+  <teiHeader>
+    <fileDesc>
+      <titleStmt>
+        <title>%(id)s</title>
+      </titleStmt>
+      <publicationStmt>
+        <p>Synthetic benchmark corpus</p>
+      </publicationStmt>
+      <sourceDesc>
+        <p>Generated by benchmarks/tei_corpus.py</p>
+      </sourceDesc>
+    </fileDesc>
+  </teiHeader>
+  <text>
+    <body>
+%(texts)s
+    </body>
+  </text>
+</TEI>
+'''
+
+TEXT_TEMPLATE = '''      <div type="text" xml:id="%(id)s">
+        <head>%(id)s</head>
+%(paragraphs)s
+      </div>'''
+
+
+def get_vocabulary(size, seed=0):
+    """Returns `size` WordNet noun lemmas, made of at least three
+    letters, chosen at random.
+
+    :param size: number of lemmas.
+    :type size: `int`
+    :param seed: seed of the random choice, defaults to 0.
+    :type seed: `int`
+    :rtype: `list`
+    """
+    lemmas = sorted(lemma for lemma in wordnet.all_lemma_names(
+        pos=wordnet.NOUN) if re.match(r'^[a-z]{3,}$', lemma))
+    return random.Random(seed).sample(lemmas, min(size, len(lemmas)))
+
+
+class TextGenerator(object):
+    """Generates the content of the texts of a corpus: sentences of
+    words drawn from a vocabulary, where the word of rank `r` is
+    drawn with a probability proportional to `1 / r ** exponent`, and
+    one word in three is a stopword."""
+
+    def __init__(self, vocabulary, stopwords, seed=0, exponent=1.0):
+        self._vocabulary = vocabulary
+        self._stopwords = stopwords
+        self._random = random.Random(seed)
+        self._cumulative_weights = []
+        total = 0.0
+
+        for rank in xrange(1, len(vocabulary) + 1):
+            total += 1.0 / rank ** exponent
+            self._cumulative_weights.append(total)
+
+    def get_word(self):
+        """Returns a word drawn from the vocabulary, or a stopword.
+
+        :rtype: `str`
+        """
+        rng = self._random
+
+        if rng.random() < 1 / 3.0:
+            return rng.choice(self._stopwords)
+
+        index = bisect(self._cumulative_weights,
+                       rng.random() * self._cumulative_weights[-1])
+        return self._vocabulary[min(index, len(self._vocabulary) - 1)]
+
+    def get_paragraph(self, n_words):
+        """Returns a paragraph of `n_words` words, in sentences of
+        five to twenty words.
+
+        :param n_words: number of words.
+        :type n_words: `int`
+        :rtype: `str`
+        """
+        sentences = []
+
+        while n_words > 0:
+            length = min(n_words, self._random.randint(5, 20))
+            words = [self.get_word() for i in xrange(length)]
+            sentences.append(' '.join(words).capitalize() + '.')
+            n_words -= length
+
+        return ' '.join(sentences)
+
+
+def generate_corpus(directory, n_documents, n_texts, vocabulary_size,
+                    n_words=500, seed=0):
+    """Writes a corpus of `n_documents` TEI files, each with `n_texts`
+    texts of about `n_words` words, to `directory`, and returns the
+    paths of the files.
+
+    :param directory: directory to write the files to, which is
+        created if it does not exist.
+    :type directory: `str`
+    :param n_documents: number of documents.
+    :type n_documents: `int`
+    :param n_texts: number of texts in each document.
+    :type n_texts: `int`
+    :param vocabulary_size: number of distinct nouns in the corpus.
+    :type vocabulary_size: `int`
+    :param n_words: number of words in each text, defaults to 500.
+    :type n_words: `int`
+    :param seed: seed of the random generators, defaults to 0.
+    :type seed: `int`
+    :rtype: `list`
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    generator = TextGenerator(get_vocabulary(vocabulary_size, seed),
+                              sorted(nltk_stopwords.words('english')),
+                              seed)
+    filepaths = []
+
+    for document in xrange(n_documents):
+        document_id = 'd%06d' % document
+        texts = []
+
+        for text in xrange(n_texts):
+            paragraphs = []
+            words_left = n_words
+
+            while words_left > 0:
+                length = min(words_left, 100)
+                paragraphs.append('        <p>%s</p>' %
+                                  generator.get_paragraph(length))
+                words_left -= length
+
+            texts.append(TEXT_TEMPLATE % {
+                'id': 't%04d' % text, 'paragraphs': '\n'.join(paragraphs)})
+
+        filepath = os.path.join(directory, document_id + '.xml')
+        with open(filepath, 'w') as tei_file:
+            tei_file.write(TEI_TEMPLATE % {'id': document_id,
+                                           'texts': '\n'.join(texts)})
+        filepaths.append(filepath)
+
+    return filepaths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('directory', help='directory to write the '
+                        'corpus to')
+    parser.add_argument('-n', '--documents', type=int, default=100,
+                        help='number of documents')
+    parser.add_argument('-t', '--texts', type=int, default=10,
+                        help='number of texts in each document')
+    parser.add_argument('-v', '--vocabulary', type=int, default=5000,
+                        help='number of distinct nouns in the corpus')
+    parser.add_argument('-w', '--words', type=int, default=500,
+                        help='number of words in each text')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    filepaths = generate_corpus(args.directory, args.documents, args.texts,
+                                args.vocabulary, args.words, args.seed)
+    print 'Wrote %d documents to %s' % (len(filepaths), args.directory)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Benchmarks the term counting of `bacalhau.pipeline.Pipeline`, with
+and without fast tokenization, on large synthetic texts, and checks
+that both give the same term data.
+
+Each path has its own `bacalhau.token_cache.TokenCache`, filled by an
+untimed run, so that only the tokenization and counting are timed;
+the best time of the runs is reported.
+
+Usage: python benchmarks/tokenization.py [-w WORDS [WORDS ...]]
+       [-v VOCABULARY] [-r RUNS]
+"""
+
+import argparse
+import json
+import sys
+import time
+
+sys.path.insert(0, '.')
+
+import nltk
+
+from bacalhau.pipeline import Pipeline
+from bacalhau.text import Text
+from tei_corpus import TextGenerator, get_vocabulary
+
+
+def time_term_data(pipeline, content, runs):
+    """Returns the best time taken to get the term data of `content`
+    with `pipeline` in `runs` runs, and the term data."""
+    best = None
+
+    for i in xrange(runs):
+        start = time.time()
+        term_data = Text('text', content, None, None, pipeline).get_term_data()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, term_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-w', '--words', type=int, nargs='+',
+                        default=[10000, 100000, 1000000],
+                        help='number of words in each text')
+    parser.add_argument('-v', '--vocabulary', type=int, default=5000,
+                        help='number of distinct nouns in the texts')
+    parser.add_argument('-r', '--runs', type=int, default=3,
+                        help='number of runs of each path')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    tokenizer = nltk.tokenize.regexp.WordPunctTokenizer()
+    stopwords = nltk.corpus.stopwords.words('english')
+    generator = TextGenerator(get_vocabulary(args.vocabulary, args.seed),
+                              sorted(stopwords), args.seed)
+    pipelines = [Pipeline(tokenizer, stopwords),
+                 Pipeline(tokenizer, stopwords, fast_tokenization=True)]
+
+    print '%10s %12s %12s %8s' % ('words', 'default', 'fast', 'speedup')
+
+    for n_words in args.words:
+        content = generator.get_paragraph(n_words)
+        results = []
+
+        for pipeline in pipelines:
+            pipeline.get_term_counts(content.lower())
+            results.append(time_term_data(pipeline, content, args.runs))
+
+        (default_time, default_data), (fast_time, fast_data) = results
+        if json.dumps(default_data, sort_keys=True) != \
+                json.dumps(fast_data, sort_keys=True):
+            raise AssertionError('The term data of the paths differ for '
+                                 '%d words' % n_words)
+
+        print '%10d %11.3fs %11.3fs %7.2fx' % (
+            n_words, default_time, fast_time, default_time / fast_time)
+
+if __name__ == '__main__':
+    main()
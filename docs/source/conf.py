@@ -36,7 +36,8 @@ class Mock(object):
         else:
             return Mock()
 
-MOCK_MODULES = ['lxml', 'nltk', 'nltk.corpus', 'nltk.stem', 'pyggraphviz']
+MOCK_MODULES = ['lxml', 'nltk', 'nltk.corpus', 'nltk.stem', 'numpy',
+        'pyggraphviz']
 for mod_name in MOCK_MODULES:
     sys.modules[mod_name] = Mock()
 
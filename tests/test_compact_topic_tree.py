@@ -0,0 +1,107 @@
+from array import array
+from bacalhau.compact_topic_tree import CompactTopicTree
+from bacalhau.topic_tree import TopicTree
+import json
+import os
+import unittest
+
+
+class TestCompactTopicTree(unittest.TestCase):
+
+    def setUp(self):
+        self.nx_tree = TopicTree()
+        self.nx_tree.add_path(['entity.n.01', 'object.n.01', 'animal.n.01',
+                               'dog.n.01', 'dogs'])
+        self.nx_tree.add_path(['entity.n.01', 'object.n.01', 'animal.n.01',
+                               'cat.n.01', 'cats'])
+        self.nx_tree.add_path(['entity.n.01', 'object.n.01', 'animal.n.01',
+                               'bird.n.01', 'birds'])
+        self.nx_tree.add_path(['entity.n.01', 'object.n.01', 'house.n.01',
+                               'houses'])
+        self.nx_tree.add_path(['entity.n.01', 'abstraction.n.01',
+                               'idea.n.01', 'ideas'])
+        for leaf in ['dogs', 'cats', 'birds', 'houses', 'ideas']:
+            self.nx_tree.node[leaf]['is_leaf'] = True
+        self.nx_tree.node['entity.n.01']['is_root'] = True
+        self.nx_tree.add_text('dogs', 'a-kafka')
+        self.tree = CompactTopicTree.from_networkx(self.nx_tree)
+
+    def test_from_networkx(self):
+        self.assertEqual(self.nx_tree.number_of_nodes(),
+                         self.tree.number_of_nodes())
+        self.assertEqual(sorted(self.nx_tree.edges()),
+                         sorted(self.tree.edges()))
+        self.assertEqual({'is_leaf': True, 'texts': array('i', [0]),
+                          'count': 1}, self.tree.get_node_data('dogs'))
+        self.assertEqual(['a-kafka'], self.tree.get_text_ids())
+        self.assertEqual('dog.n.01', self.tree.get_parent('dogs'))
+        self.assertIsNone(self.tree.get_parent('entity.n.01'))
+        self.assertEqual(['abstraction.n.01', 'object.n.01'],
+                         sorted(self.tree.get_children('entity.n.01')))
+
+    def test_to_networkx(self):
+        tree = self.tree.to_networkx()
+        self.assertIsInstance(tree, TopicTree)
+        self.assertEqual(sorted(self.nx_tree.edges()), sorted(tree.edges()))
+        self.assertEqual(sorted(self.nx_tree.nodes(data=True)),
+                         sorted(tree.nodes(data=True)))
+
+    def test_add_edge(self):
+        tree = CompactTopicTree()
+        tree.add_path(['a.n.01', 'b.n.01', 'c'])
+        tree.add_edge('b.n.01', 'c')
+        self.assertEqual(3, tree.number_of_nodes())
+        self.assertRaises(ValueError, tree.add_edge, 'a.n.01', 'c')
+
+    def test_add_text(self):
+        self.tree.add_text('dog.n.01', 'b-cicero')
+        self.tree.add_text('dog.n.01', 'a-kafka')
+        self.tree.add_text('dog.n.01', 'b-cicero')
+        self.assertEqual({'texts': array('i', [0, 1]), 'count': 2},
+                         self.tree.get_node_data('dog.n.01'))
+        self.assertEqual(['a-kafka', 'b-cicero'], self.tree.get_text_ids())
+
+    def test_compress(self):
+        self.nx_tree.compress()
+        self.tree.compress()
+        self.assertEqual(sorted(self.nx_tree.edges()),
+                         sorted(self.tree.edges()))
+        self.assertEqual(sorted(self.nx_tree.nodes()),
+                         sorted(self.tree.nodes()))
+
+    def test_compress_moved_nodes(self):
+        for leaves, has_node in [(['xyz1'], True),
+                                 (['xyz1', 'xyz2'], False)]:
+            tree = CompactTopicTree()
+            for leaf in leaves:
+                tree.add_path(['abc.n.01', 'ab.n.01', 'bc.n.01', leaf])
+                tree.set_leaf(leaf)
+            tree.compress(min_children=1)
+            self.assertFalse(tree.has_node('ab.n.01'))
+            self.assertEqual(has_node, tree.has_node('bc.n.01'))
+
+    def test_prune(self):
+        self.tree.prune(['object.n.01', 'unknown'])
+        self.assertFalse(self.tree.has_node('object.n.01'))
+        self.assertIsNone(self.tree.get_parent('animal.n.01'))
+        self.assertEqual(['abstraction.n.01'],
+                         self.tree.get_children('entity.n.01'))
+
+    def test_to_json(self):
+        filename = 'test_compact.js'
+
+        self.addCleanup(os.remove, filename)
+        self.tree.to_json(filename)
+
+        with open(filename) as json_file:
+            data = json.load(json_file)
+        self.assertEqual([['texts', ['a-kafka']]], data['graph'])
+        self.assertIn({'id': 'dogs', 'is_leaf': True, 'texts': [0],
+                       'count': 1}, data['nodes'])
+        names = [node['id'] for node in data['nodes']]
+        self.assertEqual(sorted(self.nx_tree.edges()),
+                         sorted((names[link['source']], names[link['target']])
+                                for link in data['links']))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,23 @@
-from bacalhau.corpus import Corpus
+from bacalhau.corpus import Corpus, write_partials
+from bacalhau.document_cache import DocumentCache
+from bacalhau.hypernym_cache import HypernymCache
+from bacalhau.profiler import Profiler
 from bacalhau.tei_document import TEIDocument
+import nltk
+import os
+import shutil
+import tempfile
 import unittest
 
 
+class BaselineDocument(TEIDocument):
+
+    def __init__(self, filepath, tokenizer, stopwords):
+        super(BaselineDocument, self).__init__(
+            filepath, tokenizer, stopwords,
+            '//tei:body/tei:div[@type = "dummy"]')
+
+
 class TestCorpus(unittest.TestCase):
 
     def setUp(self):
@@ -16,6 +31,134 @@ class TestCorpus(unittest.TestCase):
         self.assertIsNotNone(docs)
         self.assertEqual(2, len(docs))
 
+    def test__get_documents_workers(self):
+        corpus = Corpus('tests/corpus', TEIDocument, workers=2,
+                        xpath='//tei:body/tei:div[@type = "dummy"]')
+        docs = corpus._get_documents()
+        self.assertEqual(2, len(docs))
+        self.assertEqual(self.corpus._get_term_data(),
+                         corpus._get_term_data())
+        self.assertEqual(self.corpus.get_top_terms(n_terms=10),
+                         corpus.get_top_terms(n_terms=10))
+
+    def test__get_documents_baseline(self):
+        for workers in (1, 2):
+            corpus = Corpus('tests/corpus', BaselineDocument,
+                            workers=workers)
+            self.assertEqual(2, len(corpus._get_documents()))
+            self.assertEqual(self.corpus._get_term_data(),
+                             corpus._get_term_data())
+
+    def test__get_term_matrix(self):
+        corpus = Corpus('tests/corpus', TEIDocument, streaming=True,
+                        xpath='//tei:body/tei:div[@type = "dummy"]')
+        self.assertIsNone(corpus._documents)
+        self.assertEqual(3, corpus._get_text_count())
+        self.assertEqual(self.corpus._get_term_data(),
+                         corpus._get_term_data())
+        self.assertEqual(self.corpus.get_top_terms(n_terms=10),
+                         corpus.get_top_terms(n_terms=10))
+
+    def test__get_term_matrix_document_cache(self):
+        cache_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_path)
+        for i in range(2):
+            cache = DocumentCache(cache_path)
+            corpus = Corpus('tests/corpus', TEIDocument, streaming=True,
+                            document_cache=cache,
+                            xpath='//tei:body/tei:div[@type = "dummy"]')
+            self.assertEqual(self.corpus._get_term_data(),
+                             corpus._get_term_data())
+        self.assertEqual({'hits': 2, 'misses': 0}, cache.get_statistics())
+
+    def test__get_term_matrix_document_cache_copy(self):
+        cache = DocumentCache(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, cache._directory)
+        corpus_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, corpus_path)
+        shutil.copy('tests/corpus/a.xml', corpus_path)
+        shutil.copy('tests/corpus/a.xml', os.path.join(corpus_path, 'z.xml'))
+        corpus = Corpus(corpus_path, TEIDocument, streaming=True,
+                        document_cache=cache,
+                        xpath='//tei:body/tei:div[@type = "dummy"]')
+        self.assertEqual(['a-kafka', 'a-werther', 'z-kafka', 'z-werther'],
+                         sorted(corpus._get_term_matrix().get_text_ids()))
+        self.assertEqual(2, cache.get_statistics()['misses'])
+        # Moving the corpus keeps the entries of its files.
+        moved_path = corpus_path + '-moved'
+        os.rename(corpus_path, moved_path)
+        self.addCleanup(os.rename, moved_path, corpus_path)
+        cache = DocumentCache(cache._directory)
+        corpus = Corpus(moved_path, TEIDocument, streaming=True,
+                        document_cache=cache,
+                        xpath='//tei:body/tei:div[@type = "dummy"]')
+        self.assertEqual(['a-kafka', 'a-werther', 'z-kafka', 'z-werther'],
+                         sorted(corpus._get_term_matrix().get_text_ids()))
+        self.assertEqual(0, cache.get_statistics()['misses'])
+
+    def _get_partial_corpus(self, **kwargs):
+        corpus_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, corpus_path)
+        shutil.copy('tests/corpus/a.xml', corpus_path)
+        return Corpus(corpus_path, TEIDocument,
+                      xpath='//tei:body/tei:div[@type = "dummy"]', **kwargs)
+
+    def test_add_document(self):
+        corpus = self._get_partial_corpus()
+        self.assertEqual(2, corpus._get_text_count())
+        tree = corpus.generate_topic_tree(n_terms=10)
+        corpus.add_document('tests/corpus/b.xml')
+        self.assertEqual(3, corpus._get_text_count())
+        self.assertEqual(2, len(corpus._documents))
+        self.assertEqual(self.corpus._get_term_data(),
+                         corpus._get_term_data())
+        tree = corpus.update_topic_tree(tree, n_terms=10)
+        expected_tree = self.corpus.generate_topic_tree(n_terms=10)
+        self.assertEqual(sorted(expected_tree.nodes(data=True)),
+                         sorted(tree.nodes(data=True)))
+        self.assertEqual(sorted(expected_tree.edges()),
+                         sorted(tree.edges()))
+
+    def test_remove_document(self):
+        corpus = self._get_partial_corpus(streaming=True)
+        expected_tree = corpus.generate_topic_tree(n_terms=10)
+        tree = self.corpus.generate_topic_tree(n_terms=10)
+        self.corpus.remove_document('tests/corpus/b.xml')
+        self.assertEqual(2, self.corpus._get_text_count())
+        self.assertEqual(1, len(self.corpus._documents))
+        self.assertEqual(corpus._get_term_data(),
+                         self.corpus._get_term_data())
+        tree = self.corpus.update_topic_tree(tree, n_terms=10)
+        self.assertEqual(sorted(expected_tree.nodes(data=True)),
+                         sorted(tree.nodes(data=True)))
+        self.assertEqual(sorted(expected_tree.edges()),
+                         sorted(tree.edges()))
+
+    def test_update_topic_tree_not_generated(self):
+        tree = self.corpus.get_topic_tree(self.corpus.get_hypernyms(
+            self.corpus.get_top_terms(10)))
+        self.assertRaises(ValueError, self.corpus.update_topic_tree, tree, 10)
+        list(self.corpus.generate_topic_trees([{'n_terms': 10}]))
+        self.assertRaises(ValueError, self.corpus.update_topic_tree, tree, 10)
+
+    def test_remove_document_same_name(self):
+        corpus_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, corpus_path)
+        for directory in ('x', 'y'):
+            os.mkdir(os.path.join(corpus_path, directory))
+            shutil.copy('tests/corpus/a.xml',
+                        os.path.join(corpus_path, directory))
+        corpus = Corpus(corpus_path, TEIDocument, streaming=True,
+                        xpath='//tei:body/tei:div[@type = "dummy"]')
+        self.assertEqual(4, corpus._get_text_count())
+        corpus.remove_document(os.path.join(corpus_path, 'y', 'a.xml'))
+        self.assertEqual(2, corpus._get_text_count())
+        self.assertEqual([os.path.join(corpus_path, 'x', 'a.xml')],
+                         corpus._document_text_ids.keys())
+        expected_corpus = self._get_partial_corpus(streaming=True)
+        self.assertEqual(list(expected_corpus._term_matrix.iter_texts()),
+                         list(corpus._term_matrix.iter_texts()))
+
     def test__get_text_count(self):
         count = self.corpus._get_text_count()
         self.assertEqual(3, count)
@@ -42,12 +185,42 @@ class TestCorpus(unittest.TestCase):
         self.assertGreater(len(tf_idf), 0)
         self.assertTrue('tf.idf' in tf_idf.values()[0].values()[0])
 
+    def test_get_top_term_scores(self):
+        term_data = self.corpus._add_tf_idf(self.corpus._get_term_data())
+        top_terms = self.corpus.get_top_term_scores(n_terms=10)
+        self.assertEqual(3, len(top_terms))
+        for text, scores in top_terms.items():
+            self.assertEqual(10, len(scores))
+            text_scores = sorted(
+                ((-data[text]['tf.idf'], term)
+                 for term, data in term_data.items() if text in data))
+            self.assertEqual([(term, -score)
+                              for score, term in text_scores[:10]],
+                             scores)
+
     def test_get_hypernyms(self):
         terms = self.corpus.get_top_terms(n_terms=10)
         hypernyms = self.corpus.get_hypernyms(terms)
         self.assertIsNotNone(hypernyms)
         self.assertGreater(len(hypernyms), 0)
 
+    def test_get_hypernyms_cached(self):
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        terms = self.corpus.get_top_terms(n_terms=10)
+        hypernyms = self.corpus.get_hypernyms(terms)
+        for i in range(2):
+            cache = HypernymCache(path)
+            corpus = Corpus('tests/corpus', TEIDocument,
+                            hypernym_cache=cache,
+                            xpath='//tei:body/tei:div[@type = "dummy"]')
+            self.assertEqual(hypernyms, corpus.get_hypernyms(terms))
+            statistics = cache.get_statistics()
+            cache.close()
+        self.assertEqual(0, statistics['misses'])
+        self.assertGreater(statistics['hits'], 0)
+
     def test_get__hypernym(self):
         hypernym = self.corpus._get_hypernym('dog')
         self.assertIsNotNone(hypernym)
@@ -60,6 +233,15 @@ class TestCorpus(unittest.TestCase):
         self.assertIsNotNone(tree)
         self.assertGreater(tree.number_of_nodes, 0)
 
+    def test_get_topic_tree_compact(self):
+        terms = self.corpus.get_top_terms(n_terms=10)
+        hypernyms = self.corpus.get_hypernyms(terms)
+        tree = self.corpus.get_topic_tree(hypernyms)
+        compact_tree = self.corpus.get_topic_tree(hypernyms, compact=True)
+        self.assertEqual(sorted(tree.edges()), sorted(compact_tree.edges()))
+        self.assertEqual(sorted(tree.nodes(data=True)),
+                         sorted(compact_tree.to_networkx().nodes(data=True)))
+
     def test_annotate_topic_tree(self):
         tree = self.corpus.generate_topic_tree(n_terms=10)
         tree = self.corpus.annotate_topic_tree(tree)
@@ -68,5 +250,128 @@ class TestCorpus(unittest.TestCase):
         self.assertTrue('texts' in tree.node[tree.nodes()[0]])
         self.assertTrue('count' in tree.node[tree.nodes()[0]])
 
+    def test_generate_topic_tree_annotate(self):
+        expected_tree = self.corpus.annotate_topic_tree(
+            self.corpus.generate_topic_tree(n_terms=10))
+        expected_texts = expected_tree.graph['texts']
+        for compact in (False, True):
+            tree = self.corpus.generate_topic_tree(n_terms=10,
+                                                   compact=compact,
+                                                   annotate=True)
+            if compact:
+                tree = tree.to_networkx()
+            texts = tree.graph['texts']
+            for node, data in expected_tree.nodes_iter(data=True):
+                self.assertEqual(
+                    sorted(expected_texts[index] for index in data['texts']),
+                    sorted(texts[index] for index in tree.node[node]['texts']))
+                self.assertEqual(data['count'], tree.node[node]['count'])
+
+    def test_fast_tokenization(self):
+        corpus = Corpus('tests/corpus', TEIDocument, fast_tokenization=True,
+                        xpath='//tei:body/tei:div[@type = "dummy"]')
+        self.assertEqual(self.corpus._get_term_data(),
+                         corpus._get_term_data())
+
+    def test_partials(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        xpath = '//tei:body/tei:div[@type = "dummy"]'
+        partials = write_partials(directory, 'tests/corpus', TEIDocument, 2,
+                                  xpath=xpath)
+        self.assertEqual(2, len(partials))
+        corpus = Corpus('tests/corpus', TEIDocument, xpath=xpath,
+                        partials=list(reversed(partials)))
+        self.assertEqual(self.corpus._get_term_data(),
+                         corpus._get_term_data())
+        self.assertEqual(self.corpus.get_top_term_scores(10),
+                         corpus.get_top_term_scores(10))
+        self.assertEqual(dict(self.corpus._document_text_ids),
+                         dict(corpus._document_text_ids))
+        self.assertRaises(ValueError, Corpus, 'tests/corpus', TEIDocument,
+                          xpath=xpath, partials=partials[:1])
+        self.assertRaises(ValueError, Corpus, 'tests/corpus', TEIDocument,
+                          partials=partials)
+
+    def test_partials_workers(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        xpath = '//tei:body/tei:div[@type = "dummy"]'
+        partials = write_partials(directory, 'tests/corpus', TEIDocument, 2,
+                                  workers=2, xpath=xpath)
+        corpus = Corpus('tests/corpus', TEIDocument, xpath=xpath,
+                        partials=partials)
+        self.assertEqual(self.corpus._get_term_data(),
+                         corpus._get_term_data())
+
+    def test__get_settings(self):
+        xpath = '//tei:body/tei:div[@type = "dummy"]'
+        settings = []
+        for tokenizer in (nltk.tokenize.PunktWordTokenizer(),
+                          nltk.tokenize.PunktWordTokenizer(),
+                          nltk.tokenize.RegexpTokenizer(r'\w+'),
+                          nltk.tokenize.RegexpTokenizer(r'\w+'),
+                          nltk.tokenize.RegexpTokenizer(r'\w+', gaps=True)):
+            corpus = Corpus('tests/corpus', TEIDocument, tokenizer,
+                            xpath=xpath)
+            settings.append(corpus._get_settings())
+        self.assertNotIn(' at 0x', settings[0])
+        self.assertEqual(settings[0], settings[1])
+        self.assertEqual(settings[2], settings[3])
+        self.assertEqual(3, len(set(settings)))
+
+    def test_shard(self):
+        filepaths = []
+        for index in range(2):
+            corpus = Corpus('tests/corpus', TEIDocument, shard=(index, 2),
+                            xpath='//tei:body/tei:div[@type = "dummy"]')
+            filepaths.extend(corpus._get_filepaths())
+        self.assertEqual(sorted(self.corpus._get_filepaths()),
+                         sorted(filepaths))
+
+    def test_prefetch(self):
+        for streaming in (False, True):
+            corpus = Corpus('tests/corpus', TEIDocument, prefetch=1,
+                            streaming=streaming,
+                            xpath='//tei:body/tei:div[@type = "dummy"]')
+            self.assertEqual(self.corpus._get_term_data(),
+                             corpus._get_term_data())
+
+    def test_generate_topic_trees(self):
+        settings = [{'n_terms': 3, 'compress': False},
+                    {'n_terms': 10, 'min_children': 3},
+                    {'n_terms': 5, 'prune': ['entity.n.01']},
+                    {'n_terms': 5, 'compact': True}]
+        expected = []
+        for tree_settings in settings:
+            tree = self.corpus.generate_topic_tree(
+                n_terms=tree_settings['n_terms'],
+                compact=tree_settings.get('compact', False))
+            tree.prune(tree_settings.get('prune', []))
+            if tree_settings.get('compress', True):
+                tree.compress(tree_settings.get('min_children', 2))
+            expected.append(sorted(tree.edges()))
+
+        for workers in (1, 2):
+            trees = list(self.corpus.generate_topic_trees(settings,
+                                                          workers=workers))
+            self.assertEqual(expected,
+                             [sorted(tree.edges()) for tree in trees])
+
+        self.assertRaises(ValueError, list,
+                          self.corpus.generate_topic_trees([{'n': 3}]))
+
+    def test_profiler(self):
+        profiler = Profiler()
+        corpus = Corpus('tests/corpus', TEIDocument, profiler=profiler,
+                        xpath='//tei:body/tei:div[@type = "dummy"]')
+        corpus.generate_topic_tree(n_terms=10)
+        statistics = profiler.get_statistics()
+        self.assertEqual(['ingestion:TEIDocument', 'get_top_terms',
+                          'get_hypernyms', 'get_topic_tree'],
+                         list(statistics))
+        self.assertIn('token_cache',
+                      statistics['ingestion:TEIDocument']['caches'])
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,6 @@
 from bacalhau.tei_document import TEIDocument
 import nltk
+import os
 import unittest
 
 
@@ -15,6 +16,16 @@ class TestDocument(unittest.TestCase):
     def test_get_text_count(self):
         self.assertEqual(2, self.doc.get_text_count())
 
+    def test_get_path(self):
+        self.assertEqual(os.path.abspath(self.filepath), self.doc.get_path())
+
+    def test_get_term_counts(self):
+        term_counts = self.doc.get_term_counts()
+        self.assertEqual(2, len(term_counts))
+        text_id, counts = term_counts[0]
+        self.assertEqual('a-kafka', text_id)
+        self.assertGreater(len(counts), 0)
+
     def test_get_texts(self):
         texts = self.doc.get_texts()
         self.assertEqual(2, len(texts))
@@ -0,0 +1,40 @@
+from bacalhau.document_cache import DocumentCache
+import shutil
+import tempfile
+import unittest
+
+
+class TestDocumentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = DocumentCache(self.directory)
+        self.filepath = 'tests/corpus/a.xml'
+
+    def test_get_key(self):
+        key = self.cache.get_key(self.filepath, 'settings')
+        self.assertEqual(key, self.cache.get_key(self.filepath, 'settings'))
+        self.assertNotEqual(key, self.cache.get_key(self.filepath, 'other'))
+        self.assertNotEqual(key, self.cache.get_key('tests/corpus/b.xml',
+                                                    'settings'))
+        with open(self.filepath, 'rb') as corpus_file:
+            content = corpus_file.read()
+        self.assertEqual(key, self.cache.get_key(self.filepath, 'settings',
+                                                 content))
+        self.assertNotEqual(key, self.cache.get_key('other.xml', 'settings',
+                                                    content))
+        self.assertEqual(key, self.cache.get_key('/elsewhere/a.xml',
+                                                 'settings', content))
+
+    def test_get(self):
+        key = self.cache.get_key(self.filepath, 'settings')
+        self.assertIsNone(self.cache.get(key))
+        term_counts = [('a-kafka', {'dream': 2, 'bed': 1}), ('a-x', {})]
+        self.cache.set(key, term_counts)
+        self.assertEqual(term_counts, DocumentCache(self.directory).get(key))
+        self.assertEqual({'hits': 0, 'misses': 1},
+                         self.cache.get_statistics())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+from bacalhau.file_prefetcher import FilePrefetcher
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestFilePrefetcher(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filepaths = []
+        for i in range(20):
+            filepath = os.path.join(self.directory, '%02d.txt' % i)
+            with open(filepath, 'wb') as output_file:
+                output_file.write('content %d' % i)
+            self.filepaths.append(filepath)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_iter(self):
+        for depth in (1, 3, 50):
+            self.assertEqual(
+                [(filepath, 'content %d' % i)
+                 for i, filepath in enumerate(self.filepaths)],
+                list(FilePrefetcher(self.filepaths, depth)))
+        self.assertEqual([], list(FilePrefetcher([], 2)))
+        self.assertRaises(ValueError, FilePrefetcher, self.filepaths, 0)
+
+    def test_iter_error(self):
+        filepaths = self.filepaths[:2] + [
+            os.path.join(self.directory, 'missing.txt')]
+        files = iter(FilePrefetcher(filepaths, 2))
+        self.assertEqual(self.filepaths[0], next(files)[0])
+        self.assertEqual(self.filepaths[1], next(files)[0])
+        self.assertRaises(IOError, next, files)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+from bacalhau.hypernym_cache import HypernymCache
+import os
+import tempfile
+import unittest
+
+
+class TestHypernymCache(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        self.cache = HypernymCache(self.path, max_size=2, version='3.0')
+        self.addCleanup(self.cache.close)
+
+    def test_get(self):
+        self.assertIsNone(self.cache.get('dog'))
+        self.cache.set('dog', ['dog', 'dog.n.01', 'entity.n.01'])
+        self.assertEqual(['dog', 'dog.n.01', 'entity.n.01'],
+                         self.cache.get('dog'))
+
+    def test_sync(self):
+        self.cache.set('dog', ['dog', 'dog.n.01'])
+        self.cache.sync()
+        cache = HypernymCache(self.path, version='3.0')
+        self.assertEqual(['dog', 'dog.n.01'], cache.get('dog'))
+        cache.close()
+        cache = HypernymCache(self.path, version='3.1')
+        self.assertIsNone(cache.get('dog'))
+        cache.close()
+
+    def test_sync_eviction(self):
+        self.cache.set('dog', ['dog', 'dog.n.01'])
+        self.cache.set('cat', ['cat', 'cat.n.01'])
+        self.cache.sync()
+        self.cache.get('dog')
+        self.cache.set('fox', ['fox', 'fox.n.01'])
+        self.cache.sync()
+        self.assertEqual(2, self.cache.get_size())
+        self.assertIsNone(self.cache.get('cat'))
+        self.assertIsNotNone(self.cache.get('dog'))
+
+    def test_get_statistics(self):
+        self.cache.get('dog')
+        self.cache.set('dog', ['dog', 'dog.n.01'])
+        self.cache.get('dog')
+        self.cache.sync()
+        self.assertEqual({'hits': 1, 'misses': 1, 'size': 1},
+                         self.cache.get_statistics())
+
+if __name__ == '__main__':
+    unittest.main()
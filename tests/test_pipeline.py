@@ -0,0 +1,44 @@
+from bacalhau.pipeline import Pipeline
+from bacalhau.token_cache import TokenCache
+import nltk
+import unittest
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.token_cache = TokenCache()
+        self.pipeline = Pipeline(nltk.tokenize.regexp.WordPunctTokenizer(),
+                                 nltk.corpus.stopwords.words('english'),
+                                 self.token_cache)
+
+    def test_get_token_cache(self):
+        self.assertIs(self.token_cache, self.pipeline.get_token_cache())
+
+    def test_get_term_counts(self):
+        term_counts = self.pipeline.get_term_counts(
+            'the quick brown fox jumps over the lazy dog, dogs.')
+        self.assertEqual({'quick': 1, 'brown': 1, 'fox': 1, 'jump': 1,
+                          'dog': 2}, term_counts)
+
+    def test_fast_tokenization(self):
+        pipeline = Pipeline(nltk.tokenize.regexp.WordPunctTokenizer(),
+                            nltk.corpus.stopwords.words('english'),
+                            fast_tokenization=True)
+        for content in ['the quick brown fox jumps over the lazy dog, dogs.',
+                        u'caf\xe9 dogs_cats dog2 geese-geese\tfox\n']:
+            self.assertEqual(self.pipeline.get_term_counts(content),
+                             pipeline.get_term_counts(content))
+        self.assertRaises(ValueError, Pipeline,
+                          nltk.tokenize.WhitespaceTokenizer(), [],
+                          fast_tokenization=True)
+
+    def test_is_valid_token(self):
+        self.assertTrue(self.pipeline.is_valid_token('dog'))
+        self.assertTrue(self.pipeline.is_valid_token('dogs'))
+        self.assertFalse(self.pipeline.is_valid_token('the'))
+        self.assertFalse(self.pipeline.is_valid_token('lazy'))
+        self.assertFalse(self.pipeline.is_valid_token('dog2'))
+
+if __name__ == '__main__':
+    unittest.main()
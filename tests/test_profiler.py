@@ -0,0 +1,76 @@
+from bacalhau.profiler import Profiler
+import unittest
+
+
+class Cache(object):
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get_statistics(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.profiler = Profiler()
+        self.cache = Cache()
+
+    def test_profile(self):
+        for hits in (3, 1):
+            with self.profiler.profile('lookup', {'cache': self.cache,
+                                                  'missing': None}):
+                self.cache.hits += hits
+                self.cache.misses += 1
+        with self.profiler.profile('count', {'cache': self.cache}):
+            pass
+
+        statistics = self.profiler.get_statistics()
+        self.assertEqual(['lookup', 'count'], list(statistics))
+        self.assertEqual(2, statistics['lookup']['calls'])
+        self.assertEqual({'cache': {'hits': 4, 'misses': 2,
+                                    'hit_rate': 4 / 6.0}},
+                         statistics['lookup']['caches'])
+        self.assertEqual({}, statistics['count']['caches'])
+        self.assertGreater(statistics['count']['peak_memory'], 0)
+        self.assertGreaterEqual(statistics['count']['time'], 0)
+
+    def test_profile_error(self):
+        def lookup():
+            with self.profiler.profile('lookup', {'cache': self.cache}):
+                self.cache.misses += 1
+                raise KeyError('dog')
+        self.assertRaises(KeyError, lookup)
+
+        statistics = self.profiler.get_statistics()
+        self.assertEqual(1, statistics['lookup']['calls'])
+        self.assertEqual(1, statistics['lookup']['caches']['cache']['misses'])
+
+    def test_add_hook(self):
+        calls = []
+        self.profiler.add_hook(
+            lambda stage, measurements: calls.append((stage, measurements)))
+        with self.profiler.profile('lookup', {'cache': self.cache}):
+            self.cache.misses += 1
+
+        self.assertEqual(1, len(calls))
+        stage, measurements = calls[0]
+        self.assertEqual('lookup', stage)
+        self.assertEqual({'cache': {'hits': 0, 'misses': 1}},
+                         measurements['caches'])
+        self.assertEqual(['caches', 'peak_memory', 'time'],
+                         sorted(measurements))
+
+    def test_get_report(self):
+        with self.profiler.profile('lookup', {'cache': self.cache}):
+            self.cache.hits += 1
+            self.cache.misses += 3
+        lines = self.profiler.get_report().splitlines()
+        self.assertEqual(2, len(lines))
+        self.assertTrue(lines[1].startswith('lookup'))
+        self.assertIn('cache 25.0% (1/4)', lines[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+from bacalhau.corpus import Corpus
+from bacalhau.sense_selector import (FirstSenseSelector,
+                                     OverlapSenseSelector, SenseSelector)
+from bacalhau.tei_document import TEIDocument
+from nltk.corpus import wordnet
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TextSenseSelector(FirstSenseSelector):
+    """Selects the sense of each term given for each text."""
+
+    def __init__(self, text_senses):
+        self._text_senses = text_senses
+
+    def select_senses(self, top_terms, term_matrix, pipeline):
+        senses = super(TextSenseSelector, self).select_senses(
+            top_terms, term_matrix, pipeline)
+        for text, text_senses in self._text_senses.iteritems():
+            for term, name in text_senses.iteritems():
+                if term in top_terms.get(text, []):
+                    senses[text][term] = wordnet.synset(name)
+        return senses
+
+
+class TestSenseSelector(unittest.TestCase):
+
+    def setUp(self):
+        self.corpus = Corpus('tests/corpus', TEIDocument,
+                             xpath='//tei:body/tei:div[@type = "dummy"]')
+        self.top_terms = self.corpus.get_top_terms(10)
+
+    def _select_senses(self, selector, top_terms):
+        return selector.select_senses(top_terms, self.corpus._term_matrix,
+                                      self.corpus._pipeline)
+
+    def test_abstract(self):
+        self.assertRaises(TypeError, SenseSelector)
+
+    def test_first_sense(self):
+        senses = self._select_senses(FirstSenseSelector(), self.top_terms)
+        for text, terms in self.top_terms.iteritems():
+            for term in terms:
+                self.assertEqual(wordnet.synsets(term)[0], senses[text][term])
+
+    def test_overlap(self):
+        selector = OverlapSenseSelector()
+        senses = self._select_senses(selector, self.top_terms)
+        self.assertEqual(set(self.top_terms), set(senses))
+        for text, terms in self.top_terms.iteritems():
+            for term in terms:
+                self.assertIn(senses[text][term],
+                              wordnet.synsets(term, pos=wordnet.NOUN))
+        # "annoying" is one of the top terms of the Cicero text, and
+        # is in the definition of this sense of "pain".
+        self.assertEqual('pain.n.04', senses['b-cicero']['pain'].name)
+        # Terms with no overlap get their first sense.
+        self.assertEqual(wordnet.synsets('pleasure')[0],
+                         senses['b-cicero']['pleasure'])
+        self.assertEqual(senses, self._select_senses(selector,
+                                                     self.top_terms))
+
+    def test_overlap_unknown_term(self):
+        top_terms = {'b-cicero': ['pain', 'xyzzy']}
+        senses = self._select_senses(OverlapSenseSelector(), top_terms)
+        self.assertIsNone(senses['b-cicero']['xyzzy'])
+
+    def test_corpus(self):
+        hypernyms = self.corpus.get_hypernyms(self.top_terms)
+        corpus = Corpus('tests/corpus', TEIDocument,
+                        sense_selector=FirstSenseSelector(),
+                        xpath='//tei:body/tei:div[@type = "dummy"]')
+        selected_hypernyms = corpus.get_hypernyms(self.top_terms)
+        for text, terms in self.top_terms.iteritems():
+            for term in terms:
+                # The leaves are named after the term and its sense.
+                path = hypernyms[text][term]
+                if len(path) > 1:
+                    path = path[:-1] + ['%s (%s)' % (term, path[-2])]
+                self.assertEqual(path, selected_hypernyms[text][term])
+        corpus = Corpus('tests/corpus', TEIDocument,
+                        sense_selector=OverlapSenseSelector(),
+                        xpath='//tei:body/tei:div[@type = "dummy"]')
+        hypernyms = corpus.get_hypernyms(self.top_terms)
+        self.assertEqual(['entity.n.01', 'physical_entity.n.01',
+                          'object.n.01', 'whole.n.02', 'living_thing.n.01',
+                          'organism.n.01', 'person.n.01',
+                          'unwelcome_person.n.01', 'unpleasant_person.n.01',
+                          'pain.n.04', 'pain (pain.n.04)'],
+                         hypernyms['b-cicero']['pain'])
+
+    def test_corpus_different_senses(self):
+        corpus = Corpus('tests/corpus', TEIDocument,
+                        sense_selector=TextSenseSelector(
+                            {'a-kafka': {'room': 'room.n.01'},
+                             'a-werther': {'room': 'room.n.02'}}),
+                        xpath='//tei:body/tei:div[@type = "dummy"]')
+        top_terms = {'a-kafka': ['room', 'bed'],
+                     'a-werther': ['room', 'soul']}
+        hypernyms = corpus.get_hypernyms(top_terms)
+        self.assertEqual(['room.n.01', 'room (room.n.01)'],
+                         hypernyms['a-kafka']['room'][-2:])
+        self.assertEqual(['room.n.02', 'room (room.n.02)'],
+                         hypernyms['a-werther']['room'][-2:])
+        self.assertEqual('bed (bed.n.01)', hypernyms['a-kafka']['bed'][-1])
+        for compact in (False, True):
+            tree = corpus.get_topic_tree(hypernyms, compact=compact)
+            self.assertTrue(tree.has_node('room (room.n.01)'))
+            self.assertTrue(tree.has_node('room (room.n.02)'))
+
+    def test_update_topic_tree_different_senses(self):
+        corpus_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, corpus_path)
+        shutil.copy('tests/corpus/a.xml', corpus_path)
+        filepath = os.path.join(corpus_path, 'z.xml')
+        shutil.copy('tests/corpus/a.xml', filepath)
+        kwargs = {'xpath': '//tei:body/tei:div[@type = "dummy"]',
+                  'sense_selector': TextSenseSelector(
+                      {'a-kafka': {'room': 'room.n.01'},
+                       'z-kafka': {'room': 'room.n.02'}})}
+        expected_tree = Corpus(corpus_path, TEIDocument,
+                               **kwargs).generate_topic_tree(50)
+        corpus = Corpus(corpus_path, TEIDocument, **kwargs)
+        corpus.remove_document(filepath)
+        tree = corpus.generate_topic_tree(50)
+        corpus.add_document(filepath)
+        tree = corpus.update_topic_tree(tree, 50)
+        self.assertFalse(tree.has_node('room'))
+        self.assertEqual(['room.n.01'],
+                         tree.predecessors('room (room.n.01)'))
+        self.assertEqual(['room.n.02'],
+                         tree.predecessors('room (room.n.02)'))
+        self.assertEqual(sorted(expected_tree.nodes(data=True)),
+                         sorted(tree.nodes(data=True)))
+        self.assertEqual(sorted(expected_tree.edges()),
+                         sorted(tree.edges()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+from bacalhau.streaming_tei_document import StreamingTEIDocument
+from bacalhau.tei_document import TEIDocument
+import nltk
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestStreamingTEIDocument(unittest.TestCase):
+
+    def setUp(self):
+        self.filepath = 'tests/corpus/a.xml'
+        self.tokenizer = nltk.tokenize.regexp.WordPunctTokenizer()
+        self.stopwords = nltk.corpus.stopwords.words('english')
+        self.xpath = '//tei:body/tei:div[@type = "dummy"]'
+        self.doc = StreamingTEIDocument(self.filepath, self.tokenizer,
+                self.stopwords, self.xpath)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _assert_same_term_counts(self, filepath, xpath):
+        expected = TEIDocument(filepath, self.tokenizer, self.stopwords,
+                               xpath)
+        doc = StreamingTEIDocument(filepath, self.tokenizer,
+                                   self.stopwords, xpath)
+        self.assertEqual(expected.get_term_counts(), doc.get_term_counts())
+
+    def test_get_text_count(self):
+        self.assertEqual(2, self.doc.get_text_count())
+
+    def test_get_term_counts(self):
+        term_counts = self.doc.get_term_counts()
+        self.assertEqual(['a-kafka', 'a-werther'],
+                         [text_id for text_id, counts in term_counts])
+        self._assert_same_term_counts(self.filepath, self.xpath)
+
+    def test_get_steps(self):
+        tei = '{%s}' % TEIDocument.TEI_NAMESPACE
+        self.assertEqual([('//', tei + 'body', {}),
+                          ('/', tei + 'div', {'type': 'dummy'})],
+                         self.doc._get_steps())
+
+    def test_streamed_xpaths(self):
+        for xpath in ['/tei:TEI/tei:text/tei:body/tei:div',
+                      '//tei:text//tei:p',
+                      '//*[@type="dummy"]',
+                      "//tei:div[@type='dummy'][@xml:id='kafka']"]:
+            doc = StreamingTEIDocument(self.filepath, self.tokenizer,
+                                       self.stopwords, xpath)
+            self.assertIsNotNone(doc._get_steps())
+            self._assert_same_term_counts(self.filepath, xpath)
+
+    def test_fallback(self):
+        for xpath in ['//tei:div[1]', '//tei:div | //tei:p',
+                      'tei:div', '//tei:div[@type != "dummy"]']:
+            doc = StreamingTEIDocument(self.filepath, self.tokenizer,
+                                       self.stopwords, xpath)
+            self.assertIsNone(doc._get_steps())
+        self._assert_same_term_counts(self.filepath, '//tei:div[1]')
+
+    def test_nested_texts(self):
+        filepath = os.path.join(self.directory, 'nested.xml')
+        with open(filepath, 'w') as xml_file:
+            xml_file.write(
+                '<TEI xmlns="http://www.tei-c.org/ns/1.0"><text><body>'
+                '<div xml:id="outer">dog <div xml:id="inner">cat</div> '
+                'house</div> garden <div xml:id="last">tree</div> river'
+                '</body></text></TEI>')
+        doc = StreamingTEIDocument(filepath, self.tokenizer,
+                                   self.stopwords, '//tei:div')
+        self.assertEqual(['nested-outer', 'nested-inner', 'nested-last'],
+                         [text_id for text_id, counts
+                          in doc.get_term_counts()])
+        self._assert_same_term_counts(filepath, '//tei:div')
+
+if __name__ == '__main__':
+    unittest.main()
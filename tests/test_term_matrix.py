@@ -0,0 +1,131 @@
+from bacalhau.term_matrix import TermMatrix
+from math import log
+import numpy as np
+import os
+import tempfile
+import unittest
+
+
+class TestTermMatrix(unittest.TestCase):
+
+    def setUp(self):
+        self.matrix = TermMatrix()
+        self.matrix.add_text('a', {'dog': 2, 'fox': 1})
+        self.matrix.add_text('b', {'dog': 1, 'cat': 3})
+        self.matrix.add_text('c', {})
+
+    def test_remove_rows(self):
+        self.matrix.remove_rows([0, 2])
+        self.assertEqual(1, self.matrix.get_text_count())
+        self.assertEqual([1, 0, 1],
+                         self.matrix.get_document_frequencies().tolist())
+        self.assertEqual([('b', [('cat', 3), ('dog', 1)])],
+                         list(self.matrix.iter_texts()))
+        self.assertEqual([0.0, 0.0], self.matrix.get_tf_idf().tolist())
+
+    def test_remove_rows_same_id(self):
+        self.matrix.add_text('a', {'cat': 1})
+        self.matrix.remove_rows([3])
+        self.assertEqual(['a', 'b', 'c'], self.matrix.get_text_ids())
+        self.assertEqual([2, 1, 1],
+                         self.matrix.get_document_frequencies().tolist())
+        self.matrix.remove_rows([])
+        self.assertEqual(3, self.matrix.get_text_count())
+
+    def test_get_text_count(self):
+        self.assertEqual(3, self.matrix.get_text_count())
+
+    def test_get_term_count(self):
+        self.assertEqual(3, self.matrix.get_term_count())
+
+    def test_iter_texts(self):
+        texts = list(self.matrix.iter_texts())
+        self.assertEqual(3, len(texts))
+        self.assertEqual(('a', [('dog', 2), ('fox', 1)]), texts[0])
+        self.assertEqual(('c', []), texts[2])
+
+    def test_get_counts(self):
+        indptr, indices, counts = self.matrix.get_counts()
+        self.assertEqual([0, 2, 4, 4], indptr.tolist())
+        self.assertEqual([0, 1, 2, 0], indices.tolist())
+        self.assertEqual([2, 1, 3, 1], counts.tolist())
+
+    def test_get_rows(self):
+        self.assertEqual([0, 0, 1, 1], self.matrix.get_rows().tolist())
+
+    def test_get_document_frequencies(self):
+        frequencies = self.matrix.get_document_frequencies()
+        self.assertEqual([2, 1, 1], frequencies.tolist())
+
+    def test_get_frequencies(self):
+        frequencies = self.matrix.get_frequencies()
+        self.assertEqual([1, 0.5, 1, 1 / 3.0], frequencies.tolist())
+
+    def test_get_tf_idf(self):
+        tf_idf = self.matrix.get_tf_idf()
+        self.assertAlmostEqual(log(3 / 2.0), tf_idf[0])
+        self.assertAlmostEqual(0.5 * log(3), tf_idf[1])
+
+    def test_get_term_ranks(self):
+        self.assertEqual([1, 2, 0], self.matrix.get_term_ranks().tolist())
+
+    def test_select_top(self):
+        scores = np.array([1.0, 1.0, 0.5, 2.0])
+        self.assertEqual([0, 3], self.matrix.select_top(scores, 1).tolist())
+        self.assertEqual([0, 1, 3, 2],
+                         self.matrix.select_top(scores, 2).tolist())
+
+    def test_select_top_workers(self):
+        matrix = TermMatrix()
+        for text in range(20):
+            matrix.add_text(str(text), dict(
+                ('t%d' % term, (text * term) % 4 + 1)
+                for term in range(text % 7)))
+        scores = matrix.get_tf_idf()
+        for n in (1, 3, 10):
+            expected = matrix.select_top(scores, n).tolist()
+            for workers in (2, 3, 50):
+                self.assertEqual(expected, matrix.select_top(
+                    scores, n, workers).tolist())
+
+    def test_merge(self):
+        first = TermMatrix()
+        first.add_text('a', {'dog': 2, 'fox': 1})
+        second = TermMatrix()
+        second.add_text('b', {'dog': 1, 'cat': 3})
+        second.add_text('c', {})
+        matrix = TermMatrix.merge([first, second])
+        self.assertEqual(['a', 'b', 'c'], matrix.get_text_ids())
+        self.assertEqual(['dog', 'fox', 'cat'], matrix.get_terms())
+        self.assertEqual([2, 1, 1],
+                         matrix.get_document_frequencies().tolist())
+        self.assertEqual(self.matrix.get_term_data(),
+                         matrix.get_term_data())
+        self.assertEqual(self.matrix.get_tf_idf().tolist(),
+                         matrix.get_tf_idf().tolist())
+        self.assertEqual(0, TermMatrix.merge([]).get_text_count())
+
+    def test_save_load(self):
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        self.matrix.add_text(u'd\xe9', {'dog': 1})
+        self.matrix.save(path, {'shard': [0, 1]})
+        matrix, metadata = TermMatrix.load(path)
+        self.assertEqual({'shard': [0, 1]}, metadata)
+        self.assertEqual(self.matrix.get_text_ids(), matrix.get_text_ids())
+        self.assertEqual(self.matrix.get_terms(), matrix.get_terms())
+        self.assertEqual([a.tolist() for a in self.matrix.get_counts()],
+                         [a.tolist() for a in matrix.get_counts()])
+        self.assertEqual(self.matrix.get_term_data(),
+                         matrix.get_term_data())
+
+    def test_get_term_data(self):
+        term_data = self.matrix.get_term_data()
+        self.assertEqual(['cat', 'dog', 'fox'], sorted(term_data))
+        self.assertEqual({'count': 1, 'frequency': 0.5},
+                         term_data['fox']['a'])
+        self.assertEqual(2, len(term_data['dog']))
+
+if __name__ == '__main__':
+    unittest.main()
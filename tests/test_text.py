@@ -1,4 +1,6 @@
+from bacalhau.pipeline import Pipeline
 from bacalhau.text import Text
+from bacalhau.token_cache import TokenCache
 import nltk
 import unittest
 
@@ -21,6 +23,26 @@ class TestText(unittest.TestCase):
         self.assertEqual(term_data['dog'][self.text_id]['frequency'],
                 1)
 
+    def test_get_term_counts_cached(self):
+        term_counts = self.text.get_term_counts()
+        self.assertIs(term_counts, self.text.get_term_counts())
+
+    def test_get_term_counts(self):
+        term_counts = self.text.get_term_counts()
+        self.assertEqual({'quick': 1, 'brown': 1, 'fox': 1, 'jump': 1,
+                          'dog': 2}, term_counts)
+
+    def test_get_term_counts_pipeline(self):
+        token_cache = TokenCache()
+        tokenizer = nltk.tokenize.regexp.WordPunctTokenizer()
+        stopwords = nltk.corpus.stopwords.words('english')
+        text = Text(self.text_id,
+                    'The quick brown fox jumps over the lazy dog, dogs.',
+                    tokenizer, stopwords,
+                    Pipeline(tokenizer, stopwords, token_cache))
+        self.assertEqual(self.text.get_term_counts(), text.get_term_counts())
+        self.assertEqual(7, token_cache.get_statistics()['misses'])
+
     def test__is_valid_token(self):
         self.assertTrue(self.text._is_valid_token('dog'))
         self.assertTrue(self.text._is_valid_token('dogs'))
@@ -0,0 +1,47 @@
+from bacalhau.token_cache import TokenCache
+from nltk.corpus import wordnet
+from nltk.stem import WordNetLemmatizer
+import unittest
+
+
+class TestTokenCache(unittest.TestCase):
+
+    TOKENS = ['dog', 'dogs', 'geese', 'glasses', 'women', 'boxes',
+              'brown', 'lazy', 'the', 'quickly', 'xyzzy']
+
+    def setUp(self):
+        self.cache = TokenCache()
+        self.prebuilt_cache = TokenCache(prebuild=True)
+
+    def test_is_noun(self):
+        for cache in (self.cache, self.prebuilt_cache):
+            for token in self.TOKENS:
+                self.assertEqual(
+                    bool(wordnet.synsets(token, pos=wordnet.NOUN)),
+                    cache.is_noun(token))
+
+    def test_lemmatize(self):
+        lemmatizer = WordNetLemmatizer()
+        for cache in (self.cache, self.prebuilt_cache):
+            for token in self.TOKENS:
+                self.assertEqual(lemmatizer.lemmatize(token),
+                                 cache.lemmatize(token))
+
+    def test_get_statistics(self):
+        self.cache.is_noun('dog')
+        self.cache.is_noun('dog')
+        self.cache.lemmatize('dogs')
+        self.cache.is_noun('dogs')
+        self.assertEqual({'hits': 2, 'misses': 1, 'size': 2},
+                         self.cache.get_statistics())
+
+    def test_max_size(self):
+        cache = TokenCache(max_size=1)
+        cache.is_noun('dog')
+        cache.is_noun('fox')
+        self.assertTrue(cache.is_noun('fox'))
+        self.assertEqual({'hits': 0, 'misses': 3, 'size': 1},
+                         cache.get_statistics())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,8 @@
 from bacalhau.topic_tree import TopicTree
+from networkx.readwrite import json_graph
+import gzip
 import os
+import StringIO
 import unittest
 
 
@@ -26,6 +29,48 @@ class TestTopicTree(unittest.TestCase):
         compressed_number_of_nodes = self.tree.number_of_nodes()
         self.assertLess(compressed_number_of_nodes, number_of_nodes)
 
+    def test_compress_result(self):
+        tree = TopicTree()
+        tree.add_path(['entity.n.01', 'object.n.01', 'animal.n.01',
+                       'dog.n.01', 'dogs'])
+        tree.add_path(['entity.n.01', 'object.n.01', 'animal.n.01',
+                       'cat.n.01', 'cats'])
+        tree.add_path(['entity.n.01', 'object.n.01', 'animal.n.01',
+                       'bird.n.01', 'birds'])
+        tree.add_path(['entity.n.01', 'object.n.01', 'house.n.01',
+                       'houses'])
+        tree.add_path(['entity.n.01', 'abstraction.n.01', 'idea.n.01',
+                       'ideas'])
+        for leaf in ['dogs', 'cats', 'birds', 'houses', 'ideas']:
+            tree.node[leaf]['is_leaf'] = True
+        tree.compress()
+        self.assertEqual([('animal.n.01', 'birds'), ('animal.n.01', 'cats'),
+                          ('animal.n.01', 'dogs'), ('entity.n.01', 'ideas'),
+                          ('entity.n.01', 'object.n.01'),
+                          ('object.n.01', 'animal.n.01'),
+                          ('object.n.01', 'houses')], sorted(tree.edges()))
+
+    def test_compress_moved_nodes(self):
+        # bc.n.01 is moved under abc.n.01 when ab.n.01 is eliminated,
+        # and is only compared with its new parent when another leaf
+        # walks up through it.
+        for leaves, has_node in [(['xyz1'], True),
+                                 (['xyz1', 'xyz2'], False)]:
+            tree = TopicTree()
+            for leaf in leaves:
+                tree.add_path(['abc.n.01', 'ab.n.01', 'bc.n.01', leaf])
+                tree.node[leaf]['is_leaf'] = True
+            tree.compress(min_children=1)
+            self.assertFalse(tree.has_node('ab.n.01'))
+            self.assertEqual(has_node, tree.has_node('bc.n.01'))
+
+    def test_compress_deep_tree(self):
+        path = ['n%d.n.01' % i for i in range(5000)]
+        self.tree.add_path(path)
+        self.tree.node[path[-1]]['is_leaf'] = True
+        self.tree.compress()
+        self.assertTrue(self.tree.has_node(path[-1]))
+
     def test__eliminate_parents(self):
         number_of_nodes = self.tree.number_of_nodes()
         self.tree._eliminate_parents('g', min_children=1)
@@ -42,6 +87,17 @@ class TestTopicTree(unittest.TestCase):
         self.assertLess(n, number_of_nodes)
         self.assertFalse(self.tree.has_node('c'))
 
+    def test_add_text(self):
+        self.tree.add_text('g', 'b-cicero')
+        self.tree.add_text('g', 'a-kafka')
+        self.tree.add_text('g', 'b-cicero')
+        self.tree.add_text('h', 'a-kafka')
+        self.assertEqual(['b-cicero', 'a-kafka'], self.tree.graph['texts'])
+        self.assertEqual([0, 1], list(self.tree.node['g']['texts']))
+        self.assertEqual(2, self.tree.node['g']['count'])
+        self.assertEqual([1], list(self.tree.node['h']['texts']))
+        self.assertEqual(1, self.tree.node['h']['count'])
+
     def test_prune(self):
         number_of_nodes = self.tree.number_of_nodes()
         self.tree.prune(['a'])
@@ -71,5 +127,48 @@ class TestTopicTree(unittest.TestCase):
         except IOError:
             self.fail()
 
+    def test_to_json_from_json(self):
+        self.tree.add_text('g', 'a-kafka')
+        self.tree.add_text('h', 'b-cicero')
+
+        for gzipped in (False, True):
+            json_file = StringIO.StringIO()
+            self.tree.to_json(json_file, gzipped=gzipped)
+            json_file.seek(0)
+            tree = TopicTree.from_json(json_file)
+
+            self.assertEqual(sorted(self.tree.edges()), sorted(tree.edges()))
+            self.assertEqual(sorted(self.tree.nodes(data=True)),
+                             sorted(tree.nodes(data=True)))
+            self.assertEqual(self.tree.graph, tree.graph)
+
+    def test_to_json_format(self):
+        filename = 'test.js.gz'
+
+        self.addCleanup(os.remove, filename)
+        self.tree.to_json(filename, gzipped=True)
+
+        with gzip.open(filename) as json_file:
+            tree = json_graph.loads(json_file.read())
+        self.assertEqual(sorted(self.tree.edges()), sorted(tree.edges()))
+        self.assertEqual(sorted(self.tree.nodes(data=True)),
+                         sorted(tree.nodes(data=True)))
+
+    def test_save_load(self):
+        filename = 'test.tree'
+
+        self.addCleanup(os.remove, filename)
+        self.tree.add_text('g', 'a-kafka')
+        self.tree.add_text('h', 'b-cicero')
+        self.tree.node['a']['is_root'] = True
+        self.tree.save(filename)
+        tree = TopicTree.load(filename)
+
+        self.assertEqual(self.tree.nodes(), tree.nodes())
+        self.assertEqual(sorted(self.tree.edges()), sorted(tree.edges()))
+        self.assertEqual(sorted(self.tree.nodes(data=True)),
+                         sorted(tree.nodes(data=True)))
+        self.assertEqual(self.tree.graph, tree.graph)
+
 if __name__ == '__main__':
     unittest.main()
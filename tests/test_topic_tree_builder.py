@@ -0,0 +1,46 @@
+from bacalhau.topic_tree import TopicTree
+from bacalhau.topic_tree_builder import TopicTreeBuilder
+import unittest
+
+
+class TestTopicTreeBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.paths = [['entity.n.01', 'object.n.01', 'dog.n.01', 'dogs'],
+                      ['entity.n.01', 'object.n.01', 'cat.n.01', 'cats'],
+                      ['entity.n.01', 'object.n.01', 'dog.n.01', 'dogs'],
+                      ['abstraction.n.06', 'idea.n.01', 'ideas']]
+        self.builder = TopicTreeBuilder()
+        for path in self.paths:
+            self.builder.add_path(path)
+
+    def _get_expected_tree(self):
+        tree = TopicTree()
+        for path in self.paths:
+            tree.add_nodes_from(path)
+            tree.node[path[-1]]['is_leaf'] = True
+            tree.node[path[0]]['is_root'] = True
+            tree.add_path(path)
+        return tree
+
+    def test_add_path(self):
+        self.assertEqual(3, len(self.builder._paths))
+        self.assertEqual(9, len(self.builder._nodes))
+        self.assertEqual(7, len(self.builder._edges))
+
+    def test_get_topic_tree(self):
+        tree = self.builder.get_topic_tree()
+        expected_tree = self._get_expected_tree()
+        self.assertEqual(expected_tree.node.items(), tree.node.items())
+        self.assertEqual(expected_tree.succ.items(), tree.succ.items())
+        self.assertEqual(expected_tree.pred.items(), tree.pred.items())
+
+    def test_get_compact_topic_tree(self):
+        tree = self.builder.get_compact_topic_tree()
+        expected_tree = self._get_expected_tree()
+        self.assertEqual(sorted(expected_tree.edges()), sorted(tree.edges()))
+        self.assertEqual(sorted(expected_tree.nodes(data=True)),
+                         sorted(tree.to_networkx().nodes(data=True)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+from array import array
+from bacalhau.compact_topic_tree import CompactTopicTree
+from bacalhau.topic_tree import TopicTree
+from bacalhau.topic_tree_snapshot import TopicTreeSnapshot
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestTopicTreeSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = TopicTree()
+        self.tree.add_path(['entity.n.01', 'object.n.01', 'animal.n.01',
+                            'dog.n.01', 'dogs'])
+        self.tree.add_path(['entity.n.01', 'object.n.01', 'animal.n.01',
+                            'cat.n.01', 'cats'])
+        self.tree.add_path(['entity.n.01', 'abstraction.n.01',
+                            'idea.n.01', 'ideas'])
+        for leaf in ['dogs', 'cats', 'ideas']:
+            self.tree.node[leaf]['is_leaf'] = True
+        self.tree.node['entity.n.01']['is_root'] = True
+        self.tree.add_text('dogs', 'b-cicero')
+        self.tree.add_text('dogs', 'a-kafka')
+        self.directory = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.directory, 'tree.snapshot')
+        self.tree.save(self.filepath)
+        self.snapshot = TopicTreeSnapshot(self.filepath)
+
+    def tearDown(self):
+        self.snapshot.close()
+        shutil.rmtree(self.directory)
+
+    def test_nodes(self):
+        self.assertEqual(self.tree.number_of_nodes(),
+                         self.snapshot.number_of_nodes())
+        self.assertEqual(self.tree.nodes(), self.snapshot.nodes())
+        self.assertEqual(sorted(self.tree.edges()),
+                         sorted(self.snapshot.edges()))
+        self.assertTrue(self.snapshot.has_node('cat.n.01'))
+        self.assertTrue(self.snapshot.has_node(u'cat.n.01'))
+        self.assertFalse(self.snapshot.has_node('cow.n.01'))
+
+    def test_get_children_parents(self):
+        self.assertEqual(['abstraction.n.01', 'object.n.01'],
+                         sorted(self.snapshot.get_children('entity.n.01')))
+        self.assertEqual([], self.snapshot.get_children('dogs'))
+        self.assertEqual(['animal.n.01'],
+                         self.snapshot.get_parents('cat.n.01'))
+        self.assertEqual([], self.snapshot.get_parents('entity.n.01'))
+        self.assertRaises(KeyError, self.snapshot.get_children, 'cow.n.01')
+
+    def test_get_node_data(self):
+        self.assertEqual(['b-cicero', 'a-kafka'],
+                         self.snapshot.get_text_ids())
+        self.assertEqual({'is_leaf': True, 'texts': array('i', [0, 1]),
+                          'count': 2}, self.snapshot.get_node_data('dogs'))
+        self.assertEqual({'is_root': True},
+                         self.snapshot.get_node_data('entity.n.01'))
+
+    def test_compact_topic_tree(self):
+        filepath = os.path.join(self.directory, 'compact.snapshot')
+        CompactTopicTree.from_networkx(self.tree).save(filepath)
+        snapshot = TopicTreeSnapshot(filepath)
+        self.addCleanup(snapshot.close)
+
+        self.assertEqual(self.snapshot.nodes(), snapshot.nodes())
+        self.assertEqual(sorted(self.snapshot.edges()),
+                         sorted(snapshot.edges()))
+        self.assertEqual(list(self.snapshot.nodes_iter(data=True)),
+                         list(snapshot.nodes_iter(data=True)))
+
+    def test_empty_tree(self):
+        filepath = os.path.join(self.directory, 'empty.snapshot')
+        TopicTree().save(filepath)
+        tree = TopicTree.load(filepath)
+        self.assertEqual(0, tree.number_of_nodes())
+        self.assertEqual({}, tree.graph)
+
+    def test_invalid_file(self):
+        filepath = os.path.join(self.directory, 'tree.js')
+        self.tree.to_json(filepath)
+        self.assertRaises(ValueError, TopicTreeSnapshot, filepath)
+
+if __name__ == '__main__':
+    unittest.main()
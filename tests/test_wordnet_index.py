@@ -0,0 +1,96 @@
+from bacalhau.corpus import Corpus
+from bacalhau.tei_document import TEIDocument
+from bacalhau.token_cache import TokenCache
+from bacalhau.wordnet_index import WordNetIndex, read_noun_exceptions
+from nltk.corpus import wordnet
+from nltk.stem import WordNetLemmatizer
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+
+class TestWordNetIndex(unittest.TestCase):
+
+    WORDS = ['dog', 'Dog', 'dogs', 'geese', 'glass', 'hot_dog', 'entity',
+             'brown', 'quickly', 'xyzzy']
+
+    @classmethod
+    def setUpClass(cls):
+        # Building the index reads all of WordNet, so it is only done
+        # once.
+        cls.directory = tempfile.mkdtemp()
+        cls.filepath = os.path.join(cls.directory, 'wordnet.idx')
+        WordNetIndex.build(cls.filepath)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        self.index = WordNetIndex(self.filepath)
+        self.addCleanup(self.index.close)
+
+    def _get_hypernym(self, word):
+        hypernym = [word]
+        synsets = wordnet.synsets(word)
+        while synsets:
+            hypernym.append(synsets[0].name)
+            synsets = synsets[0].hypernyms()
+        return hypernym
+
+    def test_contains(self):
+        nouns = set(wordnet.all_lemma_names(pos=wordnet.NOUN))
+        for word in self.WORDS:
+            self.assertEqual(word in nouns, word in self.index)
+
+    def test_get_hypernym(self):
+        for word in self.WORDS:
+            if word.lower() in self.index:
+                self.assertEqual(self._get_hypernym(word),
+                                 self.index.get_hypernym(word))
+            else:
+                self.assertIsNone(self.index.get_hypernym(word))
+
+    def test_get_exceptions(self):
+        self.assertEqual(read_noun_exceptions(), self.index.get_exceptions())
+
+    def test_pickle(self):
+        index = pickle.loads(pickle.dumps(self.index))
+        self.assertEqual(self.index.get_hypernym('dog'),
+                         index.get_hypernym('dog'))
+        index.close()
+
+    def test_read_arrays(self):
+        with open(self.filepath, 'rb') as index_file:
+            content = index_file.read()
+        filepath = os.path.join(self.directory, 'broken.idx')
+        with open(filepath, 'wb') as index_file:
+            index_file.write('X' + content[1:])
+        self.assertRaises(ValueError, WordNetIndex, filepath)
+
+    def test_token_cache(self):
+        cache = TokenCache(wordnet_index=self.index)
+        lemmatizer = WordNetLemmatizer()
+        for word in ['dogs', 'geese', 'glasses', 'women', 'the', 'xyzzy']:
+            self.assertEqual(bool(wordnet.synsets(word, pos=wordnet.NOUN)),
+                             cache.is_noun(word))
+            self.assertEqual(lemmatizer.lemmatize(word),
+                             cache.lemmatize(word))
+
+    def test_corpus(self):
+        xpath = '//tei:body/tei:div[@type = "dummy"]'
+        corpus = Corpus('tests/corpus', TEIDocument, xpath=xpath)
+        terms = corpus.get_top_terms(n_terms=10)
+        for workers in (1, 2):
+            indexed_corpus = Corpus('tests/corpus', TEIDocument,
+                                    workers=workers, xpath=xpath,
+                                    wordnet_index=self.index)
+            self.assertEqual(corpus._get_term_data(),
+                             indexed_corpus._get_term_data())
+            self.assertEqual(corpus.get_hypernyms(terms),
+                             indexed_corpus.get_hypernyms(terms))
+
+if __name__ == '__main__':
+    unittest.main()